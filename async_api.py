@@ -0,0 +1,169 @@
+"""
+asyncio twin of ClientAPI with the same method surface and result dicts.
+
+Every coroutine runs the matching ClientAPI call on a worker thread, so it shares the
+pooled keep-alive session, timeouts and retries from api.py. The fan-out helpers issue
+many lookups at once under a concurrency cap, turning N sequential round trips into
+roughly one. Synchronous callers get the same fan-out straight on the worker threads,
+without an event loop.
+"""
+import asyncio
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import api
+from api import ClientAPI
+
+DEFAULT_CONCURRENCY = 8  # keep below api.POOL_MAXSIZE so fan-out never waits on a socket
+
+_executor = ThreadPoolExecutor(max_workers=api.POOL_MAXSIZE, thread_name_prefix="clientapi")
+
+
+@api.on_pool_resized
+def _resize_executor(pool_maxsize: int):
+    # One worker per pooled socket; calls already queued on the old pool still run there
+    global _executor
+    old, _executor = _executor, ThreadPoolExecutor(max_workers=pool_maxsize, thread_name_prefix="clientapi")
+    old.shutdown(wait=False)
+
+
+async def _run(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, lambda: fn(*args, **kwargs))
+
+
+class AsyncClientAPI:
+    @staticmethod
+    async def snapshot(client_id: str):
+        return await _run(ClientAPI.snapshot, client_id)
+
+    @staticmethod
+    async def getTotalInvested(client_id: str, snapshot=None) -> float:
+        return await _run(ClientAPI.getTotalInvested, client_id, snapshot)
+
+    @staticmethod
+    async def getCurrentValue(client_id: str, snapshot=None) -> float:
+        return await _run(ClientAPI.getCurrentValue, client_id, snapshot)
+
+    @staticmethod
+    async def create_client(name: str, email: str, cash: float, portfolios: list = None):
+        return await _run(ClientAPI.create_client, name, email, cash, portfolios)
+
+    @staticmethod
+    async def get_client(client_id: str):
+        return await _run(ClientAPI.get_client, client_id)
+
+    @staticmethod
+    async def update_client(client_id: str, name: str = None, email: str = None):
+        return await _run(ClientAPI.update_client, client_id, name=name, email=email)
+
+    @staticmethod
+    async def deposit(client_id: str, amount: float, idempotency_key: str = None):
+        return await _run(ClientAPI.deposit, client_id, amount, idempotency_key)
+
+    @staticmethod
+    async def create_portfolio(client_id: str, portfolio_type: str, initial_amount: float, idempotency_key: str = None):
+        return await _run(ClientAPI.create_portfolio, client_id, portfolio_type, initial_amount, idempotency_key)
+
+    @staticmethod
+    async def list_portfolios(client_id: str):
+        return await _run(ClientAPI.list_portfolios, client_id)
+
+    @staticmethod
+    async def hasPortfolioType(client_id: str, portfolio_type: str, snapshot=None) -> bool:
+        return await _run(ClientAPI.hasPortfolioType, client_id, portfolio_type, snapshot)
+
+    @staticmethod
+    async def get_portfolio(portfolio_id: str):
+        return await _run(ClientAPI.get_portfolio, portfolio_id)
+
+    @staticmethod
+    async def transfer_to_portfolio(portfolio_id: str, amount: float, idempotency_key: str = None):
+        return await _run(ClientAPI.transfer_to_portfolio, portfolio_id, amount, idempotency_key)
+
+    @staticmethod
+    async def withdraw_from_portfolio(portfolio_id: str, amount: float, idempotency_key: str = None):
+        return await _run(ClientAPI.withdraw_from_portfolio, portfolio_id, amount, idempotency_key)
+
+    @staticmethod
+    async def getPortfolioId_FromType(client_id: str, portfolio_type: str, snapshot=None) -> str | None:
+        return await _run(ClientAPI.getPortfolioId_FromType, client_id, portfolio_type, snapshot)
+
+    @staticmethod
+    async def get_portfolio_analysis(portfolio_id: str):
+        return await _run(ClientAPI.get_portfolio_analysis, portfolio_id)
+
+    @staticmethod
+    async def simulate_portfolios(client_id: str, months: int):
+        return await _run(ClientAPI.simulate_portfolios, client_id, months)
+
+    @staticmethod
+    async def gather_portfolios(portfolio_ids: list[str], concurrency: int = DEFAULT_CONCURRENCY) -> list[dict]:
+        """
+        Fetch many portfolios concurrently.
+
+        Parameters:
+            portfolio_ids (list[str]): Portfolio IDs to fetch.
+            concurrency (int): Maximum number of requests in flight at once.
+
+        Returns:
+            list[dict]: One get_portfolio result per ID, in the same order.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(portfolio_id):
+            async with semaphore:
+                return await AsyncClientAPI.get_portfolio(portfolio_id)
+
+        return await asyncio.gather(*(fetch(portfolio_id) for portfolio_id in portfolio_ids))
+
+    @staticmethod
+    async def gather_portfolio_analyses(portfolio_ids: list[str], concurrency: int = DEFAULT_CONCURRENCY) -> list[dict]:
+        """
+        Fetch the analysis of many portfolios concurrently.
+
+        Parameters:
+            portfolio_ids (list[str]): Portfolio IDs to analyse.
+            concurrency (int): Maximum number of requests in flight at once.
+
+        Returns:
+            list[dict]: One get_portfolio_analysis result per ID, in the same order.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(portfolio_id):
+            async with semaphore:
+                return await AsyncClientAPI.get_portfolio_analysis(portfolio_id)
+
+        return await asyncio.gather(*(fetch(portfolio_id) for portfolio_id in portfolio_ids))
+
+
+def _fan_out(fn, keys: list, concurrency: int) -> list:
+    # fn(key) for every key on the shared worker threads, at most `concurrency` in flight, results in order
+    if len(keys) <= 1:
+        return [fn(key) for key in keys]
+    results = [None] * len(keys)
+    pending = {}
+    for i, key in enumerate(keys):
+        if len(pending) >= concurrency:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[pending.pop(future)] = future.result()
+        pending[_executor.submit(fn, key)] = i
+    for future, i in pending.items():
+        results[i] = future.result()
+    return results
+
+
+def gather_portfolios(portfolio_ids: list[str], concurrency: int = DEFAULT_CONCURRENCY) -> list[dict]:
+    """
+    Blocking counterpart of AsyncClientAPI.gather_portfolios for synchronous callers such as
+    the Flask handlers; safe to call whether or not an event loop is running.
+    """
+    return _fan_out(ClientAPI.get_portfolio, list(portfolio_ids), concurrency)
+
+
+def gather_portfolio_analyses(portfolio_ids: list[str], concurrency: int = DEFAULT_CONCURRENCY) -> list[dict]:
+    """
+    Blocking counterpart of AsyncClientAPI.gather_portfolio_analyses for synchronous callers.
+    """
+    return _fan_out(ClientAPI.get_portfolio_analysis, list(portfolio_ids), concurrency)
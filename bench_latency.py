@@ -0,0 +1,182 @@
+"""
+End-to-end latency benchmark against local stand-ins for InvestEase and Cohere.
+
+Drives every ClientAPI endpoint, llama.do_action and the Flask /reply_whatsapp route from a
+thread pool and reports throughput plus p50/p95/p99 latency per endpoint, so regressions show
+up before deploy.
+
+    python bench_latency.py --requests 200 --concurrency 8 --latency-ms 40 --error-rate 0.01
+    python bench_latency.py --only api. --no-cache --json before.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("RBCAGENT_LOG_LEVEL", "WARNING")
+os.environ.setdefault("RBCAGENT_JOURNAL", os.path.join(tempfile.gettempdir(), "rbcagent-bench-journal.jsonl"))
+os.environ.setdefault("RBCAGENT_CLIENTS_DB", os.path.join(tempfile.gettempdir(), "rbcagent-bench-clients.db"))
+os.environ.setdefault("RBCAGENT_LEDGER", os.path.join(tempfile.gettempdir(), "rbcagent-bench-ledger.jsonl"))
+if "RBCAGENT_PORTFOLIOS_FILE" not in os.environ:  # the bench types and extends the index, keep the real one untouched
+    os.environ["RBCAGENT_PORTFOLIOS_FILE"] = os.path.join(tempfile.gettempdir(), "rbcagent-bench-portfolios.txt")
+    shutil.copyfile("portfolios.txt", os.environ["RBCAGENT_PORTFOLIOS_FILE"])
+
+import api
+import level
+from api import ClientAPI
+from fake_cohere import FakeCohere
+from fake_investease import FakeInvestEase
+
+LIST_OF_STRATEGIES = ["aggressive_growth", "growth", "balanced", "conservative", "very_conservative"]
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_scenario(fn, requests: int, concurrency: int) -> dict:
+    """
+    Call fn `requests` times from `concurrency` threads.
+    fn returns truthy on success; exceptions count as errors.
+    """
+    timings = []
+    errors = 0
+    lock = threading.Lock()
+
+    def call(_):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            ok = fn()
+        except Exception:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            timings.append(elapsed)
+            if not ok:
+                errors += 1
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(call, range(requests)))
+    wall = time.perf_counter() - wall_start
+
+    timings.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput": requests / wall if wall else 0.0,
+        "mean_ms": statistics.mean(timings) * 1000,
+        "p50_ms": percentile(timings, 0.50) * 1000,
+        "p95_ms": percentile(timings, 0.95) * 1000,
+        "p99_ms": percentile(timings, 0.99) * 1000,
+    }
+
+
+def build_scenarios(server: FakeInvestEase, client_id: str, portfolio_ids: list[str], message: str):
+    from twilio.twiml.messaging_response import MessagingResponse
+    import llama
+    import chat_reply
+
+    def pick():
+        return random.choice(portfolio_ids)
+
+    def action(name, params=None):
+        return lambda: llama.do_action(client_id, name, params or [], MessagingResponse())[0]
+
+    def reply_whatsapp():
+        response = chat_reply.app.test_client().post("/reply_whatsapp", data={"Body": message, "From": "whatsapp:+10000000000"})
+        return response.status_code == 200
+
+    return {
+        "api.get_client": lambda: ClientAPI.get_client(client_id)["success"],
+        "api.list_portfolios": lambda: ClientAPI.list_portfolios(client_id)["success"],
+        "api.get_portfolio": lambda: ClientAPI.get_portfolio(pick())["success"],
+        "api.get_portfolio_analysis": lambda: ClientAPI.get_portfolio_analysis(pick())["success"],
+        "api.deposit": lambda: ClientAPI.deposit(client_id, 1)["success"],
+        "api.transfer_to_portfolio": lambda: ClientAPI.transfer_to_portfolio(pick(), 1)["success"],
+        "api.withdraw_from_portfolio": lambda: ClientAPI.withdraw_from_portfolio(pick(), 1)["success"],
+        "api.simulate_portfolios": lambda: ClientAPI.simulate_portfolios(client_id, 6)["success"],
+        "do_action.GET_PORTFOLIOS": action("GET_PORTFOLIOS"),
+        "do_action.GET_INFO": action("GET_INFO"),
+        "do_action.TRANSFER": lambda: llama.do_action(client_id, "TRANSFER", ["1", pick()], MessagingResponse())[0],
+        "do_action.WITHDRAW": lambda: llama.do_action(client_id, "WITHDRAW", ["1", pick()], MessagingResponse())[0],
+        "do_action.SET_DAILY_SAVING_AMOUNT": action("SET_DAILY_SAVING_AMOUNT", ["5"]),
+        "flask./reply_whatsapp": reply_whatsapp,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="calls per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=40.0, help="InvestEase latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability of an injected 503")
+    parser.add_argument("--quota", type=float, default=None, help="stand-in requests/s before it answers 429")
+    parser.add_argument("--llm-latency-ms", type=float, default=400.0, help="Cohere latency per chat call")
+    parser.add_argument("--llm-action", default="GET_PORTFOLIOS", help="action the stand-in LLM classifies every message as")
+    parser.add_argument("--message", default="What are my investment portfolios?")
+    parser.add_argument("--portfolios", type=int, default=3, help="extra portfolios seeded besides portfolios.txt")
+    parser.add_argument("--only", default="", help="run only scenarios whose name starts with this prefix")
+    parser.add_argument("--no-cache", action="store_true", help="disable the ClientAPI read cache")
+    parser.add_argument("--json", help="also write results to this file")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    server = FakeInvestEase(latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000,
+                            error_rate=args.error_rate, quota=args.quota, seed=args.seed).start()
+    api.BASE_URL = server.url
+    if args.no_cache:
+        api.CACHE_TTLS = {endpoint: 0 for endpoint in api.CACHE_TTLS}
+    server.add_client("Bench", "bench@example.com", cash=1e9, client_id=level.ID)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        import llama
+        level.register_client(level.ID)
+        portfolio_ids = list(getattr(level, "__portfolios").get(level.ID, []))
+        for i, portfolio_id in enumerate(portfolio_ids):
+            server.add_portfolio(level.ID, LIST_OF_STRATEGIES[i % len(LIST_OF_STRATEGIES)], 1e6, portfolio_id=portfolio_id)
+        for i in range(args.portfolios):
+            portfolio_ids.append(server.add_portfolio(level.ID, LIST_OF_STRATEGIES[i % len(LIST_OF_STRATEGIES)], 1e6))
+        llama.co = FakeCohere(latency=args.llm_latency_ms / 1000, action=args.llm_action)
+        scenarios = build_scenarios(server, level.ID, portfolio_ids, args.message)
+
+    print(f"InvestEase {args.latency_ms:.0f}±{args.jitter_ms:.0f} ms, error rate {args.error_rate:.1%}, "
+          f"LLM {args.llm_latency_ms:.0f} ms, {args.requests} calls x {args.concurrency} threads"
+          f"{', cache off' if args.no_cache else ''}")
+    print(f"{'endpoint':<36}{'calls':>7}{'errors':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    results = {}
+    for name, fn in scenarios.items():
+        if not name.startswith(args.only):
+            continue
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = run_scenario(fn, args.requests, args.concurrency)
+        results[name] = result
+        print(f"{name:<36}{result['requests']:>7}{result['errors']:>8}{result['throughput']:>9.1f}"
+              f"{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}{result['p99_ms']:>10.1f}")
+
+    print(f"\nStand-in served {server.requests} requests over {server.connections} connections, "
+          f"throttled {server.throttled}")
+    print(f"Rate limiter: {json.dumps(api.rate_limit_stats())}")
+    print(f"Cache: {json.dumps(api.cache_stats()['namespaces'])}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Per-client memory benchmark: the deep-copied clientInfo dict template vs. ClientRecord.
+
+Registers N synthetic clients in memory (no database) and reports traced bytes per client,
+plus the serialized size each layout writes to the client store (the legacy layout writes the
+full system prompt into every row). Legacy runs are slow to build, so they are capped at
+--legacy-max clients and scaled linearly beyond that; every legacy record is the same deep
+copy, so it grows exactly linearly.
+
+    python bench_memory.py --clients 100000 1000000
+    python bench_memory.py --clients 100000 --legacy-max 100000 --json memory.json
+"""
+import argparse
+import gc
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+import uuid
+from copy import deepcopy
+from datetime import datetime
+
+os.environ.setdefault("RBCAGENT_LOG_LEVEL", "WARNING")
+os.environ.setdefault("RBCAGENT_CLIENTS_DB", os.path.join(tempfile.gettempdir(), "rbcagent-bench-clients.db"))
+
+from level import SYSTEM_PROMPT, TARGET_NOT_SET, ClientRecord
+from store import encode
+
+# The clientInfo template every client was deep-copied from before ClientRecord
+LEGACY_TEMPLATE = {
+    "id": None,
+    "Name": None,
+    "Level": 1,
+    "Exp": 0,
+    "ExpToNextLevel": 100,
+    "streaks": {"Saving": 0, "Investing": 0},
+    "Saving Target": {"Item": TARGET_NOT_SET, "Amount": 0},
+    "Daily Saving Amount": 5,
+    "Messages": [{"role": "system", "content": SYSTEM_PROMPT}],
+    "Last Investment Time": None,
+    "Last Saving Time": None,
+    "Last Quiz Time": None,
+}
+
+
+def legacy_client(client_id: str) -> dict:
+    client = deepcopy(LEGACY_TEMPLATE)
+    client["id"] = client_id
+    client["Last Saving Time"] = datetime.now()
+    return client
+
+
+def compact_client(client_id: str) -> ClientRecord:
+    client = ClientRecord(client_id)
+    client.last_saving = time.time()
+    return client
+
+
+def measure(factory, n: int) -> dict:
+    ids = [str(uuid.uuid4()) for _ in range(n)]  # allocated outside the trace, shared by both layouts
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    clients = {client_id: factory(client_id) for client_id in ids}
+    elapsed = time.perf_counter() - start
+    traced, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    sample = next(iter(clients.values()))
+    serialized = len((sample.dumps() if isinstance(sample, ClientRecord) else encode(sample)).encode())
+    del clients
+    gc.collect()
+    return {"clients": n, "bytes_per_client": traced / n, "total_mb": traced / 2 ** 20,
+            "build_s": elapsed, "serialized_bytes": serialized}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--legacy-max", type=int, default=100_000, help="largest legacy run, bigger sizes are extrapolated")
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    print(f"{'layout':<10}{'clients':>10}{'B/client':>10}{'total MB':>11}{'build s':>9}{'on disk B':>11}")
+    results = []
+    for n in args.clients:
+        for layout, factory in (("dict", legacy_client), ("record", compact_client)):
+            measured = min(n, args.legacy_max) if layout == "dict" else n
+            result = measure(factory, measured)
+            result["layout"] = layout
+            if measured != n:
+                scale = n / measured
+                result.update(clients=n, total_mb=result["total_mb"] * scale, build_s=result["build_s"] * scale, extrapolated=True)
+            results.append(result)
+            note = " *" if result.get("extrapolated") else ""
+            print(f"{layout:<10}{n:>10}{result['bytes_per_client']:>10.0f}{result['total_mb']:>11.1f}"
+                  f"{result['build_s']:>9.2f}{result['serialized_bytes']:>11}{note}")
+    if any(result.get("extrapolated") for result in results):
+        print(f"* scaled from {args.legacy_max} clients")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
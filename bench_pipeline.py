@@ -0,0 +1,113 @@
+"""
+Two-call vs single-call chat pipeline: turn latency, LLM calls and tokens per turn.
+
+Runs the same scripted turns through llama.handle_client in each mode against a local Cohere
+stand-in whose latency grows with the prompt and the generated text, like a real model:
+latency-ms per call plus prefill per input token plus decode per output token. Turns cycle
+through actions whose draft reply can be used (NO_ACTION, DONE_DAILY_SAVING,
+SET_DAILY_SAVING_AMOUNT, NEED_MORE_INFO, whose draft is the question) and one that needs a
+follow-up reply written from server data (GET_PORTFOLIOS).
+
+    python bench_pipeline.py --turns 100 --latency-ms 250 --prefill-ms 0.05 --decode-ms 20
+"""
+import argparse
+import json
+import statistics
+import time
+
+import tempenv
+
+tempenv.setup("rbcagent-pipeline-")
+
+from twilio.twiml.messaging_response import MessagingResponse
+
+import level
+import llama
+from fake_cohere import FakeCohere, estimate_tokens
+
+ACKNOWLEDGEMENT = "Let me pull that up for you."  # draft for actions whose data only the server has
+REPLY = ("Nice work! Putting a little aside every day is how big goals get reached. "
+         "Keep the streak going and you'll level up in no time.")
+# (user message, classifier output); none of the messages are taken by the local intent router
+SCRIPT = [
+    ("what is an ETF exactly", "NO_ACTION"),
+    ("finally put some money aside today, yay", "DONE_DAILY_SAVING"),
+    ("from now on i'd like to put away about five bucks each day", "SET_DAILY_SAVING_AMOUNT | 5"),
+    ("what do i have invested right now", "GET_PORTFOLIOS"),
+    ("i want to invest some money", "NEED_MORE_INFO | How much would you like to invest, and into which portfolio?"),
+]
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(q * (len(ordered) - 1)))]
+
+
+def run(mode: str, turns: int, clients: int, args) -> dict:
+    llama.PIPELINE = mode
+    script = {text: action for text, action in SCRIPT}
+
+    def responder(messages):
+        system = messages[0]["content"]
+        user = next((message["content"] for message in reversed(messages) if message["role"] == "user"), "")
+        if "Respond with a JSON object" in system:
+            action, *params = [part.strip() for part in script.get(user, "NO_ACTION").split("|")]
+            draft = {"GET_PORTFOLIOS": ACKNOWLEDGEMENT, "NEED_MORE_INFO": params[0] if params else REPLY}.get(action, REPLY)
+            text = json.dumps({"action": action, "params": params, "reply": draft})
+        elif "ACTION_NAME" in system:
+            text = script.get(user, "NO_ACTION")
+        elif messages[0]["role"] == "user":  # history summary
+            text = "The user is building a daily saving habit and asked about investing."
+        else:
+            text = REPLY
+        input_tokens = sum(estimate_tokens(message["content"]) for message in messages)
+        time.sleep((input_tokens * args.prefill_ms + estimate_tokens(text) * args.decode_ms) / 1000)
+        return text
+
+    llama.co = co = FakeCohere(latency=args.latency_ms / 1000, responder=responder)
+    ids = [f"pipeline-{mode}-{i}" for i in range(clients)]
+    for clientId in ids:
+        level.register_client(clientId)
+
+    timings = []
+    for n in range(turns):
+        clientId = ids[n % clients]
+        text, _ = SCRIPT[(n // clients) % len(SCRIPT)]
+        start = time.perf_counter()
+        with level.client_lock(clientId):
+            level.get_messages(clientId).append({"role": "user", "content": text})
+            llama.handle_client(clientId, MessagingResponse())
+        timings.append(time.perf_counter() - start)
+    llama.wait_for_compaction()  # summary calls run in the background; count them with their turns
+    return {
+        "mode": mode,
+        "mean_ms": statistics.fmean(timings) * 1000,
+        "p50_ms": percentile(timings, 0.5) * 1000,
+        "p95_ms": percentile(timings, 0.95) * 1000,
+        "calls": co.calls / turns,
+        "input_tokens": co.input_tokens / turns,
+        "output_tokens": co.output_tokens / turns,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=250.0, help="fixed cost of every LLM call")
+    parser.add_argument("--prefill-ms", type=float, default=0.05, help="per input token")
+    parser.add_argument("--decode-ms", type=float, default=20.0, help="per output token")
+    args = parser.parse_args()
+
+    results = [run(mode, args.turns, args.clients, args) for mode in (llama.TWO_CALL, llama.SINGLE_CALL)]
+    print(f"{'mode':<13}{'mean ms':>9}{'p50 ms':>9}{'p95 ms':>9}{'calls':>8}{'in tok':>9}{'out tok':>9}   (per turn)")
+    for r in results:
+        print(f"{r['mode']:<13}{r['mean_ms']:>9.0f}{r['p50_ms']:>9.0f}{r['p95_ms']:>9.0f}"
+              f"{r['calls']:>8.2f}{r['input_tokens']:>9.0f}{r['output_tokens']:>9.0f}")
+    two, single = results
+    print(f"\nsingle_call: {1 - single['mean_ms'] / two['mean_ms']:.0%} lower mean latency, "
+          f"{1 - single['input_tokens'] / two['input_tokens']:.0%} fewer input tokens per turn")
+
+
+if __name__ == "__main__":
+    main()
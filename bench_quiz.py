@@ -0,0 +1,75 @@
+"""
+Per-client quiz generation vs the shared quiz bank: LLM calls and tokens to send a daily quiz
+to every client for a number of days, against a local Cohere stand-in.
+
+    python bench_quiz.py --clients 1000 --days 14 --cohorts 2
+"""
+import argparse
+import os
+import time
+from datetime import date, timedelta
+
+import tempenv
+
+tempenv.setup("rbcagent-quiz-")
+
+import llama
+from fake_cohere import FakeCohere
+from quiz_bank import MIN_UNSERVED, QuizBank, grade
+
+TOPICS = ["stock", "bond", "ETF", "index fund", "emergency fund", "budget", "inflation", "dividend", "credit score", "compound interest"]
+
+
+def responder(messages):
+    prompt = messages[0]["content"]
+    if prompt.startswith("Write "):
+        n = int(prompt.split()[1])
+        start = int(time.perf_counter_ns() % 1_000_000)  # fresh questions every batch
+        return "\n".join(f"Quiz {start + i}: what is a {TOPICS[i % len(TOPICS)]}? | A) Something useful | "
+                         f"B) Something else | A | A {TOPICS[i % len(TOPICS)]} is something useful." for i in range(n))
+    if prompt.startswith("Answer each"):
+        return "\n".join(f"{i}. A" for i in range(1, 200))
+    return "What is a stock? | A) A share in a company | B) A type of bond"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--cohorts", type=int, default=1)
+    args = parser.parse_args()
+    days = [(date.today() + timedelta(days=d)).isoformat() for d in range(args.days)]
+
+    llama.co = co = FakeCohere(responder=responder)
+    start = time.perf_counter()
+    for _ in days:
+        for _ in range(args.clients):
+            llama.generate_quiz()
+    per_client = {"calls": co.calls, "tokens": co.input_tokens + co.output_tokens, "seconds": time.perf_counter() - start}
+
+    co = FakeCohere(responder=responder)
+    bank = QuizBank(os.environ["RBCAGENT_QUIZ_BANK"])
+    start = time.perf_counter()
+    bank.refill(co, len(days) * args.cohorts + MIN_UNSERVED)  # the scheduled `quiz_bank.py generate` run
+    served = set()
+    for day in days:
+        for client in range(args.clients):
+            served.add(bank.today(f"cohort-{client % args.cohorts}", day=day, co_factory=lambda: co)["id"])
+    shared = {"calls": co.calls, "tokens": co.input_tokens + co.output_tokens, "seconds": time.perf_counter() - start}
+
+    quiz = bank.today("cohort-0", day=days[0])
+    answers = ["a", "B", "option a", "I think B.", quiz["options"]["B"], "not sure"] * 10_000
+    start = time.perf_counter()
+    graded = sum(grade(quiz, answer) is not None for answer in answers)
+    grading = (time.perf_counter() - start) / len(answers)
+
+    print(f"{args.clients} clients x {args.days} days, {args.cohorts} cohort(s)")
+    print(f"{'':<12}{'LLM calls':>11}{'tokens':>11}{'local s':>9}")
+    for name, r in (("per-client", per_client), ("quiz bank", shared)):
+        print(f"{name:<12}{r['calls']:>11,}{r['tokens']:>11,}{r['seconds']:>9.2f}")
+    print(f"{len(served)} distinct quizzes served; grading {grading * 1e6:.1f} us/answer locally, "
+          f"{graded / len(answers):.0%} of sample answers graded without the LLM")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Precision and coverage of the local intent router over a labeled corpus.
+
+Each line of the corpus is {"text", "action", "params", "previous"?}: the action (and params,
+null when any are acceptable) the LLM classifier should produce for the message, with the
+assistant message it answers if any. A routed message is correct only if the router picks
+that action and those params; everything the router leaves to the LLM counts as not covered.
+
+    python bench_router.py --corpus intent_corpus.jsonl --llm-latency-ms 900
+    python bench_router.py --min-precision 1.0   # exit non-zero on any false route
+
+Exits non-zero if precision falls below --min-precision.
+"""
+import argparse
+import json
+import sys
+import time
+
+import intent_router
+
+
+def load(path: str) -> list[dict]:
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default="intent_corpus.jsonl")
+    parser.add_argument("--llm-latency-ms", type=float, default=900.0, help="classifier call the router replaces")
+    parser.add_argument("--repeat", type=int, default=200, help="passes over the corpus for the routing latency")
+    parser.add_argument("--min-precision", type=float, default=1.0)
+    args = parser.parse_args()
+
+    corpus = load(args.corpus)
+    routed, correct, false_routes = 0, 0, []
+    by_action = {}
+    for example in corpus:
+        result = intent_router.route(example["text"], example.get("previous"))
+        stats = by_action.setdefault(example["action"], {"examples": 0, "routed": 0})
+        stats["examples"] += 1
+        if result is None:
+            continue
+        routed += 1
+        stats["routed"] += 1
+        action, params = result
+        if action == example["action"] and (example["params"] is None or params == example["params"]):
+            correct += 1
+        else:
+            false_routes.append((example["text"], f"{example['action']} {example['params']}", f"{action} {params}"))
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for example in corpus:
+            intent_router.route(example["text"], example.get("previous"))
+    per_message = (time.perf_counter() - start) / (args.repeat * len(corpus))
+
+    precision = correct / routed if routed else 1.0
+    print(f"{len(corpus)} examples, {routed} routed locally ({routed / len(corpus):.0%} coverage), "
+          f"precision {precision:.1%} ({correct}/{routed})")
+    print(f"routing {per_message * 1e6:.1f} us/message vs {args.llm_latency_ms:.0f} ms per classifier call: "
+          f"{routed * args.llm_latency_ms / 1000:.1f}s of LLM latency saved over the corpus")
+    print(f"\n{'expected action':<26}{'examples':>10}{'routed':>8}")
+    for action, stats in sorted(by_action.items()):
+        print(f"{action:<26}{stats['examples']:>10}{stats['routed']:>8}")
+    if false_routes:
+        print("\nfalse routes:")
+        for text, expected, got in false_routes:
+            print(f"  {text!r}: expected {expected}, routed {got}")
+    sys.exit(1 if precision < args.min_precision else 0)
+
+
+if __name__ == "__main__":
+    main()
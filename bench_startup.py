@@ -0,0 +1,110 @@
+"""
+Cold-start benchmark for the webhook apps.
+
+Each run is a fresh interpreter that imports the app module and serves one request to a
+cheap route, so the number is import-to-ready time as a newly scaled worker sees it. Outbound
+connections are blocked and counted in the child, so any network access at import time shows
+up as an error instead of silently slowing the boot.
+
+    python bench_startup.py --runs 10
+    python bench_startup.py --modules chat_reply --importtime 15
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+CHILD = r"""
+import json, socket, sys, time
+connects = []
+def blocked_connect(self, address):
+    connects.append(str(address))
+    raise OSError("network disabled during startup benchmark")
+socket.socket.connect = blocked_connect
+start = time.perf_counter()
+import importlib
+module = importlib.import_module(sys.argv[1])
+imported = time.perf_counter()
+response = module.app.test_client().get("/metrics")
+ready = time.perf_counter()
+print(json.dumps({"import_ms": (imported - start) * 1000, "ready_ms": (ready - start) * 1000,
+                  "status": response.status_code, "connects": connects}))
+"""
+
+
+def run_once(module: str, env: dict) -> dict:
+    result = subprocess.run([sys.executable, "-c", CHILD, module], env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        return {"error": result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f"exit {result.returncode}"}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def import_profile(module: str, env: dict, top: int) -> list[tuple[int, str]]:
+    """
+    Returns:
+        list: (cumulative microseconds, package) of the slowest top-level imports.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            env=env, capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if cumulative.isdigit() and not name.startswith(" ") and "." not in name.strip():
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--modules", nargs="+", default=["chat_reply", "conversation"])
+    parser.add_argument("--importtime", type=int, default=0, metavar="N", help="also list the N slowest top-level imports")
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="rbcagent-startup-")
+    env = {
+        **os.environ,
+        "RBCAGENT_LOG_LEVEL": os.environ.get("RBCAGENT_LOG_LEVEL", "WARNING"),
+        "RBCAGENT_CLIENTS_DB": os.path.join(workdir, "clients.db"),
+        "RBCAGENT_JOURNAL": os.path.join(workdir, "journal.jsonl"),
+        "RBCAGENT_PORTFOLIOS_FILE": os.path.join(workdir, "portfolios.txt"),
+        "RBCAGENT_LEDGER": os.path.join(workdir, "ledger.jsonl"),
+        "PYTHONPATH": os.path.dirname(os.path.abspath(__file__)),
+    }
+
+    print(f"{'module':<16}{'runs':>6}{'errors':>8}{'import p50':>12}{'ready p50':>12}{'ready max':>12}{'net':>6}")
+    results = {}
+    for module in args.modules:
+        samples = [run_once(module, env) for _ in range(args.runs)]
+        ok = [sample for sample in samples if "error" not in sample]
+        results[module] = {
+            "runs": args.runs,
+            "errors": [sample["error"] for sample in samples if "error" in sample],
+            "import_p50_ms": statistics.median(sample["import_ms"] for sample in ok) if ok else None,
+            "ready_p50_ms": statistics.median(sample["ready_ms"] for sample in ok) if ok else None,
+            "ready_max_ms": max(sample["ready_ms"] for sample in ok) if ok else None,
+            "connects": sum(len(sample["connects"]) for sample in ok),
+        }
+        r = results[module]
+        if ok:
+            print(f"{module:<16}{args.runs:>6}{len(r['errors']):>8}{r['import_p50_ms']:>12.1f}"
+                  f"{r['ready_p50_ms']:>12.1f}{r['ready_max_ms']:>12.1f}{r['connects']:>6}")
+        else:
+            print(f"{module:<16}{args.runs:>6}{len(r['errors']):>8}  {r['errors'][0]}")
+        if args.importtime:
+            for cumulative, name in import_profile(module, env, args.importtime):
+                print(f"    {cumulative / 1000:>8.1f} ms  {name}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark the pooled ClientAPI transport against one-off requests calls.
+
+Replays the GET_PORTFOLIOS path (list_portfolios + get_portfolio per portfolio) against
+a local FakeInvestEase that sleeps once per new connection to stand in for the TCP + TLS
+handshake to the gateway.
+
+    python bench_transport.py --iterations 50 --portfolios 5 --handshake-ms 30
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import time
+
+os.environ.setdefault("RBCAGENT_LOG_LEVEL", "WARNING")
+
+import requests
+
+import api
+from api import ClientAPI, HEADERS
+from fake_investease import FakeInvestEase
+
+LIST_OF_STRATEGIES = ["aggressive_growth", "growth", "balanced", "conservative", "very_conservative"]
+
+
+def unpooled_get_portfolios(client_id: str):
+    # What every ClientAPI call did before: a fresh connection per request
+    portfolios = requests.get(f"{api.BASE_URL}/clients/{client_id}/portfolios", headers=HEADERS).json()
+    return [requests.get(f"{api.BASE_URL}/portfolios/{p['id']}", headers=HEADERS).json() for p in portfolios]
+
+
+def pooled_get_portfolios(client_id: str):
+    portfolios = ClientAPI.list_portfolios(client_id)["data"]
+    return [ClientAPI.get_portfolio(p["id"]) for p in portfolios]
+
+
+def run(label: str, fn, client_id: str, server: FakeInvestEase, iterations: int):
+    connections_before = server.connections
+    timings = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(iterations):
+            start = time.perf_counter()
+            fn(client_id)
+            timings.append(time.perf_counter() - start)
+    timings.sort()
+    print(
+        f"{label:<10} mean {statistics.mean(timings) * 1000:8.2f} ms   "
+        f"p50 {timings[len(timings) // 2] * 1000:8.2f} ms   "
+        f"p95 {timings[int(len(timings) * 0.95) - 1] * 1000:8.2f} ms   "
+        f"connections {server.connections - connections_before}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--portfolios", type=int, default=5)
+    parser.add_argument("--handshake-ms", type=float, default=30.0)
+    args = parser.parse_args()
+
+    server = FakeInvestEase(handshake_delay=args.handshake_ms / 1000).start()
+    api.BASE_URL = server.url
+    api.CACHE_TTLS = {endpoint: 0 for endpoint in api.CACHE_TTLS}  # measure the transport, not the cache
+    client_id = server.add_client("Bench", "bench@example.com", cash=1000.0)
+    for i in range(args.portfolios):
+        server.add_portfolio(client_id, LIST_OF_STRATEGIES[i % len(LIST_OF_STRATEGIES)], 100.0)
+
+    print(f"GET_PORTFOLIOS path, {args.portfolios} portfolios, {args.handshake_ms:.0f} ms simulated handshake")
+    run("unpooled", unpooled_get_portfolios, client_id, server, args.iterations)
+    run("pooled", pooled_get_portfolios, client_id, server, args.iterations)
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
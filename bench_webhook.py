@@ -0,0 +1,116 @@
+"""
+Synchronous vs asynchronous /reply_whatsapp: webhook response time and end-to-end reply latency.
+
+Posts the same burst of messages to the conversation app in both modes, against local
+stand-ins for Cohere and Twilio. In sync mode the reply is in the webhook response; in async
+mode the webhook returns an empty TwiML and the reply arrives through FakeTwilio, so
+end-to-end latency is measured from the post to the out-of-band send. Also checks that every
+reply was delivered and, in async mode, in the order the queue accepted the messages.
+
+    python bench_webhook.py --messages 24 --concurrency 8 --llm-latency-ms 150
+"""
+import argparse
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import tempenv
+
+tempenv.setup("rbcagent-webhook-")
+
+import conversation
+import llama
+import webhook_queue
+from fake_cohere import FakeCohere
+from fake_twilio import FakeTwilio
+
+SENDER = "whatsapp:+15550000000"
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(q * (len(ordered) - 1)))] if ordered else 0.0
+
+
+def responder(messages):
+    if "ACTION_NAME" in messages[0]["content"]:
+        return "NO_ACTION"
+    if messages[0]["role"] == "user":  # history summary
+        return "The user sent numbered test messages."
+    user = next(message["content"] for message in reversed(messages) if message["role"] == "user")
+    return f"reply to {user}"
+
+
+def run(mode_async: bool, args) -> dict:
+    webhook_queue.ASYNC_WEBHOOK = mode_async
+    webhook_queue.twilio_client = twilio = FakeTwilio(latency=args.twilio_latency_ms / 1000)
+    app = conversation.app.test_client()
+    posted, responded = {}, {}
+    lock = threading.Lock()
+    prefix = "async" if mode_async else "sync"
+    queued = []  # async: messages in the order the queue accepted them
+    submit = conversation.webhooks.submit
+
+    def recording_submit(clientId, to, text):
+        with lock:
+            accepted = submit(clientId, to, text)
+            if accepted:
+                queued.append(text)
+            return accepted
+
+    conversation.webhooks.submit = recording_submit
+
+    def post(n: int):
+        text = f"{prefix} message {n}"
+        start = time.perf_counter()
+        with lock:
+            posted[text] = start
+        body = app.post("/reply_whatsapp", data={"Body": text, "From": SENDER}).get_data(as_text=True)
+        with lock:
+            responded[text] = (time.perf_counter() - start, body)
+
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        list(pool.map(post, range(args.messages)))
+    conversation.webhooks.join()
+    conversation.webhooks.submit = submit
+
+    webhook = [seconds for seconds, _ in responded.values()]
+    if mode_async:
+        replies = [(message["time"], re.sub(r"^reply to ", "", message["body"])) for message in twilio.sent]
+    else:
+        replies = [(posted[text] + seconds, text) for text, (seconds, body) in responded.items() if f"reply to {text}" in body]
+    end_to_end = [sent - posted[text] for sent, text in replies if text in posted]
+    delivered_order = [text for _, text in sorted(replies) if text in posted]
+    return {
+        "mode": "async" if mode_async else "sync",
+        "webhook_p50": percentile(webhook, 0.5), "webhook_p95": percentile(webhook, 0.95), "webhook_max": max(webhook),
+        "over_timeout": sum(seconds > args.twilio_timeout for seconds in webhook),
+        "e2e_p50": percentile(end_to_end, 0.5), "e2e_p95": percentile(end_to_end, 0.95),
+        "delivered": len(end_to_end),
+        "in_order": str(delivered_order == queued) if mode_async else "-",
+        "peak_depth": conversation.webhooks.stats()["peak_depth"] if mode_async else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=24)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--llm-latency-ms", type=float, default=150.0)
+    parser.add_argument("--twilio-latency-ms", type=float, default=20.0)
+    parser.add_argument("--twilio-timeout", type=float, default=15.0, help="seconds Twilio waits for a webhook")
+    args = parser.parse_args()
+
+    llama.co = FakeCohere(latency=args.llm_latency_ms / 1000, responder=responder)
+    results = [run(False, args), run(True, args)]
+    print(f"{'mode':<7}{'webhook p50':>13}{'p95':>9}{'max':>9}{'>timeout':>10}{'e2e p50':>10}{'p95':>9}"
+          f"{'delivered':>11}{'in order':>10}{'peak depth':>12}")
+    for r in results:
+        print(f"{r['mode']:<7}{r['webhook_p50'] * 1000:>11.0f}ms{r['webhook_p95'] * 1000:>7.0f}ms{r['webhook_max'] * 1000:>7.0f}ms"
+              f"{r['over_timeout']:>10}{r['e2e_p50'] * 1000:>8.0f}ms{r['e2e_p95'] * 1000:>7.0f}ms"
+              f"{r['delivered']:>7}/{args.messages:<3}{r['in_order']:>10}{r['peak_depth']:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Small thread-safe TTL cache with bounded LRU eviction and per-namespace hit/miss counters,
+plus single-flight coalescing of concurrent identical calls.
+"""
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+
+class TTLCache:
+    def __init__(self, max_entries: int = 10_000, clock=time.monotonic):
+        """
+        Parameters:
+            max_entries (int): Entries kept before the least recently used one is evicted.
+            clock (callable): Monotonic time source, overridable for benchmarks.
+        """
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries = OrderedDict()  # (namespace, key) -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._hits = defaultdict(int)
+        self._misses = defaultdict(int)
+        self._evictions = 0
+        self.epoch = 0  # bumped by every invalidation so in-flight reads can detect them
+
+    def get(self, namespace: str, key):
+        """
+        Return the cached value, or None if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is None or entry[0] <= self._clock():
+                if entry is not None:
+                    del self._entries[(namespace, key)]
+                self._misses[namespace] += 1
+                return None
+            self._entries.move_to_end((namespace, key))
+            self._hits[namespace] += 1
+            return entry[1]
+
+    def set(self, namespace: str, key, value, ttl: float):
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._store(namespace, key, value, ttl)
+
+    def set_if_epoch(self, namespace: str, key, value, ttl: float, epoch: int) -> bool:
+        """
+        Store the value only if nothing was invalidated since `epoch` was read,
+        so a read that raced with a write never caches the pre-write result.
+        """
+        if ttl <= 0:
+            return False
+        with self._lock:
+            if self.epoch != epoch:
+                return False
+            self._store(namespace, key, value, ttl)
+            return True
+
+    def _store(self, namespace: str, key, value, ttl: float):
+        self._entries[(namespace, key)] = (self._clock() + ttl, value)
+        self._entries.move_to_end((namespace, key))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def delete(self, namespace: str, key):
+        with self._lock:
+            self.epoch += 1
+            self._entries.pop((namespace, key), None)
+
+    def delete_namespace(self, namespace: str):
+        with self._lock:
+            self.epoch += 1
+            for entry_key in [k for k in self._entries if k[0] == namespace]:
+                del self._entries[entry_key]
+
+    def clear(self):
+        with self._lock:
+            self.epoch += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: Per-namespace hits, misses and hit rate, plus current size and evictions.
+        """
+        with self._lock:
+            namespaces = {}
+            for namespace in set(self._hits) | set(self._misses):
+                hits, misses = self._hits[namespace], self._misses[namespace]
+                namespaces[namespace] = {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+                }
+            return {"size": len(self._entries), "evictions": self._evictions, "namespaces": namespaces}
+
+    def reset_stats(self):
+        with self._lock:
+            self._hits.clear()
+            self._misses.clear()
+            self._evictions = 0
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key: the first caller runs the function,
+    everyone arriving while it is in flight waits and receives the same result (or exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> _Call
+        self.leaders = 0
+        self.shared = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def forget(self, key):
+        """
+        Detach an in-flight call so later callers start a new one, e.g. after a write
+        made its result stale. Callers already waiting still receive it.
+        """
+        with self._lock:
+            self._calls.pop(key, None)
+
+    def forget_where(self, predicate):
+        with self._lock:
+            for key in [k for k in self._calls if predicate(k)]:
+                del self._calls[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"in_flight": len(self._calls), "leaders": self.leaders, "shared": self.shared}
@@ -4,8 +4,11 @@ from twilio.twiml.messaging_response import MessagingResponse
 # Import your existing game logic
 from level import register_client, get_client_info, get_messages, get_streaks, get_target, ID, __clients
 from llama import check_action, handle_client, daily_quiz, daily_ask_if_done_saving
+from routes import run_turn, shared, webhooks
+import webhook_queue
 
 app = Flask(__name__)
+app.register_blueprint(shared)
 
 # --- Initialize one test client (like in developer_play) ---
 clientId = ID
@@ -31,19 +34,11 @@ def reply_whatsapp():
         resp.message(f"Client Info: {info}")
         return Response(str(resp), mimetype='text/xml')
 
-    # Store user message
-    messages = get_messages(clientId)
-    messages.append({"role": "user", "content": incoming_msg})
-
-    # Get AI response (calls your llama handler)
-    ai_response = handle_client(clientId, resp)
-
-    # Send back Twilio message
-    if ai_response:
-        resp.message(ai_response)
-    else:
-        resp.message("Hmm, I didn’t quite get that. Try again!")
+    # Reply out of band when enabled: Twilio gets an empty TwiML now, the reply is sent by a worker
+    if webhook_queue.ASYNC_WEBHOOK and user_number and webhooks.submit(clientId, user_number, incoming_msg):
+        return Response(str(resp), mimetype='text/xml')
 
+    run_turn(clientId, incoming_msg, resp)
     return Response(str(resp), mimetype='text/xml')
 
 
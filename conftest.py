@@ -0,0 +1,21 @@
+"""
+Shared pytest setup: every test session gets throwaway state files (see tempenv.py), set
+before any test module imports level or llama, and an InvestEase stand-in fixture.
+"""
+import pytest
+
+import tempenv
+
+tempenv.setup("rbcagent-test-")
+
+
+@pytest.fixture
+def server():
+    import api
+    from fake_investease import FakeInvestEase
+
+    server = FakeInvestEase().start()
+    base_url, api.BASE_URL = api.BASE_URL, server.url
+    yield server
+    api.BASE_URL = base_url
+    server.stop()
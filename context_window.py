@@ -0,0 +1,122 @@
+"""
+Token-budgeted conversation window with a rolling summary.
+
+Each LLM call gets its system prompt, the rolling summary of older turns, and as many of the
+latest turns (at most keep_turns, newest first) as fit in its token budget. Once a client's
+history grows past the longest window plus FOLD_AFTER turns, the turns no window will send
+again are folded into the summary with one LLM call and dropped from the stored history, so
+both the per-call prompt and the stored record stay bounded.
+
+Environment:
+    RBCAGENT_CLASSIFY_TOKENS    prompt budget of the action-classification call (default 3000)
+    RBCAGENT_REPLY_TOKENS       prompt budget of the reply call (default 4000)
+    RBCAGENT_STRUCTURED_TOKENS  prompt budget of the single action-plus-reply call (default 5000)
+"""
+import os
+
+CHARS_PER_TOKEN = 4  # rough English average, no tokenizer needed
+MESSAGE_OVERHEAD = 4  # role and separators per message
+SUMMARY_TOKENS = 300  # cap on the rolling summary
+FOLD_AFTER = 4  # extra turns kept before folding, so one summary call covers several turns
+SUMMARY_PREFIX = "Summary of the earlier conversation: "
+
+
+class Budget:
+    __slots__ = ("name", "tokens", "keep_turns")
+
+    def __init__(self, name: str, tokens: int, keep_turns: int):
+        """
+        Parameters:
+            name (str): Call name, used in metrics.
+            tokens (int): Prompt budget, system prompt and summary included.
+            keep_turns (int): Most recent turns sent verbatim, budget permitting.
+        """
+        self.name = name
+        self.tokens = tokens
+        self.keep_turns = keep_turns
+
+
+CLASSIFY = Budget("classify", int(os.getenv("RBCAGENT_CLASSIFY_TOKENS", "3000")), keep_turns=3)
+REPLY = Budget("reply", int(os.getenv("RBCAGENT_REPLY_TOKENS", "4000")), keep_turns=6)
+STRUCTURED = Budget("structured", int(os.getenv("RBCAGENT_STRUCTURED_TOKENS", "5000")), keep_turns=6)
+FOLD_KEEP = max(CLASSIFY.keep_turns, REPLY.keep_turns, STRUCTURED.keep_turns)
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def message_tokens(message: dict) -> int:
+    return estimate_tokens(message["content"]) + MESSAGE_OVERHEAD
+
+
+def split_turns(history: list[dict]) -> list[list[dict]]:
+    """
+    Group messages (system prompt excluded) into turns, each starting at a user message.
+    Messages before the first user message (e.g. a quiz sent unprompted) form their own turn.
+    """
+    turns = []
+    for message in history:
+        if message["role"] == "user" or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def build(system: dict, summary: str, history: list[dict], budget: Budget) -> list[dict]:
+    """
+    Messages for one LLM call: system prompt, summary, then the newest turns that fit.
+    The latest turn is always sent, even if it alone is over budget.
+
+    Parameters:
+        system (dict): System message for this call.
+        summary (str): Rolling summary of folded turns ("" if none).
+        history (list[dict]): Stored messages after the system prompt.
+        budget (Budget): Budget of the call.
+    """
+    head = [system]
+    if summary:
+        head.append({"role": "system", "content": SUMMARY_PREFIX + summary})
+    remaining = budget.tokens - sum(message_tokens(message) for message in head)
+    kept = []
+    for turn in reversed(split_turns(history)[-budget.keep_turns:]):
+        tokens = sum(message_tokens(message) for message in turn)
+        if kept and tokens > remaining:
+            break
+        kept.append(turn)
+        remaining -= tokens
+    return head + [message for turn in reversed(kept) for message in turn]
+
+
+def window_tokens(messages: list[dict]) -> int:
+    return sum(message_tokens(message) for message in messages)
+
+
+def foldable(history: list[dict]) -> int:
+    """
+    Returns:
+        int: Number of leading history messages to fold into the summary, 0 if not due yet.
+    """
+    turns = split_turns(history)
+    if len(turns) <= FOLD_KEEP + FOLD_AFTER:
+        return 0
+    return sum(len(turn) for turn in turns[:-FOLD_KEEP])
+
+
+def summary_prompt(summary: str, messages: list[dict]) -> list[dict]:
+    """
+    Prompt asking the LLM to extend the rolling summary with the folded messages.
+    """
+    transcript = "\n".join(f"{message['role']}: {message['content']}" for message in messages)
+    return [{
+        "role": "user",
+        "content": (
+            "Update the running summary of a conversation between a youth saving and investing assistant and its user. "
+            f"Keep facts that matter later: goals, amounts, decisions, pending questions. At most {SUMMARY_TOKENS * 3 // 4} words, plain text, no preamble.\n\n"
+            f"Current summary: {summary or '(none)'}\n\nNew messages:\n{transcript}"
+        ),
+    }]
+
+
+def clip_summary(text: str) -> str:
+    return text.strip()[:SUMMARY_TOKENS * CHARS_PER_TOKEN]
@@ -2,15 +2,41 @@ from flask import Flask, request, Response
 from twilio.twiml.messaging_response import MessagingResponse
 # Import your existing game logic
 from level import register_client, get_client_info, get_messages, get_streaks, get_target, ID, __clients
+from level import get_leaderboard, get_leaderboard_around, get_leaderboard_size, get_rank
 from llama import check_action, handle_client, daily_quiz, daily_ask_if_done_saving
+from routes import run_turn, shared, webhooks
+import webhook_queue
 
 app = Flask(__name__)
+app.register_blueprint(shared)
 
 # --- Initialize one test client (like in developer_play) ---
 clientId = ID
 register_client(clientId)
 
 
+LEADERBOARD_TOP = 5
+
+
+def format_leaderboard(clientId, weekly: bool = False) -> str:
+    """Top players, then the client's own rank with the players just above and below"""
+    def line(entry):
+        name = "You" if entry["member"] == clientId else (entry["name"] or "Player")
+        if weekly:
+            return f"{entry['rank']}. {name} ({entry['score'][0]} exp this week)"
+        return f"{entry['rank']}. {name} (Level: {entry['score'][0]}, Exp: {entry['score'][1]})"
+
+    top = get_leaderboard(LEADERBOARD_TOP, weekly)
+    lines = ["🏆 Weekly Leaderboard:" if weekly else "🏆 Leaderboard:"] + [line(entry) for entry in top]
+    rank = get_rank(clientId, weekly)
+    if rank is None:
+        lines.append("Earn some exp to get on the board!" if weekly else "You are not ranked yet.")
+    elif rank > LEADERBOARD_TOP:
+        lines.append(f"\nYou are #{rank} of {get_leaderboard_size(weekly)}:")
+        lines += [line(entry) for entry in get_leaderboard_around(clientId, 1, weekly) if entry["rank"] > LEADERBOARD_TOP]
+    return "\n".join(lines)
+
+
 @app.route("/reply_whatsapp", methods=['POST'])
 def reply_whatsapp():
     """Handle incoming WhatsApp messages from Twilio"""
@@ -31,23 +57,14 @@ def reply_whatsapp():
         return Response(str(resp), mimetype='text/xml')
     
     if "leaderboard" in incoming_msg.lower():
-        leaderboard = f"🏆 Leaderboard:\n1. John Doe (Level: {__clients[ID]['Level']}) \n2. Daniel (Level: 1)"
-        resp.message(leaderboard)
+        resp.message(format_leaderboard(clientId, weekly="week" in incoming_msg.lower()))
         return Response(str(resp), mimetype='text/xml')
 
-    # Store user message
-    messages = get_messages(clientId)
-    messages.append({"role": "user", "content": incoming_msg})
-
-    # Get AI response (calls your llama handler)
-    ai_response = handle_client(clientId, resp)
-
-    # Send back Twilio message
-    if ai_response:
-        resp.message(ai_response)
-    else:
-        resp.message("Hmm, I didn’t quite get that. Try again!")
+    # Reply out of band when enabled: Twilio gets an empty TwiML now, the reply is sent by a worker
+    if webhook_queue.ASYNC_WEBHOOK and user_number and webhooks.submit(clientId, user_number, incoming_msg):
+        return Response(str(resp), mimetype='text/xml')
 
+    run_turn(clientId, incoming_msg, resp)
     return Response(str(resp), mimetype='text/xml')
 
 
@@ -0,0 +1,59 @@
+"""
+Local stand-in for cohere.ClientV2 so the chat pipeline can be benchmarked without the LLM.
+
+    llama.co = FakeCohere(latency=0.4, action="GET_PORTFOLIOS")
+"""
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+
+def estimate_tokens(text: str) -> int:
+    # Rough English average of ~4 characters per token
+    return max(1, len(text) // 4)
+
+
+class FakeCohere:
+    def __init__(self, latency: float = 0.0, action: str = "NO_ACTION", reply: str = "Sure, done!", responder=None):
+        """
+        Parameters:
+            latency (float): Seconds slept per chat call.
+            action (str): Reply to action-classification calls (system prompt asking for ACTION_NAME).
+                Structured calls (response_format set) get it as {"action", "params", "reply"} JSON.
+            reply (str): Reply to every other call.
+            responder (callable): Optional fn(messages) -> str overriding both.
+        """
+        self.latency = latency
+        self.action = action
+        self.reply = reply
+        self.responder = responder
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self._lock = threading.Lock()
+
+    def chat(self, model: str, messages: list[dict], **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.responder is not None:
+            text = self.responder(messages)
+        elif kwargs.get("response_format") is not None:
+            action, *params = [part.strip() for part in self.action.split("|")]
+            text = json.dumps({"action": action, "params": params, "reply": self.reply})
+        elif messages and "ACTION_NAME" in messages[0]["content"]:
+            text = self.action
+        else:
+            text = self.reply
+
+        input_tokens = sum(estimate_tokens(message["content"]) for message in messages)
+        output_tokens = estimate_tokens(text)
+        with self._lock:
+            self.calls += 1
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+        tokens = SimpleNamespace(input_tokens=input_tokens, output_tokens=output_tokens)
+        return SimpleNamespace(
+            message=SimpleNamespace(content=[SimpleNamespace(type="text", text=text)]),
+            usage=SimpleNamespace(tokens=tokens, billed_units=tokens),
+        )
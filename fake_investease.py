@@ -0,0 +1,312 @@
+"""
+Local stand-in for the InvestEase gateway so ClientAPI can be exercised without the remote API.
+Implements every route ClientAPI uses, with injectable latency and error rates.
+
+    server = FakeInvestEase(latency=0.05, error_rate=0.01).start()
+    api.BASE_URL = server.url
+    ...
+    server.stop()
+"""
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Annual return per strategy used for analysis and simulation answers
+STRATEGY_RETURNS = {
+    "aggressive_growth": 0.12,
+    "growth": 0.09,
+    "balanced": 0.07,
+    "conservative": 0.05,
+    "very_conservative": 0.03,
+}
+
+
+class FakeInvestEase:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, handshake_delay: float = 0.0,
+                 latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 route_latency: dict = None, route_error_rate: dict = None, quota: float = None,
+                 lost_response_rate: float = 0.0, seed: int = None):
+        """
+        Parameters:
+            host (str): Interface to bind.
+            port (int): Port to bind, 0 picks a free one.
+            handshake_delay (float): Seconds slept once per new connection, standing in
+                for the TCP + TLS handshake to the real gateway.
+            latency (float): Seconds slept before answering each request.
+            jitter (float): Extra uniform random delay (seconds) added to each request.
+            error_rate (float): Probability of answering a request with a 503.
+            route_latency (dict): Per-route latency overrides, keyed by route name (e.g. "get_portfolio").
+            route_error_rate (dict): Per-route error rate overrides, keyed by route name.
+            quota (float): Requests per second allowed before answering 429 with Retry-After,
+                like the per-team limit on the real gateway. None disables it.
+            lost_response_rate (float): Probability that a write is applied but answered with a 503,
+                standing in for a response lost after the gateway committed the change.
+            seed (int): Seed for the latency and error randomness.
+        """
+        self.clients = {}
+        self.portfolios = {}
+        self.handshake_delay = handshake_delay
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.route_latency = route_latency or {}
+        self.route_error_rate = route_error_rate or {}
+        self.connections = 0
+        self.requests = 0
+        self.requests_by_route = {}
+        self.quota = quota
+        self.lost_response_rate = lost_response_rate
+        self.lost_responses = 0
+        self.throttled = 0
+        self._quota_tokens = quota or 0.0
+        self._quota_updated = time.monotonic()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    # Seeding helpers
+    def add_client(self, name: str, email: str, cash: float = 0.0, client_id: str = None) -> str:
+        client_id = client_id or str(uuid.uuid4())
+        self.clients[client_id] = {"id": client_id, "name": name, "email": email, "cash": cash, "portfolios": []}
+        return client_id
+
+    def add_portfolio(self, client_id: str, portfolio_type: str, amount: float, portfolio_id: str = None) -> str:
+        portfolio_id = portfolio_id or str(uuid.uuid4())
+        self.portfolios[portfolio_id] = {
+            "id": portfolio_id,
+            "clientId": client_id,
+            "type": portfolio_type,
+            "invested_amount": amount,
+            "current_value": amount,
+        }
+        self.clients[client_id]["portfolios"].append(portfolio_id)
+        return portfolio_id
+
+    # Routes, named after the ClientAPI method that calls them
+    def create_client(self, body):
+        if not body.get("name") or not body.get("email"):
+            return 400, {"message": "name and email are required"}
+        if any(client["email"] == body["email"] for client in self.clients.values()):
+            return 409, {"message": f"Client with email {body['email']} already exists"}
+        client_id = self.add_client(body["name"], body["email"], float(body.get("cash", 0.0)))
+        return 201, self.clients[client_id]
+
+    def get_client(self, client_id):
+        client = self.clients.get(client_id)
+        if client is None:
+            return 404, {"message": f"Client {client_id} not found"}
+        return 200, client
+
+    def update_client(self, client_id, body):
+        client = self.clients.get(client_id)
+        if client is None:
+            return 404, {"message": f"Client {client_id} not found"}
+        for field in ("name", "email"):
+            if body.get(field):
+                client[field] = body[field]
+        return 200, client
+
+    def deposit(self, client_id, body):
+        client = self.clients.get(client_id)
+        if client is None:
+            return 404, {"message": f"Client {client_id} not found"}
+        amount = float(body.get("amount", 0))
+        if amount <= 0:
+            return 400, {"message": "Amount must be positive"}
+        client["cash"] += amount
+        return 200, client
+
+    def create_portfolio(self, client_id, body):
+        client = self.clients.get(client_id)
+        if client is None:
+            return 404, {"message": f"Client {client_id} not found"}
+        amount = float(body.get("initialAmount", 0))
+        if body.get("type") not in STRATEGY_RETURNS:
+            return 400, {"message": f"Invalid portfolio type {body.get('type')}"}
+        if amount > client["cash"]:
+            return 400, {"message": "Insufficient cash"}
+        client["cash"] -= amount
+        portfolio_id = self.add_portfolio(client_id, body["type"], amount)
+        return 201, self.portfolios[portfolio_id]
+
+    def list_portfolios(self, client_id):
+        client = self.clients.get(client_id)
+        if client is None:
+            return 404, {"message": f"Client {client_id} not found"}
+        return 200, [self.portfolios[pid] for pid in client["portfolios"]]
+
+    def get_portfolio(self, portfolio_id):
+        portfolio = self.portfolios.get(portfolio_id)
+        if portfolio is None:
+            return 404, {"message": f"Portfolio {portfolio_id} not found"}
+        return 200, portfolio
+
+    def transfer_to_portfolio(self, portfolio_id, body):
+        portfolio = self.portfolios.get(portfolio_id)
+        if portfolio is None:
+            return 404, {"message": f"Portfolio {portfolio_id} not found"}
+        client = self.clients[portfolio["clientId"]]
+        amount = float(body.get("amount", 0))
+        if amount <= 0 or amount > client["cash"]:
+            return 400, {"message": "Invalid amount or insufficient cash"}
+        client["cash"] -= amount
+        portfolio["invested_amount"] += amount
+        portfolio["current_value"] += amount
+        return 200, {"portfolio": portfolio, "client_cash": client["cash"]}
+
+    def withdraw_from_portfolio(self, portfolio_id, body):
+        portfolio = self.portfolios.get(portfolio_id)
+        if portfolio is None:
+            return 404, {"message": f"Portfolio {portfolio_id} not found"}
+        client = self.clients[portfolio["clientId"]]
+        amount = float(body.get("amount", 0))
+        if amount <= 0 or amount > portfolio["current_value"]:
+            return 400, {"message": "Invalid amount or insufficient funds in portfolio"}
+        client["cash"] += amount
+        portfolio["invested_amount"] = max(0.0, portfolio["invested_amount"] - amount)
+        portfolio["current_value"] -= amount
+        return 200, {"portfolio": portfolio, "client_cash": client["cash"]}
+
+    def get_portfolio_analysis(self, portfolio_id):
+        portfolio = self.portfolios.get(portfolio_id)
+        if portfolio is None:
+            return 404, {"message": f"Portfolio {portfolio_id} not found"}
+        annual = STRATEGY_RETURNS[portfolio["type"]]
+        return 200, {
+            "portfolioId": portfolio_id,
+            "type": portfolio["type"],
+            "trailingReturns": {"1Month": annual / 12, "3Month": annual / 4, "1Year": annual},
+            "calendarReturns": {"2023": annual * 1.1, "2024": annual * 0.9},
+        }
+
+    def simulate_portfolios(self, client_id, body):
+        client = self.clients.get(client_id)
+        if client is None:
+            return 404, {"message": f"Client {client_id} not found"}
+        months = int(body.get("months", 0))
+        if months < 1 or months > 12:
+            return 400, {"message": "Months must be between 1 and 12"}
+        results = []
+        for portfolio_id in client["portfolios"]:
+            portfolio = self.portfolios[portfolio_id]
+            growth = (1 + STRATEGY_RETURNS[portfolio["type"]]) ** (months / 12)
+            results.append({
+                "portfolioId": portfolio_id,
+                "strategy": portfolio["type"],
+                "initialValue": portfolio["current_value"],
+                "projectedValue": round(portfolio["current_value"] * growth, 2),
+            })
+        return 200, {"months": months, "results": results}
+
+    def routes(self):
+        return [
+            ("POST", r"/clients", self.create_client),
+            ("GET", r"/clients/([^/]+)", self.get_client),
+            ("PUT", r"/clients/([^/]+)", self.update_client),
+            ("POST", r"/clients/([^/]+)/deposit", self.deposit),
+            ("POST", r"/clients/([^/]+)/portfolios", self.create_portfolio),
+            ("GET", r"/clients/([^/]+)/portfolios", self.list_portfolios),
+            ("POST", r"/clients/([^/]+)/simulate", self.simulate_portfolios),
+            ("GET", r"/portfolios/([^/]+)", self.get_portfolio),
+            ("POST", r"/portfolios/([^/]+)/transfer", self.transfer_to_portfolio),
+            ("POST", r"/portfolios/([^/]+)/withdraw", self.withdraw_from_portfolio),
+            ("GET", r"/portfolios/([^/]+)/analysis", self.get_portfolio_analysis),
+        ]
+
+    def _over_quota(self) -> float | None:
+        # Called under self._lock. Returns Retry-After seconds when the request is throttled.
+        if not self.quota:
+            return None
+        now = time.monotonic()
+        self._quota_tokens = min(self.quota, self._quota_tokens + (now - self._quota_updated) * self.quota)
+        self._quota_updated = now
+        if self._quota_tokens >= 1:
+            self._quota_tokens -= 1
+            return None
+        self.throttled += 1
+        return (1 - self._quota_tokens) / self.quota
+
+    def dispatch(self, method: str, path: str, body: dict):
+        for route_method, pattern, handler in self.routes():
+            match = re.fullmatch(pattern, path)
+            if route_method == method and match:
+                break
+        else:
+            return 404, {"message": f"No route for {method} {path}"}
+
+        name = handler.__name__
+        with self._lock:
+            retry_after = self._over_quota()
+            if retry_after is not None:
+                return 429, {"message": "Too many requests"}, {"Retry-After": f"{retry_after:.2f}"}
+            self.requests += 1
+            self.requests_by_route[name] = self.requests_by_route.get(name, 0) + 1
+            delay = self.route_latency.get(name, self.latency) + self._random.uniform(0, self.jitter)
+            fail = self._random.random() < self.route_error_rate.get(name, self.error_rate)
+            lose = method != "GET" and self._random.random() < self.lost_response_rate
+        if delay:
+            time.sleep(delay)
+        if fail:
+            return 503, {"message": "Service temporarily unavailable (injected)"}
+        with self._lock:
+            if method == "GET":
+                return handler(*match.groups())
+            result = handler(*match.groups(), body)
+            if lose:
+                self.lost_responses += 1
+                return 503, {"message": "Upstream response lost (injected)"}
+            return result
+
+
+def _make_handler(fake: FakeInvestEase):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+        disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+        def setup(self):
+            super().setup()
+            with fake._lock:
+                fake.connections += 1
+            if fake.handshake_delay:
+                time.sleep(fake.handshake_delay)
+
+        def _handle(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length)) if length else {}
+            status, data, *extra = fake.dispatch(self.command, self.path, body)
+            payload = json.dumps(data).encode()
+            self.send_response(status)
+            for header, value in (extra[0] if extra else {}).items():
+                self.send_header(header, value)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        do_GET = do_POST = do_PUT = _handle
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
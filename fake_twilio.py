@@ -0,0 +1,43 @@
+"""
+Local stand-in for twilio.rest.Client so out-of-band replies can be tested without Twilio.
+
+    webhook_queue.twilio_client = fake = FakeTwilio(latency=0.1)
+    ...
+    fake.sent  # [{"from_", "to", "body", "time"}, ...] in send order
+"""
+import itertools
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+
+class FakeTwilio:
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, seed: int = None):
+        """
+        Parameters:
+            latency (float): Seconds slept per messages.create call.
+            error_rate (float): Share of sends that raise, like a Twilio API error.
+            seed (int): Error random seed.
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.sent = []
+        self.messages = SimpleNamespace(create=self._create)
+        self._random = random.Random(seed)
+        self._sids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _create(self, to: str, body: str, from_: str = None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            if self._random.random() < self.error_rate:
+                raise RuntimeError("FakeTwilio: injected send failure")
+            sid = f"SM{next(self._sids):032d}"
+            self.sent.append({"sid": sid, "from_": from_, "to": to, "body": body, "time": time.perf_counter()})
+        return SimpleNamespace(sid=sid, status="queued", to=to, body=body)
+
+    def bodies(self, to: str = None) -> list[str]:
+        with self._lock:
+            return [message["body"] for message in self.sent if to is None or message["to"] == to]
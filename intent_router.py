@@ -0,0 +1,155 @@
+"""
+Local fast path for unambiguous commands, tried before the LLM action classifier.
+
+Each rule is a full-message regular expression over the normalized text, so a message is
+routed only when the whole of it is a known phrasing ("i saved today", "save $5 a day",
+"withdraw 20 from <portfolio id>"). Anything with a negation, a question about the future,
+or more than one request falls through to check_action's LLM call. Routed turns skip one
+LLM round trip; stats() reports hit rates and the classifier latency saved.
+
+Environment:
+    RBCAGENT_INTENT_ROUTER  set to 0 to always use the LLM classifier
+
+    python bench_router.py   # precision and coverage over intent_corpus.jsonl
+"""
+import os
+import re
+import threading
+
+ENABLED = os.getenv("RBCAGENT_INTENT_ROUTER", "1") != "0"
+LATENCY_SMOOTHING = 0.1  # weight of each new sample in the classifier latency average
+
+AMOUNT = r"\$?(?P<amount>\d{1,7}(?:\.\d{1,2})?)(?: ?(?:dollars?|bucks|cad|usd))?"
+PORTFOLIO_ID = r"(?:portfolio )?(?:id )?(?P<portfolio>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})"
+ITEM = r"(?P<item>[a-z][a-z ]{1,30}?)"  # 1-30 letters, e.g. "new bike"
+PER_DAY = r"(?:daily|a day|per day|every day|each day|everyday)"
+NEGATION = re.compile(r"\b(?:not|no|never|didn'?t|haven'?t|hasn'?t|won'?t|can'?t|don'?t|forgot|tomorrow|yet|if|should|how|why|when)\b")
+POLITE = r"(?:please |pls |can you |could you )?"
+SAVING_REMINDER = "Daily Ask If Done Saving:"
+
+# (action, phrasings, params builder); a message is routed only if exactly one action matches
+RULES = [
+    ("GET_INFO", [
+        r"(?:show |what'?s |what is |check )?(?:me )?(?:my )?(?:level|stats|info|profile|progress|exp|xp|streaks?)\??",
+        r"what level am i(?: on| at)?\??",
+    ], None),
+    ("GET_PORTFOLIOS", [
+        r"(?:show |list |see |view )?(?:me )?(?:all )?(?:of )?my portfolios?\??",
+        r"list portfolios",
+    ], None),
+    ("DONE_DAILY_SAVING", [
+        r"(?:i )?(?:just |already )?(?:saved|have saved|'ve saved|did my saving|did my daily saving|completed my daily saving)"
+        r"(?: my)?(?: daily)?(?: saving| " + AMOUNT + r")?(?: for)?(?: today)?",
+        r"(?:my )?(?:daily )?saving (?:is )?done(?: for)?(?: today)?",
+        r"done saving(?: for)?(?: today)?",
+    ], None),
+    ("DONE_WEEKLY_INVEST", [
+        r"(?:i )?(?:just |already )?(?:did|completed|made|finished|done) (?:my |the )?weekly invest(?:ment|ing)?(?: for)?(?: this week)?",
+        r"(?:my )?weekly invest(?:ment|ing)? (?:is )?done",
+        r"i (?:have |'ve )?invested this week",
+    ], None),
+    ("SET_DAILY_SAVING_AMOUNT", [
+        r"(?:i want to |i'?ll |i will |let me |let'?s )?save " + AMOUNT + " " + PER_DAY,
+        r"(?:set|change|update) (?:my )?daily savings?(?: amount)? to " + AMOUNT,
+        r"(?:my )?daily savings?(?: amount)? (?:is|=|:) ?" + AMOUNT,
+    ], lambda m: [_number(m["amount"])]),
+    ("SET_TARGET_ITEM", [
+        r"(?:i want to |i'?m |i am )?(?:save|saving) (?:up )?" + AMOUNT + r" (?:for|to buy) (?:a |an |the |my )?" + ITEM,
+        r"(?:set |change |update )?(?:my )?(?:saving |savings )?target (?:to |is )?(?:a |an |the )?" + ITEM + r" (?:for|of|at) " + AMOUNT,
+    ], lambda m: [m["item"].strip(), _number(m["amount"])]),
+    ("WITHDRAW", [
+        POLITE + r"withdraw " + AMOUNT + r" from " + PORTFOLIO_ID,
+    ], lambda m: [_number(m["amount"]), m["portfolio"]]),
+    ("TRANSFER", [
+        POLITE + r"(?:transfer|invest|put|move|deposit) " + AMOUNT + r" (?:in|into|to) " + PORTFOLIO_ID,
+    ], lambda m: [_number(m["amount"]), m["portfolio"]]),
+    ("NO_ACTION", [
+        r"(?:hi|hello|hey|yo|thanks|thank you|thx|ty|ok|okay|cool|great|nice|good morning|good night|bye)(?: there)?",
+    ], None),
+]
+RULES = [(action, [re.compile(phrasing) for phrasing in phrasings], build) for action, phrasings, build in RULES]
+YES = re.compile(r"(?:yes|yep|yeah|yup|y|done|i did)(?: i did)?")
+
+
+def _number(text: str) -> str:
+    value = float(text)
+    return str(int(value)) if value.is_integer() else str(value)
+
+
+def normalize(text: str) -> str:
+    text = text.strip().lower().replace("’", "'")
+    text = re.sub(r"[.!,]+$", "", text)
+    return re.sub(r"\s+", " ", text)
+
+
+def route(text: str, previous: str = None) -> tuple[str, list[str]] | None:
+    """
+    Parameters:
+        text (str): The user's message.
+        previous (str): The assistant message it answers, if any.
+
+    Returns:
+        tuple: (action, params) for do_action, or None to ask the LLM.
+    """
+    if not ENABLED:
+        return None
+    text = normalize(text)
+    if previous is not None and previous.startswith(SAVING_REMINDER) and YES.fullmatch(text):
+        return "DONE_DAILY_SAVING", []
+    if not text or NEGATION.search(text):
+        return None
+    matches = []
+    for action, phrasings, build in RULES:
+        match = next((m for phrasing in phrasings if (m := phrasing.fullmatch(text))), None)
+        if match is not None:
+            matches.append((action, build(match) if build else []))
+    return matches[0] if len(matches) == 1 else None  # ambiguous phrasing goes to the LLM
+
+
+class RouterStats:
+    def __init__(self):
+        self.hits = {}  # action -> routed messages
+        self.misses = 0
+        self.llm_latency = None  # moving average of the classifier call, seconds
+        self._lock = threading.Lock()
+
+    def hit(self, action: str):
+        with self._lock:
+            self.hits[action] = self.hits.get(action, 0) + 1
+
+    def miss(self, llm_seconds: float):
+        with self._lock:
+            self.misses += 1
+            self.llm_latency = llm_seconds if self.llm_latency is None else \
+                self.llm_latency + LATENCY_SMOOTHING * (llm_seconds - self.llm_latency)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            routed = sum(self.hits.values())
+            total = routed + self.misses
+            return {
+                "routed": routed,
+                "to_llm": self.misses,
+                "hit_rate": routed / total if total else 0.0,
+                "by_action": dict(self.hits),
+                "llm_latency_avg": self.llm_latency,
+                "latency_saved_seconds": routed * (self.llm_latency or 0.0),
+            }
+
+
+_stats = RouterStats()
+
+
+def routed(action: str):
+    _stats.hit(action)
+
+
+def classified(llm_seconds: float):
+    """
+    Record a message that went to the LLM classifier, and how long the call took.
+    """
+    _stats.miss(llm_seconds)
+
+
+def stats() -> dict:
+    return _stats.snapshot()
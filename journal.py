@@ -0,0 +1,161 @@
+"""
+Durable write-ahead journal for money-moving ClientAPI calls.
+
+Every transfer, withdrawal, deposit and portfolio creation is recorded as "pending" (with the
+balance it started from) and fsynced before the request leaves, then closed with its outcome.
+A call that timed out, or was cut short by a crash, can then be reconciled against the gateway
+to learn whether it landed, so it is retried only when it provably did not.
+
+    python journal.py show              # unresolved movements
+    python journal.py recover           # reconcile them against InvestEase
+    python journal.py recover --retry   # ... and resend the ones that never landed
+    python journal.py compact --days 7  # drop resolved entries older than a week
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+JOURNAL_FILE = os.getenv("RBCAGENT_JOURNAL", "journal.jsonl")
+JOURNAL_FSYNC = os.getenv("RBCAGENT_JOURNAL_FSYNC", "1") != "0"
+
+# Movement states
+PENDING = "pending"  # written before sending, outcome not known yet
+APPLIED = "applied"  # the gateway accepted it, or reconciliation found it landed
+REJECTED = "rejected"  # the gateway refused it (4xx), nothing moved
+NOT_APPLIED = "not_applied"  # reconciliation proved it never landed
+UNKNOWN = "unknown"  # could not tell, needs a human look
+UNRESOLVED = (PENDING, UNKNOWN)
+
+
+class Journal:
+    def __init__(self, path: str = JOURNAL_FILE, fsync: bool = JOURNAL_FSYNC):
+        """
+        Parameters:
+            path (str): JSONL file, one record per line; the last record of a key wins.
+            fsync (bool): Flush every record to disk before returning.
+        """
+        self.path = path
+        self.fsync = fsync
+        self._records = None  # idempotency key -> latest record, loaded on first use
+        self._file = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._records is not None:
+            return
+        records = {}
+        try:
+            with open(self.path, "r") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn last line from a crash mid-write
+                    records[record["key"]] = {**records.get(record["key"], {}), **record}
+        except FileNotFoundError:
+            pass
+        self._records = records
+
+    def _append(self, record: dict):
+        if self._file is None:
+            self._file = open(self.path, "a")
+        self._file.write(json.dumps(record, default=str) + "\n")
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def get(self, key: str) -> dict | None:
+        with self._lock:
+            self._load()
+            record = self._records.get(key)
+            return dict(record) if record is not None else None
+
+    def begin(self, key: str, op: str, target: str, amount: float, payload: dict, before) -> dict:
+        """
+        Durably record a movement as pending before it is sent.
+
+        Parameters:
+            key (str): Idempotency key.
+            op (str): ClientAPI method name.
+            target (str): Portfolio or client id the money moves on.
+            amount (float): Amount moved.
+            payload (dict): Request body, so the movement can be resent.
+            before: Reconciliation baseline captured before sending (None if unavailable).
+        """
+        return self.update(key, op=op, target=target, amount=amount, payload=payload,
+                           before=before, state=PENDING, attempts=0, time=time.time())
+
+    def update(self, key: str, **fields) -> dict:
+        """
+        Append a change to a movement (attempt count, outcome) and return the merged record.
+        """
+        fields["key"] = key
+        fields["updated"] = time.time()
+        with self._lock:
+            self._load()
+            self._append(fields)
+            record = self._records[key] = {**self._records.get(key, {}), **fields}
+            return dict(record)
+
+    def unresolved(self) -> list[dict]:
+        with self._lock:
+            self._load()
+            return [dict(record) for record in self._records.values() if record["state"] in UNRESOLVED]
+
+    def compact(self, max_age: float) -> int:
+        """
+        Rewrite the journal with one line per movement, dropping resolved movements older
+        than max_age seconds. Returns the number of movements dropped.
+        """
+        cutoff = time.time() - max_age
+        with self._lock:
+            self._load()
+            keep = {key: record for key, record in self._records.items()
+                    if record["state"] in UNRESOLVED or record.get("updated", 0) >= cutoff}
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                for record in keep.values():
+                    f.write(json.dumps(record, default=str) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            os.replace(tmp_path, self.path)
+            dropped = len(self._records) - len(keep)
+            self._records = keep
+            return dropped
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("show")
+    recover = sub.add_parser("recover")
+    recover.add_argument("--retry", action="store_true", help="resend movements that provably never landed")
+    compact = sub.add_parser("compact")
+    compact.add_argument("--days", type=float, default=7.0)
+    args = parser.parse_args()
+
+    import api  # api imports this module for its journal
+
+    if args.command == "show":
+        for record in api.money_journal().unresolved():
+            print(json.dumps(record, default=str))
+    elif args.command == "recover":
+        for record in api.recover_journal(retry=args.retry):
+            print(f"{record['key']} {record['op']} {record['target']} {record['amount']} -> {record['state']}")
+    else:
+        print(f"Dropped {api.money_journal().compact(args.days * 86400)} resolved movements")
+
+
+if __name__ == "__main__":
+    main()
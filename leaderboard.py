@@ -0,0 +1,281 @@
+"""
+Ranked leaderboard index: an indexable skip list ordered by score, highest first.
+
+Every node stores, per level, how many positions its forward link skips, so inserting,
+removing, ranking a member and fetching the member at a rank are all O(log n) expected;
+top-k and "neighbors around me" are one O(log n) seek plus a k-step walk along level 0.
+
+    board = Leaderboard()
+    board.update("alice", (3, 40))   # score tuple, compared element-wise, higher is better
+    board.top(10), board.rank("alice"), board.around("alice", 2)
+"""
+import random
+import threading
+import time
+
+MAX_LEVEL = 32
+BRANCHING = 0.25  # chance a node is promoted one more level
+
+
+class _Node:
+    __slots__ = ("key", "next", "span")
+
+    def __init__(self, key, levels: int):
+        self.key = key
+        self.next = [None] * levels
+        self.span = [0] * levels  # positions skipped by next[i], counting the node it lands on
+
+
+class RankedIndex:
+    """
+    Sorted set of unique, comparable keys with 1-based rank lookups (smallest key is rank 1).
+    """
+
+    def __init__(self, seed: int = None):
+        self._head = _Node(None, MAX_LEVEL)
+        self._levels = 1
+        self._size = 0
+        self._random = random.Random(seed)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _random_level(self) -> int:
+        levels = 1
+        while levels < MAX_LEVEL and self._random.random() < BRANCHING:
+            levels += 1
+        return levels
+
+    def insert(self, key):
+        update = [self._head] * MAX_LEVEL
+        rank = [0] * MAX_LEVEL  # rank of update[i]
+        node = self._head
+        for i in reversed(range(self._levels)):
+            rank[i] = rank[i + 1] if i + 1 < self._levels else 0
+            while node.next[i] is not None and node.next[i].key < key:
+                rank[i] += node.span[i]
+                node = node.next[i]
+            update[i] = node
+
+        levels = self._random_level()
+        if levels > self._levels:
+            for i in range(self._levels, levels):
+                self._head.span[i] = self._size
+            self._levels = levels
+
+        new = _Node(key, levels)
+        for i in range(levels):
+            new.next[i] = update[i].next[i]
+            update[i].next[i] = new
+            new.span[i] = update[i].span[i] - (rank[0] - rank[i])
+            update[i].span[i] = rank[0] - rank[i] + 1
+        for i in range(levels, self._levels):
+            update[i].span[i] += 1
+        self._size += 1
+
+    def remove(self, key) -> bool:
+        update = [self._head] * MAX_LEVEL
+        node = self._head
+        for i in reversed(range(self._levels)):
+            while node.next[i] is not None and node.next[i].key < key:
+                node = node.next[i]
+            update[i] = node
+        target = node.next[0]
+        if target is None or target.key != key:
+            return False
+        for i in range(self._levels):
+            if update[i].next[i] is target:
+                update[i].span[i] += target.span[i] - 1
+                update[i].next[i] = target.next[i]
+            else:
+                update[i].span[i] -= 1
+        while self._levels > 1 and self._head.next[self._levels - 1] is None:
+            self._levels -= 1
+        self._size -= 1
+        return True
+
+    def rank(self, key) -> int | None:
+        rank = 0
+        node = self._head
+        for i in reversed(range(self._levels)):
+            while node.next[i] is not None and node.next[i].key <= key:
+                rank += node.span[i]
+                node = node.next[i]
+        return rank if node is not self._head and node.key == key else None
+
+    def _node_at(self, rank: int) -> _Node | None:
+        traversed = 0
+        node = self._head
+        for i in reversed(range(self._levels)):
+            while node.next[i] is not None and traversed + node.span[i] <= rank:
+                traversed += node.span[i]
+                node = node.next[i]
+        return node if traversed == rank and node is not self._head else None
+
+    def slice(self, start: int, count: int) -> list:
+        """
+        Keys at ranks start .. start + count - 1 (clipped to the index).
+        """
+        node = self._node_at(max(1, start))
+        keys = []
+        while node is not None and len(keys) < count:
+            keys.append(node.key)
+            node = node.next[0]
+        return keys
+
+
+class Leaderboard:
+    def __init__(self, loader=None, max_age: float = None, seed: int = None):
+        """
+        Parameters:
+            loader (callable): Optional fn() -> iterable of (member, score) that builds the
+                board on first use, e.g. from the client store. It runs outside the board's
+                lock; updates made meanwhile are replayed onto the result.
+            max_age (float): Seconds after which the next query starts a rebuild from loader
+                in a background thread, swapped in when done, so updates made by other worker
+                processes show up. Queries keep using the current board. None never rebuilds.
+            seed (int): Skip list random seed.
+        """
+        self._loader = loader
+        self._max_age = max_age
+        self._seed = seed
+        self._index = RankedIndex(seed)
+        self._keys = {}  # member -> key in the index
+        self._loaded_at = None if loader is not None else time.monotonic()
+        self._pending = None  # member -> score (None: removed) changed while a build is reading the loader
+        self._generation = 0  # bumped by invalidate(), so a build started before it is dropped
+        self._refreshing = False
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()
+
+    @staticmethod
+    def _key(member: str, score: tuple) -> tuple:
+        # Ascending key order is descending score, ties broken by member id
+        return tuple(-value for value in score) + (member,)
+
+    def _ensure(self):
+        # Called without _lock: only the first build (or the first after invalidate()) blocks the query
+        with self._lock:
+            if self._loaded_at is not None:
+                if self._max_age is not None and not self._refreshing and time.monotonic() - self._loaded_at >= self._max_age:
+                    self._refreshing = True
+                    threading.Thread(target=self._refresh, name="leaderboard-refresh", daemon=True).start()
+                return
+        self._build(refresh=False)
+
+    def _refresh(self):
+        try:
+            self._build(refresh=True)
+        finally:
+            with self._lock:
+                self._refreshing = False  # on failure the next stale query retries
+
+    def _build(self, refresh: bool):
+        """
+        Read the loader into a new index outside _lock, then swap it in under _lock.
+        """
+        with self._build_lock:
+            with self._lock:
+                if not refresh and self._loaded_at is not None:
+                    return  # built by another query while this one waited
+                generation = self._generation
+                self._pending = {}
+            index, keys = RankedIndex(self._seed), {}
+            try:
+                for member, score in self._loader():
+                    keys[member] = self._key(member, score)
+                    index.insert(keys[member])
+            finally:
+                with self._lock:
+                    pending, self._pending = self._pending, None
+            with self._lock:
+                if generation != self._generation:
+                    return
+                for member, score in pending.items():
+                    old = keys.pop(member, None)
+                    if old is not None:
+                        index.remove(old)
+                    if score is not None:
+                        keys[member] = self._key(member, score)
+                        index.insert(keys[member])
+                self._index, self._keys, self._loaded_at = index, keys, time.monotonic()
+
+    def update(self, member: str, score: tuple):
+        with self._lock:
+            if self._pending is not None:
+                self._pending[member] = score
+            if self._loaded_at is None:
+                return  # not built yet, the loader will read the new score
+            old = self._keys.get(member)
+            key = self._key(member, score)
+            if old == key:
+                return
+            if old is not None:
+                self._index.remove(old)
+            self._keys[member] = key
+            self._index.insert(key)
+
+    def remove(self, member: str):
+        with self._lock:
+            if self._pending is not None:
+                self._pending[member] = None
+            old = self._keys.pop(member, None)
+            if old is not None:
+                self._index.remove(old)
+
+    def invalidate(self):
+        """
+        Rebuild from the loader on the next query (e.g. when a weekly period rolls over).
+        """
+        with self._lock:
+            self._generation += 1
+            self._index = RankedIndex(self._seed)
+            self._keys = {}
+            self._loaded_at = None if self._loader is not None else time.monotonic()
+
+    def __len__(self) -> int:
+        self._ensure()
+        with self._lock:
+            return len(self._index)
+
+    def _entries(self, start: int, keys: list) -> list[dict]:
+        return [{"rank": start + i, "member": key[-1], "score": tuple(-value for value in key[:-1])}
+                for i, key in enumerate(keys)]
+
+    def top(self, k: int = 10) -> list[dict]:
+        """
+        Returns:
+            list: {rank, member, score} of the k best members.
+        """
+        self._ensure()
+        with self._lock:
+            return self._entries(1, self._index.slice(1, k))
+
+    def rank(self, member: str) -> int | None:
+        self._ensure()
+        with self._lock:
+            key = self._keys.get(member)
+            return self._index.rank(key) if key is not None else None
+
+    def around(self, member: str, n: int = 2) -> list[dict]:
+        """
+        Returns:
+            list: {rank, member, score} of the member and up to n members ranked on each side.
+        """
+        self._ensure()
+        with self._lock:
+            key = self._keys.get(member)
+            if key is None:
+                return []
+            rank = self._index.rank(key)
+            start = max(1, rank - n)
+            return self._entries(start, self._index.slice(start, rank + n - start + 1))
+
+    def cohort(self, members) -> list[dict]:
+        """
+        Leaderboard restricted to a group (e.g. friends), ranked within the group.
+        """
+        self._ensure()
+        with self._lock:
+            keys = sorted(self._keys[member] for member in set(members) if member in self._keys)
+            return self._entries(1, keys)
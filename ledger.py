@@ -0,0 +1,261 @@
+"""
+Append-only gamification ledger: every exp award, streak change, target and daily saving
+amount change is appended to a JSONL log, so client state can be rebuilt after a crash and
+analytics can run on history without touching live state.
+
+Events carry the state they produced (e.g. the level and exp after an award), so replay is a
+plain fold with no game rules. A snapshot stores the folded state of every client plus the
+byte offset of the log it covers; replay loads the snapshot and folds only the tail after that
+offset. Snapshots are written every SNAPSHOT_EVERY appended events (and on demand), from the
+previous snapshot plus the log, never from live state. The log itself is kept whole for
+analytics.
+
+Environment:
+    RBCAGENT_LEDGER        log path (default ledger.jsonl, snapshot beside it as .snapshot.json)
+    RBCAGENT_LEDGER_FSYNC  fsync every append (default 0: flushed to the OS, survives a process crash)
+
+    python ledger.py snapshot           # fold the log into a fresh snapshot
+    python ledger.py verify             # compare replayed state with the client store
+    python ledger.py restore            # rebuild the client store from snapshot + log
+    python ledger.py stats --days 14    # daily active savers, investors, exp awarded, level ups
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from telemetry import get_logger
+
+LEDGER_FILE = os.getenv("RBCAGENT_LEDGER", "ledger.jsonl")
+LEDGER_FSYNC = os.getenv("RBCAGENT_LEDGER_FSYNC", "0") != "0"
+SNAPSHOT_EVERY = 100_000  # appended events between automatic snapshots
+
+# Event types
+REGISTERED = "registered"
+EXP = "exp"  # amount, level, exp, next: the award and the (Level, Exp, ExpToNextLevel) it produced
+SAVING = "saving"  # streak: the saving streak after a completed daily saving
+INVESTING = "investing"  # streak: the investing streak after a completed weekly investment
+STREAK_RESET = "streak_reset"  # kind: "saving" or "investing", broken by a missed day / week
+TARGET = "target"  # item, amount
+DAILY_AMOUNT = "daily_amount"  # amount
+
+log = get_logger("ledger")
+
+
+def _week(timestamp: float) -> int:
+    year, week, _ = datetime.fromtimestamp(timestamp).isocalendar()
+    return year * 100 + week
+
+
+def new_state() -> dict:
+    # None until an event sets it, so a restore leaves fields the ledger never saw alone
+    return dict.fromkeys(("level", "exp", "next", "saving_streak", "investing_streak", "last_saving",
+                          "last_investment", "target_item", "target_amount", "daily_amount", "week", "week_exp"))
+
+
+def apply(state: dict, event: dict):
+    """
+    Fold one event into a client's state.
+    """
+    kind = event["type"]
+    if kind == EXP:
+        state["level"], state["exp"], state["next"] = event["level"], event["exp"], event["next"]
+        week = _week(event["time"])
+        if state["week"] != week:  # also the first award seen
+            state["week"], state["week_exp"] = week, 0
+        state["week_exp"] += event["amount"]
+    elif kind == SAVING:
+        state["saving_streak"], state["last_saving"] = event["streak"], event["time"]
+    elif kind == INVESTING:
+        state["investing_streak"], state["last_investment"] = event["streak"], event["time"]
+    elif kind == STREAK_RESET:
+        state[f"{event['kind']}_streak"] = 0
+    elif kind == TARGET:
+        state["target_item"], state["target_amount"] = event["item"], event["amount"]
+    elif kind == DAILY_AMOUNT:
+        state["daily_amount"] = event["amount"]
+
+
+class Ledger:
+    def __init__(self, path: str = LEDGER_FILE, fsync: bool = LEDGER_FSYNC, snapshot_every: int = SNAPSHOT_EVERY):
+        """
+        Parameters:
+            path (str): JSONL log; the snapshot is written to `<path minus .jsonl>.snapshot.json`.
+            fsync (bool): fsync every append.
+            snapshot_every (int): Appended events between background snapshots, 0 disables them.
+        """
+        self.path = path
+        self.snapshot_path = f"{os.path.splitext(path)[0]}.snapshot.json"
+        self.fsync = fsync
+        self.snapshot_every = snapshot_every
+        self._appended = 0  # events appended by this process since its last snapshot
+        self._lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+
+    def append(self, client_id: str, kind: str, **fields):
+        self.append_many([{"client": client_id, "type": kind, **fields}])
+
+    def append_many(self, events: list[dict]):
+        """
+        Append events (each with client and type) in one write; the time is stamped here.
+        """
+        if not events:
+            return
+        now = time.time()
+        data = "".join(json.dumps({"time": event.get("time", now), **event}, separators=(",", ":")) + "\n"
+                       for event in events).encode()
+        with self._lock:
+            # One O_APPEND write per call, so lines from several processes never interleave
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data)
+                if self.fsync:
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+            self._appended += len(events)
+            due = self.snapshot_every and self._appended >= self.snapshot_every
+            if due:
+                self._appended = 0
+        if due:
+            threading.Thread(target=self._background_snapshot, name="ledger-snapshot", daemon=True).start()
+
+    def events(self, offset: int = 0, until: int = None):
+        """
+        Yield (end offset, event) for every complete line from byte `offset` on (up to `until`).
+        """
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            f.seek(offset)
+            position = offset
+            for line in f:
+                if not line.endswith(b"\n") or (until is not None and position + len(line) > until):
+                    return  # torn last line from a crash mid-write, or past the requested end
+                position += len(line)
+                try:
+                    yield position, json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+    def load_snapshot(self) -> tuple[int, dict]:
+        """
+        Returns:
+            tuple: (log offset covered, clientId -> state), or (0, {}) without a snapshot.
+        """
+        try:
+            with open(self.snapshot_path, "r") as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            return 0, {}
+        return snapshot["offset"], snapshot["clients"]
+
+    def replay(self) -> tuple[int, dict]:
+        """
+        Rebuild every client's state from the snapshot and the log after it.
+
+        Returns:
+            tuple: (log offset reached, clientId -> state).
+        """
+        offset, clients = self.load_snapshot()
+        events = 0
+        for offset, event in self.events(offset):
+            state = clients.get(event["client"])
+            if state is None:
+                state = clients[event["client"]] = new_state()
+            apply(state, event)
+            events += 1
+        log.debug("ledger.replayed", clients=len(clients), events=events)
+        return offset, clients
+
+    def snapshot(self) -> dict:
+        """
+        Fold the log into a new snapshot (temp file + os.replace, so a crash keeps the old one).
+        """
+        with self._snapshot_lock:
+            start = time.perf_counter()
+            previous, _ = self.load_snapshot()
+            offset, clients = self.replay()
+            tmp_path = f"{self.snapshot_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"offset": offset, "time": time.time(), "clients": clients}, f, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            result = {"clients": len(clients), "offset": offset, "folded_bytes": offset - previous,
+                      "seconds": round(time.perf_counter() - start, 3)}
+            log.info("ledger.snapshot", **result)
+            return result
+
+    def _background_snapshot(self):
+        if self._snapshot_lock.locked():
+            return  # one is already running
+        try:
+            self.snapshot()
+        except Exception:
+            log.exception("ledger.snapshot_failed")
+
+    def daily_stats(self, since: float = None) -> dict:
+        """
+        Aggregate the whole log by local day, without touching live state.
+
+        Returns:
+            dict: "YYYY-MM-DD" -> {active_savers, investors, active_clients, exp_awarded, level_ups, targets_set}.
+        """
+        savers, investors, active = defaultdict(set), defaultdict(set), defaultdict(set)
+        totals = defaultdict(lambda: {"exp_awarded": 0, "level_ups": 0, "targets_set": 0})
+        levels = {}
+        for _, event in self.events():
+            client = event["client"]
+            if event["type"] == EXP:
+                previous = levels.get(client, 1)
+                levels[client] = event["level"]
+            if since is not None and event["time"] < since:
+                continue
+            day = datetime.fromtimestamp(event["time"]).date().isoformat()
+            active[day].add(client)
+            if event["type"] == SAVING:
+                savers[day].add(client)
+            elif event["type"] == INVESTING:
+                investors[day].add(client)
+            elif event["type"] == EXP:
+                totals[day]["exp_awarded"] += event["amount"]
+                totals[day]["level_ups"] += event["level"] - previous
+            elif event["type"] == TARGET:
+                totals[day]["targets_set"] += 1
+        return {day: {"active_savers": len(savers[day]), "investors": len(investors[day]),
+                      "active_clients": len(active[day]), **totals[day]} for day in sorted(active)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("snapshot")
+    sub.add_parser("verify")
+    sub.add_parser("restore")
+    stats = sub.add_parser("stats")
+    stats.add_argument("--days", type=float, default=14.0)
+    args = parser.parse_args()
+
+    if args.command == "snapshot":
+        print(json.dumps(Ledger().snapshot()))
+    elif args.command == "stats":
+        print(f"{'day':<12}{'savers':>8}{'investors':>11}{'active':>8}{'exp':>10}{'level ups':>11}{'targets':>9}")
+        for day, row in Ledger().daily_stats(time.time() - args.days * 86400).items():
+            print(f"{day:<12}{row['active_savers']:>8}{row['investors']:>11}{row['active_clients']:>8}"
+                  f"{row['exp_awarded']:>10}{row['level_ups']:>11}{row['targets_set']:>9}")
+    else:
+        import level  # level imports this module for its ledger
+
+        result = level.restore_from_ledger(dry_run=args.command == "verify")
+        print(f"{result['clients']} clients replayed in {result['seconds']:.2f}s, "
+              f"{result['mismatched']} {'differ from' if args.command == 'verify' else 'restored into'} the client store")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,173 +1,654 @@
 # import datetime
+import json
+import math
+import threading
+import time
+from collections.abc import MutableMapping
 from datetime import datetime
-from copy import deepcopy
 from api import ClientAPI
+from async_api import gather_portfolios
+from leaderboard import Leaderboard
+import ledger
+from ledger import Ledger
+from portfolio_index import PortfolioIndex
+from store import ClientStore, decode
+from telemetry import count, get_logger
 # Constant
 EXP_STREAK_DAILY_SAVING = 20
 EXP_STREAK_WEEKLY_INVEST = 50
+EXP_BASE = 100  # exp needed to leave level L is EXP_BASE + EXP_PER_LEVEL * L
+EXP_PER_LEVEL = 10
+CLIENT_LOCK_STRIPES = 1024  # clients hashing to the same stripe share a lock, so keep collisions rare
+LEADERBOARD_REFRESH = 300  # seconds before a query starts a background rebuild of the leaderboards, picking up other workers' updates
 
 ID = "eec20378-12c4-4e55-9b0b-bdb292590b77"
 
-#__clients: A dictionary of clients id mapped to client information clientInfo
-__clients = {}
-__portfolios = {}
+log = get_logger("level")
 
-def savePortfolioToFile(portfolioId, clientId):
-    with open("portfolios.txt", "a") as f:
-        f.write(f"{clientId}|{portfolioId}\n")
+# Shared by reference as Messages[0] of every client, never mutate it in place
+SYSTEM_PROMPT = (
+    "You are a Investment and Saving assistant made for youth, assisting youth in managing their portfolios, savings, and investments on RBCAgent. You should always respond in a short but clear, unless it require long explanation."
+    "IMPORTANT: Assume RBCAgent is my fake application (no feature on it, all features access only through you, the Agent) and that you have access to the client info, which includes the user’s Level (current level in the system), Exp (accumulated experience points), Streaks (Saving = consecutive daily savings completed, Investing = consecutive weekly investments completed), Saving Target (Item = what the user is saving for, Amount = how much is needed to reach that goal), Daily Saving Amount (the fixed amount the user commits to save each day), and Messages (the conversation history, starting with a system message that defines the assistant’s role and tone). You are an investment and saving assistant for youth, focused on RBC InvestEase, and should always respond in a short but clear way unless the question requires a longer explanation."
+)
+SYSTEM_MESSAGE = {"role": "system", "content": SYSTEM_PROMPT}
+TARGET_NOT_SET = "NOT SET YET"
 
-def savePortfolio(portfolioId, clientId):
-    if clientId not in __portfolios:
-        __portfolios[clientId] = []
-    __portfolios[clientId].append(portfolioId)
-    savePortfolioToFile(portfolioId, clientId)
+
+class _FieldView(MutableMapping):
+    """
+    Dict-like window onto some fields of a ClientRecord, e.g. record["streaks"]["Saving"] += 1.
+    """
+    __slots__ = ("_record", "_fields")
+
+    def __init__(self, record: "ClientRecord", fields: dict):
+        self._record = record
+        self._fields = fields  # key -> slot name
+
+    def __getitem__(self, key):
+        return getattr(self._record, self._fields[key])
+
+    def __setitem__(self, key, value):
+        setattr(self._record, self._fields[key], value)
+
+    def __delitem__(self, key):
+        raise TypeError("client record fields cannot be deleted")
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self) -> int:
+        return len(self._fields)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+STREAK_FIELDS = {"Saving": "saving_streak", "Investing": "investing_streak"}
+TARGET_FIELDS = {"Item": "target_item", "Amount": "target_amount"}
+SCALAR_FIELDS = {
+    "id": "id",
+    "Name": "name",
+    "Level": "level",
+    "Exp": "exp",
+    "ExpToNextLevel": "exp_to_next_level",
+    "Daily Saving Amount": "daily_saving_amount",
+    "Messages": "messages",
+    "Summary": "summary",
+    "Email": "email",
+}
+TIME_FIELDS = {
+    "Last Investment Time": "last_investment",
+    "Last Saving Time": "last_saving",
+    "Last Quiz Time": "last_quiz",
+}
+TRAILING_DEFAULTS = ["", 0, 0, None]  # summary, week, week_exp, email
+RECORD_KEYS = list(SCALAR_FIELDS)[:5] + ["Email", "streaks", "Saving Target", "Daily Saving Amount", "Messages", "Summary"] + list(TIME_FIELDS)
+
+
+class ClientRecord(MutableMapping):
+    """
+    Compact per-client state. Timestamps are stored as epoch seconds and the system prompt
+    is shared by reference. Item access with the original clientInfo keys ("Exp",
+    "streaks"["Saving"], "Last Saving Time" as a datetime, ...) keeps older callers working.
+    """
+    __slots__ = ("id", "name", "level", "exp", "exp_to_next_level", "saving_streak", "investing_streak",
+                 "target_item", "target_amount", "daily_saving_amount", "messages", "summary",
+                 "last_investment", "last_saving", "last_quiz", "week", "week_exp", "email")
+
+    def __init__(self, clientId: str, name: str = None):
+        self.id = clientId
+        self.name = name
+        self.level = 1
+        self.exp = 0
+        self.exp_to_next_level = 100
+        self.saving_streak = 0
+        self.investing_streak = 0
+        self.target_item = TARGET_NOT_SET
+        self.target_amount = 0
+        self.daily_saving_amount = 5
+        self.messages = [SYSTEM_MESSAGE]
+        self.summary = ""  # rolling summary of turns folded out of messages
+        self.last_investment = None  # epoch seconds
+        self.last_saving = None
+        self.last_quiz = None
+        self.week = 0  # ISO year * 100 + week that week_exp was earned in
+        self.week_exp = 0
+        self.email = None  # last address the client set through UPDATE_EMAIL
+
+    def __getitem__(self, key):
+        if key in SCALAR_FIELDS:
+            return getattr(self, SCALAR_FIELDS[key])
+        if key in TIME_FIELDS:
+            timestamp = getattr(self, TIME_FIELDS[key])
+            return datetime.fromtimestamp(timestamp) if timestamp is not None else None
+        if key == "streaks":
+            return _FieldView(self, STREAK_FIELDS)
+        if key == "Saving Target":
+            return _FieldView(self, TARGET_FIELDS)
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in SCALAR_FIELDS:
+            setattr(self, SCALAR_FIELDS[key], value)
+        elif key in TIME_FIELDS:
+            setattr(self, TIME_FIELDS[key], value.timestamp() if value is not None else None)
+        elif key == "streaks":
+            self.saving_streak, self.investing_streak = value["Saving"], value["Investing"]
+        elif key == "Saving Target":
+            self.target_item, self.target_amount = value["Item"], value["Amount"]
+        else:
+            raise KeyError(key)
+
+    def __delitem__(self, key):
+        raise TypeError("client record fields cannot be deleted")
+
+    def __iter__(self):
+        return iter(RECORD_KEYS)
+
+    def __len__(self) -> int:
+        return len(RECORD_KEYS)
+
+    def __repr__(self) -> str:
+        return repr(self.as_dict())
+
+    def as_dict(self) -> dict:
+        """
+        The record in the original nested clientInfo layout.
+        """
+        info = {key: self[key] for key in RECORD_KEYS}
+        info["streaks"] = dict(info["streaks"])
+        info["Saving Target"] = dict(info["Saving Target"])
+        return info
+
+    def update(self, other=(), **kwargs):
+        if isinstance(other, ClientRecord):
+            for slot in ClientRecord.__slots__:
+                setattr(self, slot, getattr(other, slot))
+        else:
+            super().update(other, **kwargs)
+
+    # JSON paths of dumps() fields read column-wise by the streak sweep
+    COLUMNS = {"saving_streak": "$[5]", "investing_streak": "$[6]", "last_investment": "$[10]", "last_saving": "$[11]"}
+    # ... and by the leaderboard loaders
+    SCORE_COLUMNS = {"level": "$[2]", "exp": "$[3]", "week": "$[16]", "week_exp": "$[17]"}
+
+    def dumps(self) -> str:
+        # Positional JSON, with the shared system message left out
+        shared = bool(self.messages) and self.messages[0] is SYSTEM_MESSAGE
+        return json.dumps([
+            self.id, self.name, self.level, self.exp, self.exp_to_next_level,
+            self.saving_streak, self.investing_streak, self.target_item, self.target_amount,
+            self.daily_saving_amount, self.last_investment, self.last_saving, self.last_quiz,
+            shared, self.messages[1:] if shared else self.messages, self.summary,
+            self.week, self.week_exp, self.email,
+        ], ensure_ascii=False, separators=(",", ":"))
+
+    @classmethod
+    def loads(cls, text: str) -> "ClientRecord":
+        fields = json.loads(text)
+        if isinstance(fields, dict):  # clientInfo dict written before records were compacted
+            legacy = decode(text)
+            messages = legacy.get("Messages") or []
+            if messages and messages[0].get("role") == "system":
+                legacy["Messages"] = [SYSTEM_MESSAGE] + messages[1:]
+            record = cls(legacy["id"])
+            for key, value in legacy.items():
+                if key in SCALAR_FIELDS or key in TIME_FIELDS or key in ("streaks", "Saving Target"):
+                    record[key] = value
+            return record
+        fields.extend(TRAILING_DEFAULTS[len(fields) - 15:])  # fields added after the positional format
+        record = cls.__new__(cls)
+        (record.id, record.name, record.level, record.exp, record.exp_to_next_level,
+         record.saving_streak, record.investing_streak, record.target_item, record.target_amount,
+         record.daily_saving_amount, record.last_investment, record.last_saving, record.last_quiz,
+         shared, messages, record.summary, record.week, record.week_exp, record.email) = fields
+        record.messages = [SYSTEM_MESSAGE] + messages if shared else messages
+        return record
+
+
+#__client_locks: striped re-entrant locks serializing every mutation of one client's record
+__client_locks = [threading.RLock() for _ in range(CLIENT_LOCK_STRIPES)]
+
+def client_lock(clientId) -> threading.RLock:
+    """
+    Lock held while a client's record is read-modify-written. Re-entrant, so locked helpers
+    can call each other; hold it around a whole webhook turn to keep that client's messages in order.
+    """
+    return __client_locks[hash(clientId) % CLIENT_LOCK_STRIPES]
+
+#__clients: Clients id mapped to their ClientRecord, persisted in SQLite and loaded on first touch
+__clients = ClientStore(dumps=ClientRecord.dumps, loads=ClientRecord.loads, record_lock=client_lock)
+def _current_week() -> int:
+    year, week, _ = datetime.now().isocalendar()
+    return year * 100 + week
+
+def _read_columns(paths: dict) -> tuple[list, dict]:
+    # Record fields of every client as columns; see ClientStore.columns
+    ids, columns = __clients.columns(paths)
+    if columns["$legacy"]:  # rows not yet rewritten in the positional format
+        position = {clientId: i for i, clientId in enumerate(ids)}
+        for clientId in columns["$legacy"]:
+            client = __clients[clientId]
+            for name in paths:
+                columns[name][position[clientId]] = getattr(client, name)
+    return ids, columns
+
+def _overall_scores():
+    ids, columns = _read_columns(ClientRecord.SCORE_COLUMNS)
+    return zip(ids, zip(columns["level"], columns["exp"]))
+
+def _weekly_scores():
+    week = _current_week()
+    ids, columns = _read_columns(ClientRecord.SCORE_COLUMNS)
+    return ((clientId, (week_exp,)) for clientId, this_week, week_exp in zip(ids, columns["week"], columns["week_exp"])
+            if this_week == week)
+
+#__leaderboard: every client ranked by (Level, Exp), built column-wise from the store on first query and updated by add_exp
+__leaderboard = Leaderboard(_overall_scores, max_age=LEADERBOARD_REFRESH)
+#__weekly_leaderboard: clients ranked by exp earned this ISO week
+__weekly_leaderboard = Leaderboard(_weekly_scores, max_age=LEADERBOARD_REFRESH)
+__weekly_leaderboard_week = None
+__weekly_leaderboard_lock = threading.Lock()
+
+#__ledger: append-only log of every exp, streak, target and daily amount change, replayable after a crash
+__ledger = Ledger()
+
+#__portfolio_index: clients id mapped to {strategy: portfolio id}, persisted in portfolios.txt and read on first use
+__portfolio_index = PortfolioIndex()
+#__portfolios: clients id mapped to their portfolio ids, kept in sync by the index
+__portfolios = __portfolio_index.ids
+
+#PORTFOLIO_LISTENERS: callables receiving a clientId whose portfolios were added or retyped, e.g. to drop cached prompts
+PORTFOLIO_LISTENERS = []
+
+def on_portfolios_changed(listener):
+    PORTFOLIO_LISTENERS.append(listener)
+    return listener
+
+def savePortfolio(portfolioId, clientId, portfolio_type: str = None):
+    __portfolio_index.add(clientId, portfolioId, portfolio_type)
+    for listener in PORTFOLIO_LISTENERS:
+        listener(clientId)
 
 def readPortfoliosFromFile():
-    try:
-        with open("portfolios.txt", "r") as f:
-            lines = f.readlines()
-            for line in lines:
-                clientId, portfolioId = line.strip().split("|")
-                if clientId not in __portfolios:
-                    __portfolios[clientId] = []
-                __portfolios[clientId].append(portfolioId)
-    except FileNotFoundError:
-        pass    
-
-readPortfoliosFromFile()
+    __portfolio_index.load()
+
+def typePortfolios(clientId):
+    # Portfolios saved before strategies were recorded are looked up once, then remembered
+    untyped = __portfolio_index.untyped(clientId)
+    if not untyped:
+        return
+    for portfolioId, portfolio_info in zip(untyped, gather_portfolios(untyped)):
+        if portfolio_info["success"]:
+            savePortfolio(portfolioId, clientId, portfolio_info["data"]["type"])
 
 def getPortfolioIdByType(clientId, portfolio_type: str) -> str | None:
-    if clientId not in __clients or clientId not in __portfolios:
-        print(f'client with id {clientId} is not registered at the system')
+    if clientId not in __clients:
+        log.warning("client.not_registered", client_id=clientId)
         return None
-    for portfolioId in __portfolios[clientId]:
-        portfolio_info = ClientAPI.get_portfolio(portfolioId)
-        if portfolio_info["success"] and portfolio_info["data"]["type"] == portfolio_type:
-            return portfolioId
-    return None
+    typePortfolios(clientId)
+    return __portfolio_index.portfolio_id(clientId, portfolio_type)
+
+def getPortfolioTypes(clientId) -> list[tuple[str, str]]:
+    typePortfolios(clientId)
+    return [(portfolioId, __portfolio_index.strategy(portfolioId) or "unknown") for portfolioId in __portfolios.get(clientId, [])]
 
 # portfolio = {
 #     "type": "aggressive_growth",
 #     "clientId": ID
 # }
-# clientInfo default value
-clientInfo_default = {
-    "id": ID,
-    "Name": ClientAPI.get_client(ID)["data"]["name"],
-    "Level": 1,
-    "Exp": 0,
-    "ExpToNextLevel": 100,
-    "streaks" : {
-        "Saving" : 0,
-        "Investing" : 0
-    },
-    "Saving Target": {
-        "Item": "NOT SET YET", 
-        "Amount": 0,
-    },
-    "Daily Saving Amount": 5,
-    "Messages": [{
-        "role": "system",
-        "content": "You are a Investment and Saving assistant made for youth, assisting youth in managing their portfolios, savings, and investments on RBCAgent. You should always respond in a short but clear, unless it require long explanation."
-        "IMPORTANT: Assume RBCAgent is my fake application (no feature on it, all features access only through you, the Agent) and that you have access to the client info, which includes the user’s Level (current level in the system), Exp (accumulated experience points), Streaks (Saving = consecutive daily savings completed, Investing = consecutive weekly investments completed), Saving Target (Item = what the user is saving for, Amount = how much is needed to reach that goal), Daily Saving Amount (the fixed amount the user commits to save each day), and Messages (the conversation history, starting with a system message that defines the assistant’s role and tone). You are an investment and saving assistant for youth, focused on RBC InvestEase, and should always respond in a short but clear way unless the question requires a longer explanation."
-    }],
-    "Last Investment Time": None,
-    "Last Saving Time": None,
-    "Last Quiz Time": None
-}
-
-
-
 # Client management functions
 def register_client(clientId):
-    if clientId in __clients:
-        print(f'client with id {clientId} is already registered at the system')
-        return
-    __clients[clientId] = deepcopy(clientInfo_default)
+    with client_lock(clientId):
+        if clientId in __clients:
+            log.debug("client.already_registered", client_id=clientId)
+            return
+        __clients[clientId] = ClientRecord(clientId)
+        __leaderboard.update(clientId, (1, 0))
+        __ledger.append(clientId, ledger.REGISTERED)
 
 # Get Info functions
+def _get_client(clientId) -> ClientRecord | None:
+    client = __clients.get(clientId)
+    if client is None:
+        log.warning("client.not_registered", client_id=clientId)
+    return client
+
 def get_client_info(clientId):
-    if clientId not in __clients:
-        print(f'client with id {clientId} is not registered at the system')
-        return None
-    return __clients[clientId]
+    return _get_client(clientId)
+
+def get_client_name(clientId) -> str | None:
+    # Fetched from InvestEase on first use rather than at registration, so registering never blocks on the gateway
+    with client_lock(clientId):
+        client = _get_client(clientId)
+        if client is None:
+            return None
+        if client.name is None:
+            res = ClientAPI.get_client(clientId)
+            if not res["success"]:
+                return None
+            client.name = res["data"].get("name")
+        return client.name
+
+def set_client_name(clientId, name: str | None):
+    with client_lock(clientId):
+        client = _get_client(clientId)
+        if client is None:
+            return
+        client.name = name
 
 def get_messages(clientId):
-    if clientId not in __clients:
-        print(f'client with id {clientId} is not registered at the system')
-        return None
-    return __clients[clientId]["Messages"]
+    client = _get_client(clientId)
+    return client.messages if client is not None else None
+
+def get_summary(clientId) -> str | None:
+    client = _get_client(clientId)
+    return client.summary if client is not None else None
+
+def fold_history(clientId, folded: int, summary: str):
+    # Replace the oldest `folded` messages after the system prompt with their rolling summary
+    with client_lock(clientId):
+        client = _get_client(clientId)
+        if client is None:
+            return
+        del client.messages[1:folded + 1]
+        client.summary = summary
 
 def get_streaks(clientId):
-    if clientId not in __clients:
-        print(f'client with id {clientId} is not registered at the system')
-        return None
-    return __clients[clientId]["streaks"]
+    client = _get_client(clientId)
+    return client["streaks"] if client is not None else None
 
 def get_target(clientId):
-    if clientId not in __clients:
-        print(f'client with id {clientId} is not registered at the system')
-        return None
-    return __clients[clientId]["Saving Target"]
+    client = _get_client(clientId)
+    return client["Saving Target"] if client is not None else None
 # Target functions
 def set_target(clientId, item: str | None, amount: float):
-    if clientId not in __clients:
-        print(f'client with id {clientId} is not registered at the system')
-        return
-    __clients[clientId]["Saving Target"]["Item"] = item
-    __clients[clientId]["Saving Target"]["Amount"] = amount
+    with client_lock(clientId):
+        client = _get_client(clientId)
+        if client is None:
+            return
+        client.target_item = item
+        client.target_amount = amount
+        __ledger.append(clientId, ledger.TARGET, item=item, amount=amount)
 
 # Daily saving functions
 def set_daily_saving(clientId, amount: float):
-    if clientId not in __clients:
-        print(f'client with id {clientId} is not registered at the system')
-        return
-    __clients[clientId]["Daily Saving Amount"] = amount
+    with client_lock(clientId):
+        client = _get_client(clientId)
+        if client is None:
+            return
+        client.daily_saving_amount = amount
+        __ledger.append(clientId, ledger.DAILY_AMOUNT, amount=amount)
 
 # Exp and Level functions
 def exp_to_next_level(clientId, level):
-    return 100 + level * 10
+    return EXP_BASE + level * EXP_PER_LEVEL
+
+def _level_up(level: int, exp: int, threshold: int) -> tuple[int, int, int]:
+    """
+    Closed-form level up: (level, exp, exp needed for the next level) once `exp` is spent.
+
+    The current level costs `threshold`; each later level L costs EXP_BASE + EXP_PER_LEVEL * L,
+    so k further levels from level L cost S(k) = k * (EXP_BASE + EXP_PER_LEVEL * L) +
+    EXP_PER_LEVEL * k * (k - 1) / 2, and the largest affordable k is a quadratic root.
+    """
+    if exp < threshold:
+        return level, exp, threshold
+    level, exp = level + 1, exp - threshold
+    b = 2 * EXP_BASE + EXP_PER_LEVEL * (2 * level - 1)  # S(k) <= exp  <=>  EXP_PER_LEVEL*k^2 + b*k <= 2*exp
+    k = (math.isqrt(b * b + 8 * EXP_PER_LEVEL * int(exp)) - b) // (2 * EXP_PER_LEVEL)
+    exp -= k * (EXP_BASE + EXP_PER_LEVEL * level) + EXP_PER_LEVEL * k * (k - 1) // 2
+    level += k
+    return level, exp, EXP_BASE + EXP_PER_LEVEL * level
 
 # Leveling functions
-def add_exp(clientId, exp: int):
-    if clientId not in __clients:
-        print(f'client with id {clientId} is not registered at the system')
+#LEVEL_UP_LISTENERS: callables receiving a list of {client_id, from_level, to_level} events, e.g. a notifier
+LEVEL_UP_LISTENERS = []
+
+def on_level_up(listener):
+    LEVEL_UP_LISTENERS.append(listener)
+    return listener
+
+def _emit_level_ups(events: list[dict]):
+    if not events:
         return
-    __clients[clientId]["Exp"] += exp
-    # Level up logic
-    while __clients[clientId]["Exp"] >= __clients[clientId]["ExpToNextLevel"]:
-        __clients[clientId]["Exp"] -= __clients[clientId]["ExpToNextLevel"]
-        __clients[clientId]["Level"] += 1
-        __clients[clientId]["ExpToNextLevel"] = exp_to_next_level(clientId, __clients[clientId]["Level"])
+    count("level_up", "clients", len(events))
+    for listener in LEVEL_UP_LISTENERS:
+        try:
+            listener(events)
+        except Exception:
+            log.exception("level_up.listener_failed")
+
+def _record_exp(clientId, client: ClientRecord, exp: int, week: int):
+    if client.week != week:
+        client.week, client.week_exp = week, 0
+    client.week_exp += exp
+    __leaderboard.update(clientId, (client.level, client.exp))
+    _get_leaderboard(weekly=True).update(clientId, (client.week_exp,))
+
+def add_exp(clientId, exp: int):
+    with client_lock(clientId):
+        client = _get_client(clientId)
+        if client is None:
+            return
+        previous_level = client.level
+        client.level, client.exp, client.exp_to_next_level = _level_up(client.level, client.exp + exp, client.exp_to_next_level)
+        _record_exp(clientId, client, exp, _current_week())
+        __ledger.append(clientId, ledger.EXP, amount=exp, level=client.level, exp=client.exp, next=client.exp_to_next_level)
+        level = client.level
+    if level != previous_level:
+        _emit_level_ups([{"client_id": clientId, "from_level": previous_level, "to_level": level}])
+
+def award_exp(clientIds, exp) -> list[dict]:
+    """
+    Award exp to many clients at once (e.g. everyone who completed a quiz), computing every
+    resulting level in one vectorized closed-form pass instead of a level-by-level loop.
+
+    Parameters:
+        clientIds (list): Clients to award; unregistered ones are skipped, repeated ones get every award.
+        exp (int | list[int]): Exp for everyone, or per entry of clientIds.
+
+    Returns:
+        list: Level-up events {client_id, from_level, to_level}, also sent to LEVEL_UP_LISTENERS.
+    """
+    import numpy as np  # only needed for bulk awards
+
+    clientIds = list(clientIds)
+    awards = np.broadcast_to(np.asarray(exp, dtype=np.int64), (len(clientIds),))
+    # A client listed more than once gets the sum of its awards, as repeated add_exp calls would
+    positions = {}
+    index = np.fromiter((positions.setdefault(clientId, len(positions)) for clientId in clientIds),
+                        dtype=np.int64, count=len(clientIds))
+    if len(positions) < len(clientIds):
+        summed = np.zeros(len(positions), dtype=np.int64)
+        np.add.at(summed, index, awards)
+        clientIds, awards = list(positions), summed
+    # Every involved stripe is held from read to write-back, taken in index order so two bulk
+    # awards cannot deadlock (single-client paths only ever hold one stripe)
+    stripes = sorted({hash(clientId) % CLIENT_LOCK_STRIPES for clientId in clientIds})
+    for stripe in stripes:
+        __client_locks[stripe].acquire()
+    try:
+        events = _award_exp(clientIds, awards)
+    finally:
+        for stripe in reversed(stripes):
+            __client_locks[stripe].release()
+    log.info("exp.awarded", clients=len(clientIds), level_ups=len(events))
+    _emit_level_ups(events)
+    return events
+
+def _award_exp(clientIds: list, awards) -> list[dict]:
+    # Called with the stripes of every client held
+    import numpy as np
+
+    clients, keep = [], []
+    for i, clientId in enumerate(clientIds):
+        client = __clients.get(clientId)
+        if client is None:
+            log.warning("client.not_registered", client_id=clientId)
+            continue
+        clients.append(client)
+        keep.append(i)
+    if not clients:
+        return []
+    ids, awards = [clientIds[i] for i in keep], awards[keep]
+
+    level = np.fromiter((client.level for client in clients), dtype=np.int64, count=len(clients))
+    total = np.fromiter((client.exp for client in clients), dtype=np.int64, count=len(clients)) + awards
+    threshold = np.fromiter((client.exp_to_next_level for client in clients), dtype=np.int64, count=len(clients))
+
+    # Same closed form as _level_up, on whole columns; float sqrt is then corrected to the exact integer root
+    up = total >= threshold
+    new_level = np.where(up, level + 1, level)
+    rest = np.where(up, total - threshold, total)
+    b = 2 * EXP_BASE + EXP_PER_LEVEL * (2 * new_level - 1)
+    k = np.where(up, (np.floor(np.sqrt((b * b + 8 * EXP_PER_LEVEL * rest).astype(float))).astype(np.int64) - b) // (2 * EXP_PER_LEVEL), 0)
+    cost = lambda k: k * (EXP_BASE + EXP_PER_LEVEL * new_level) + EXP_PER_LEVEL * k * (k - 1) // 2
+    k -= up & (cost(k) > rest)
+    k += up & (cost(k + 1) <= rest)
+    rest = rest - cost(k)
+    new_level = new_level + k
+    new_threshold = np.where(up, EXP_BASE + EXP_PER_LEVEL * new_level, threshold)
+
+    week = _current_week()
+    events, entries = [], []
+    for i, (clientId, client) in enumerate(zip(ids, clients)):
+        client.level, client.exp, client.exp_to_next_level = int(new_level[i]), int(rest[i]), int(new_threshold[i])
+        _record_exp(clientId, client, int(awards[i]), week)
+        entries.append({"client": clientId, "type": ledger.EXP, "amount": int(awards[i]),
+                        "level": client.level, "exp": client.exp, "next": client.exp_to_next_level})
+        if new_level[i] != level[i]:
+            events.append({"client_id": clientId, "from_level": int(level[i]), "to_level": int(new_level[i])})
+    __ledger.append_many(entries)
+    return events
+
+# Leaderboard functions
+def _get_leaderboard(weekly: bool = False) -> Leaderboard:
+    global __weekly_leaderboard_week
+    if not weekly:
+        return __leaderboard
+    week = _current_week()
+    if week != __weekly_leaderboard_week:
+        with __weekly_leaderboard_lock:
+            if week != __weekly_leaderboard_week:
+                __weekly_leaderboard.invalidate()  # new week, everyone starts from zero
+                __weekly_leaderboard_week = week
+    return __weekly_leaderboard
+
+def _named(entries: list[dict]) -> list[dict]:
+    # Names of the shown clients only, read from the store so showing a board never calls InvestEase
+    names = __clients.field((entry["member"] for entry in entries), "$[1]", lambda client: client.name)
+    for entry in entries:
+        entry["name"] = names.get(entry["member"])
+    return entries
+
+def get_leaderboard(k: int = 10, weekly: bool = False) -> list[dict]:
+    """
+    Returns:
+        list: {rank, member, name, score} of the k best clients; score is (Level, Exp), or (exp earned
+            this week,) if weekly. name is None for clients whose name was never fetched.
+    """
+    return _named(_get_leaderboard(weekly).top(k))
+
+def get_rank(clientId, weekly: bool = False) -> int | None:
+    return _get_leaderboard(weekly).rank(clientId)
+
+def get_leaderboard_around(clientId, n: int = 2, weekly: bool = False) -> list[dict]:
+    return _named(_get_leaderboard(weekly).around(clientId, n))
+
+def get_cohort_leaderboard(clientIds, weekly: bool = False) -> list[dict]:
+    # e.g. a client and their friends, ranked among themselves
+    return _named(_get_leaderboard(weekly).cohort(clientIds))
+
+def get_leaderboard_size(weekly: bool = False) -> int:
+    return len(_get_leaderboard(weekly))
 
 
 
 # Streaks functions
+def _days_between(earlier: float, later: float) -> int:
+    return (datetime.fromtimestamp(later).date() - datetime.fromtimestamp(earlier).date()).days
+
+def _weeks_between(earlier: float, later: float) -> int:
+    # Whole ISO weeks (Monday to Sunday) between the two timestamps' weeks
+    earlier_date, later_date = datetime.fromtimestamp(earlier).date(), datetime.fromtimestamp(later).date()
+    return ((later_date.toordinal() - later_date.weekday()) - (earlier_date.toordinal() - earlier_date.weekday())) // 7
+
+def _saving_streak_broken(client: ClientRecord, now: float) -> bool:
+    return client.last_saving is None or _days_between(client.last_saving, now) > 1
+
+def _investing_streak_broken(client: ClientRecord, now: float) -> bool:
+    return client.last_investment is None or _weeks_between(client.last_investment, now) > 1
+
 def done_daily_saving(clientId):
-    if clientId not in __clients:
-        print(f'client with id {clientId} is not registered at the system')
-        return
-    # Check the last time saving was done to ensure it's daily
-    last_saving_time = __clients[clientId]["Last Saving Time"]
-    if last_saving_time is not None and last_saving_time.date() == datetime.now().date():
-        print(f"Warning: client with id {clientId} has already done their daily saving today")
-        return
-    __clients[clientId]["Last Saving Time"] = datetime.now()
-    __clients[clientId]["streaks"]["Saving"] += 1
-    add_exp(clientId, EXP_STREAK_DAILY_SAVING)
+    with client_lock(clientId):
+        client = _get_client(clientId)
+        if client is None:
+            return
+        # Check the last time saving was done to ensure it's daily
+        now = time.time()
+        if client.last_saving is not None and _days_between(client.last_saving, now) == 0:
+            log.info("saving.already_done_today", client_id=clientId)
+            return
+        if _saving_streak_broken(client, now):
+            client.saving_streak = 0  # missed a day since, even if no sweep has run yet
+        client.last_saving = now
+        client.saving_streak += 1
+        __ledger.append(clientId, ledger.SAVING, streak=client.saving_streak, time=now)
+        add_exp(clientId, EXP_STREAK_DAILY_SAVING)
 
 def done_weekly_invest(clientId):
-    if clientId not in __clients:
-        print(f'client with id {clientId} is not registered at the system')
-        return
-    # Check the last time investment was done to ensure it's weekly
-    last_investment_time = __clients[clientId]["Last Investment Time"]
-    if last_investment_time is not None and last_investment_time.date() == datetime.now().date():
-        print(f"Warning: client with id {clientId} has already done their weekly investment this week")
-        return
-    __clients[clientId]["Last Investment Time"] = datetime.now()
-    __clients[clientId]["streaks"]["Investing"] += 1
-    add_exp(clientId, EXP_STREAK_WEEKLY_INVEST)
+    with client_lock(clientId):
+        client = _get_client(clientId)
+        if client is None:
+            return
+        # Check the last time investment was done to ensure it's once per ISO week
+        now = time.time()
+        if client.last_investment is not None and _weeks_between(client.last_investment, now) == 0:
+            log.info("invest.already_done_this_week", client_id=clientId)
+            return
+        if _investing_streak_broken(client, now):
+            client.investing_streak = 0
+        client.last_investment = now
+        client.investing_streak += 1
+        __ledger.append(clientId, ledger.INVESTING, streak=client.investing_streak, time=now)
+        add_exp(clientId, EXP_STREAK_WEEKLY_INVEST)
+
+def sweep_streaks(now: float = None, dry_run: bool = False) -> dict:
+    """
+    Expire every streak broken by a missed day (saving) or ISO week (investing), in one
+    columnar pass over the store, and list who has not saved today or invested this week.
+
+    Returns:
+        dict: {clients, saving_expired, investing_expired (counts), saving_due, investing_due (client ids)}.
+    """
+    import streaks  # numpy, only needed by the scheduled sweep
+
+    now = time.time() if now is None else now
+    ids, columns = _read_columns(ClientRecord.COLUMNS)
+    due = streaks.sweep(columns["last_saving"], columns["last_investment"],
+                        columns["saving_streak"], columns["investing_streak"], now)
+
+    expired = {"saving_expired": 0, "investing_expired": 0}
+    for mask, streak, broken in (("saving_expired", "saving_streak", _saving_streak_broken),
+                                 ("investing_expired", "investing_streak", _investing_streak_broken)):
+        for i in due[mask].nonzero()[0]:
+            with client_lock(ids[i]):
+                client = __clients.get(ids[i])
+                # Re-checked on the live record, which may have changed since the columns were read
+                if client is None or getattr(client, streak) == 0 or not broken(client, now):
+                    continue
+                expired[mask] += 1
+                if not dry_run:
+                    setattr(client, streak, 0)
+                    __ledger.append(ids[i], ledger.STREAK_RESET, kind=streak.split("_")[0])
+    log.info("streaks.swept", clients=len(ids), dry_run=dry_run, **expired)
+    return {
+        "clients": len(ids),
+        **expired,
+        "saving_due": [ids[i] for i in due["saving_due"].nonzero()[0]],
+        "investing_due": [ids[i] for i in due["investing_due"].nonzero()[0]],
+    }
 
 
 # def getPortfolioId(clientId, portfolio_name: str) -> str | None:
@@ -187,3 +668,46 @@ def done_weekly_invest(clientId):
 #         print(f"Warning: client with id {clientId} already has a portfolio named {portfolio_name}")
 #         return
 #     __clients[clientId]["Portfolios"][portfolio_name] = portfolio_id
+
+
+# Ledger functions
+LEDGER_FIELDS = {  # ledger state key -> ClientRecord slot
+    "level": "level", "exp": "exp", "next": "exp_to_next_level",
+    "saving_streak": "saving_streak", "investing_streak": "investing_streak",
+    "last_saving": "last_saving", "last_investment": "last_investment",
+    "target_item": "target_item", "target_amount": "target_amount",
+    "daily_amount": "daily_saving_amount", "week": "week", "week_exp": "week_exp",
+}
+
+def restore_from_ledger(dry_run: bool = False) -> dict:
+    """
+    Replay the ledger (snapshot + log tail) and write the gamification state it yields into
+    the client store, registering clients the store lost. Fields the ledger never saw set
+    (e.g. a target that was never chosen) keep their current value.
+
+    Returns:
+        dict: {clients replayed, mismatched (records that differed), seconds}.
+    """
+    start = time.perf_counter()
+    _, states = __ledger.replay()
+    mismatched = 0
+    for clientId, state in states.items():
+        with client_lock(clientId):
+            client = __clients.get(clientId)
+            missing = client is None
+            if missing:
+                client = ClientRecord(clientId)
+                if not dry_run:
+                    __clients[clientId] = client
+            changes = {slot: state[key] for key, slot in LEDGER_FIELDS.items()
+                       if state[key] is not None and getattr(client, slot) != state[key]}
+            if changes or missing:
+                mismatched += 1
+                log.info("ledger.mismatch", client_id=clientId, fields=sorted(changes))
+            if not dry_run:
+                for slot, value in changes.items():
+                    setattr(client, slot, value)
+                __leaderboard.update(clientId, (client.level, client.exp))
+    if not dry_run:
+        _get_leaderboard(weekly=True).invalidate()
+    return {"clients": len(states), "mismatched": mismatched, "seconds": time.perf_counter() - start}
@@ -1,20 +1,41 @@
+import json
 import os
-import groq 
-from copy import deepcopy
-from groq import Groq
-from api import ClientAPI
+import queue
+import threading
+import context_window
+import intent_router
+import quiz_bank
+import time
+from api import ClientAPI, ClientSnapshot, money_journal, new_idempotency_key
+from async_api import gather_portfolios
+from cache import TTLCache
+from journal import UNKNOWN
+from quiz_bank import QuizBank, format_quiz, grade
+from telemetry import count, get_logger, timed
 # from level import getPortfolioId, addPortfolio, 
-from level import savePortfolio, getPortfolioIdByType, __portfolios
-import cohere
+from level import savePortfolio, getPortfolioIdByType, getPortfolioTypes, on_portfolios_changed, __portfolios
 # Make sure you have set this in your environment first, e.g.:
-#   export GROQ_API_KEY="your_api_key_here"   (Linux/macOS)
-#   setx GROQ_API_KEY "your_api_key_here"     (Windows PowerShell)
+#   export COHERE_API_KEY="your_api_key_here"   (Linux/macOS)
+#   setx COHERE_API_KEY "your_api_key_here"     (Windows PowerShell)
 
 # Temporary constant for demonstration purposes
 LIST_OF_STRATEGIES = ["aggressive_growth", "growth", "balanced", "conservative", "very_conservative"]  # Placeholder for actual API call
 
-# Initialize Groq Client for the Llama3 AI model
-co = cohere.ClientV2(os.getenv("COHERE_API_KEY"))
+log = get_logger("llama")
+
+# Cohere client, built on first use so importing this module never touches the SDK or the network.
+# Benchmarks and tests may assign a stand-in (see fake_cohere.py).
+co = None
+_co_lock = threading.Lock()
+
+def get_co():
+    global co
+    if co is None:
+        with _co_lock:
+            if co is None:
+                import cohere  # heavy import, deferred to the first LLM call
+                co = cohere.ClientV2(os.getenv("COHERE_API_KEY"))
+    return co
 
 # LLama Set of Instructions
 instructions = {
@@ -138,39 +159,48 @@ instructions = {
             "portofolio_strategy": "string - The name of the new portfolio.",
         },
         "format": "portfolio_strategy"
+    },
+
+    "PROJECT": {
+        "description": "Use this when the user asks how much they could have in the future, for any number of years. Example: 'How much will I have in 3 years if I add $5 a day?'",
+        "parameters": {
+            "years": "number - How many years ahead to project.",
+            "daily_amount": "number - Extra amount added every day, or null to use their Daily Saving Amount.",
+        },
+        "format": "years | daily_amount"
     }
 }
 
-def UPDATE_NAME(clientId, params: list[str]):
+def UPDATE_NAME(clientId, params: list[str], snapshot: ClientSnapshot = None):
     if len(params) != 1:
-        print(f"Error: UPDATE_NAME requires 1 parameter, got {len(params)}")
+        log.warning("action.bad_params", action="UPDATE_NAME", expected=1, got=len(params))
         return False, None
     name = params[0] if params[0].lower() != "null" else None
-    __clients[clientId]["Name"] = name
+    set_client_name(clientId, name)
     res = ClientAPI.update_client(clientId, name=name)
     return res["success"], res["error"] if not res["success"] else f"Name updated to {name}"
 
-def UPDATE_EMAIL(clientId, params: list[str]):
+def UPDATE_EMAIL(clientId, params: list[str], snapshot: ClientSnapshot = None):
     if len(params) != 1:
-        print(f"Error: UPDATE_EMAIL requires 1 parameter, got {len(params)}")
+        log.warning("action.bad_params", action="UPDATE_EMAIL", expected=1, got=len(params))
         return False, None
     email = params[0] if params[0].lower() != "null" else None
     __clients[clientId]["Email"] = email
     res = ClientAPI.update_client(clientId, email=email)
     return res["success"], res["error"] if not res["success"] else None
 
-def GET_PORTFOLIOS(clientId, params: list[str]):
+def GET_PORTFOLIOS(clientId, params: list[str], snapshot: ClientSnapshot = None):
     portfolios = __portfolios.get(clientId, [])
     if not portfolios:
-        print("Empty portfolio list")
+        log.debug("portfolios.empty", client_id=clientId)
         return True, "Let them know that they currently have no investment portfolios. Important: Suggest them to create one."
-    portfolios_info = [ClientAPI.get_portfolio(pid) for pid in portfolios]
-    print("AAAAA", portfolios_info)
+    portfolios_info = gather_portfolios(portfolios)
+    log.debug("portfolios.fetched", client_id=clientId, count=len(portfolios_info))
     return True, f"Summarize {portfolios_info} into something readable and simple for youth. IMPORTANT: If it has 0 invested amount, it means it is empty but still show it."
 
-def CREATE_PORTFOLIO(clientId, params: list[str]):
+def CREATE_PORTFOLIO(clientId, params: list[str], snapshot: ClientSnapshot = None):
     if len(params) != 1:
-        print(f"Error: CREATE_PORTFOLIO requires 1 parameter, got {len(params)}")
+        log.warning("action.bad_params", action="CREATE_PORTFOLIO", expected=1, got=len(params))
         return False, None
     portfolio_strategy = params[0] if params[0].lower() != "null" else None
     if portfolio_strategy not in LIST_OF_STRATEGIES:
@@ -180,41 +210,78 @@ def CREATE_PORTFOLIO(clientId, params: list[str]):
     res = ClientAPI.create_portfolio(clientId, portfolio_strategy, 100)  # Initial amount is set to 100 for demonstration
     if not res["success"]:
         return False, res["error"]["message"]
-    savePortfolio(res["data"]["id"], clientId)
+    savePortfolio(res["data"]["id"], clientId, portfolio_strategy)
     return True, f"Portfolio '{portfolio_strategy}' with ID {res['data']['id']}' created successfully. Remember the strategy is {portfolio_strategy} so that if user want to add money to it you can refer to that id for the portfolioType parameter of TRANSFER"
 
-def TRANSFER(clientId, params: list[str]):
+def money_failure_message(key: str, res: dict) -> str:
+    # A movement the journal could not settle may still have gone through: never tell the user it failed
+    record = money_journal().get(key)
+    if record is not None and record["state"] == UNKNOWN:
+        log.warning("money.unknown_outcome", key=key)
+        return f"IMPORTANT! Tell the user we are still confirming this movement (reference {key[:8]}) and not to retry it yet."
+    return res["error"]["message"]
+
+def TRANSFER(clientId, params: list[str], snapshot: ClientSnapshot = None):
     if len(params) != 2:
-        print(f"Error: TRANSFER requires 2 parameters, got {len(params)}")
+        log.warning("action.bad_params", action="TRANSFER", expected=2, got=len(params))
         return False, None
     try:
         amount = float(params[0])
     except ValueError:
-        print(f"Error: Amount must be a number, got '{params[0]}'")
+        log.warning("action.bad_amount", value=params[0])
         return False, None
     portfolioId = params[1]
-    res = ClientAPI.transfer_to_portfolio(portfolioId, amount)
+    key = new_idempotency_key()
+    res = ClientAPI.transfer_to_portfolio(portfolioId, amount, idempotency_key=key)
     if not res["success"]:
-        return False, res["error"]["message"]
+        return False, money_failure_message(key, res)
     return True, f"Transferred {amount} into portfolio '{portfolioId }' successfully."
 
-def WITHDRAW(clientId, params: list[str]):
+def WITHDRAW(clientId, params: list[str], snapshot: ClientSnapshot = None):
     if len(params) != 2:
-        print(f"Error: WITHDRAW requires 2 parameters, got {len(params)}")
+        log.warning("action.bad_params", action="WITHDRAW", expected=2, got=len(params))
         return False, None
     try:
-        amount = float(int(params[0]))
+        amount = float(params[0])
     except ValueError:
-        print(f"Error: Amount must be a number, got '{params[0]}'")
+        log.warning("action.bad_amount", value=params[0])
         return False, None
     portfolioId = params[1]
     if portfolioId is None:
         return False, f"Error: Portfolio '{portfolioId}' does not exist or is empty."
-    res = ClientAPI.withdraw_from_portfolio(portfolioId, amount)
+    key = new_idempotency_key()
+    res = ClientAPI.withdraw_from_portfolio(portfolioId, amount, idempotency_key=key)
     if not res["success"]:
-        return False, res["error"]["message"]
+        return False, money_failure_message(key, res)
     return True, f"IMPORTANT! Inform user that: Withdrew {amount} from portfolio '{portfolioId}' successfully."
 
+def PROJECT(clientId, params: list[str], snapshot: ClientSnapshot = None):
+    if len(params) not in (1, 2):
+        log.warning("action.bad_params", action="PROJECT", expected=2, got=len(params))
+        return False, None
+    try:
+        years = float(params[0])
+        if len(params) == 2 and params[1].lower() != "null":
+            daily_amount = float(params[1])
+        else:
+            daily_amount = float(get_client_info(clientId)["Daily Saving Amount"]) if clientId in __clients else 0.0
+    except ValueError:
+        log.warning("action.bad_amount", value=params)
+        return False, None
+    if not 0 < years <= 50:
+        return False, "Error: Projections are only available between 0 and 50 years ahead."
+    target = get_target(clientId)["Amount"] if clientId in __clients else None
+    from projection import project_client  # NumPy is only loaded once someone asks for a projection
+    projection = project_client(clientId, years, daily_amount, target=target or None, snapshot=snapshot)
+    log.debug("projection.done", client_id=clientId, years=years, daily_amount=daily_amount, p50=projection["p50"])
+    chance = f" Chance of reaching their saving target: {projection['chance_of_target']:.0%}." if "chance_of_target" in projection else ""
+    return True, (
+        f"Projection for {years:g} years adding ${daily_amount:g} a day: typical outcome ${projection['p50']:,.2f}, "
+        f"between ${projection['p10']:,.2f} (bad markets) and ${projection['p90']:,.2f} (good markets), "
+        f"from ${projection['current']:,.2f} today and ${projection['contributed']:,.2f} put in overall.{chance} "
+        f"Explain it simply and remind them it is an estimate, not a guarantee."
+    )
+
 action_to_function = {
     "UPDATE_NAME": UPDATE_NAME,
     "UPDATE_EMAIL": UPDATE_EMAIL,
@@ -222,54 +289,72 @@ action_to_function = {
     "CREATE_PORTFOLIO": CREATE_PORTFOLIO,
     "WITHDRAW": WITHDRAW,
     "TRANSFER": TRANSFER,
+    "PROJECT": PROJECT,
 }
-from level import __clients, register_client, get_client_info, get_messages, get_target, set_target, set_daily_saving, done_daily_saving, done_weekly_invest
+from level import SYSTEM_PROMPT, __clients, client_lock, register_client, get_client_info, get_client_name, set_client_name, get_messages, get_summary, fold_history, get_target, set_target, set_daily_saving, done_daily_saving, done_weekly_invest, sweep_streaks
+
+def action_name(action: str) -> str:
+    # Bounded metric label for whatever the LLM returned
+    if action in instructions:
+        return action
+    return next((name for name in instructions if name in action.upper()), "UNKNOWN")
+
+def do_action(clientId, action: str, params: list[str], resp, snapshot: ClientSnapshot = None):
+    '''
+    Pass a ClientSnapshot already fetched this turn to avoid re-listing the client's portfolios.
+    Latency is recorded under the action:<ACTION_NAME> histogram.
+    '''
+    name = action_name(action)
+    with timed("action", name):
+        successful, message = _do_action(clientId, action, params, resp, snapshot)
+    count("action", f"{name}:{'ok' if successful else 'failed'}")
+    return successful, message
 
-def do_action(clientId, action: str, params: list[str], resp):
+def _do_action(clientId, action: str, params: list[str], resp, snapshot: ClientSnapshot = None):
     if action in action_to_function:
-        return action_to_function[action](clientId, params)
+        return action_to_function[action](clientId, params, snapshot=snapshot)
 
     if "SET_TARGET_ITEM" in action.upper():
         if len(params) != 2:
-            print(f"Error: SET_TARGET requires 2 parameters, got {len(params)}")
+            log.warning("action.bad_params", action="SET_TARGET", expected=2, got=len(params))
             return False, None
         item = params[0] if params[0].lower() != "null" else None
         try:
             amount = float(params[1])
         except ValueError:
-            print(f"Error: Amount must be a number, got '{params[1]}'")
+            log.warning("action.bad_amount", value=params[1])
             return False, None
 
-        previous_target = deepcopy(get_target(clientId))
+        previous_target = dict(get_target(clientId))
         set_target(clientId, item, amount)
         return True, f"Notify if value is changed or value is initialized based on the prevValue: {previous_target} and new item={item}, amount={amount}."
 
     elif "SET_DAILY_SAVING_AMOUNT" in action.upper():
         if len(params) != 1:
-            print(f"Error: SET_DAILY_SAVING requires 1 parameter, got {len(params)}")
+            log.warning("action.bad_params", action="SET_DAILY_SAVING", expected=1, got=len(params))
             return False, None
         try:
             amount = float(params[0])
         except ValueError:
-            print(f"Error: Amount must be a number, got '{params[0]}'")
+            log.warning("action.bad_amount", value=params[0])
             return False, None
         set_daily_saving(clientId, amount)
-        print(f"Set daily saving for client {clientId}: amount={amount}")
+        log.info("saving.daily_amount_set", client_id=clientId, amount=amount)
 
     elif "DONE_DAILY_SAVING" in action.upper():
         done_daily_saving(clientId)
-        print(f"Marked daily saving as done for client {clientId}")
+        log.info("saving.done", client_id=clientId)
 
     elif "DONE_WEEKLY_INVEST" in action.upper():
         done_weekly_invest(clientId)
-        print(f"Marked weekly invest as done for client {clientId}")
+        log.info("invest.done", client_id=clientId)
 
     elif "NO_ACTION" in action.upper():
-        print(f"No action needed for client {clientId}")
+        log.debug("action.none", client_id=clientId)
 
     elif "NEED_MORE_INFO" in action.upper():
         if len(params) != 1:
-            print(f"Error: NEED_MORE_INFO requires no parameters, got {len(params)}")
+            log.warning("action.bad_params", action="NEED_MORE_INFO", expected=1, got=len(params))
             return False, None
         info = get_client_info(clientId)
         info_message = (
@@ -286,17 +371,24 @@ def do_action(clientId, action: str, params: list[str], resp):
             bar = '█' * filled_length + '-' * (bar_length - filled_length)
             return bar
         info = get_client_info(clientId)
+        target = info['Saving Target']
+        if "NOT SET YET" not in target['Item']:
+            if snapshot is None:
+                snapshot = ClientAPI.snapshot(info['id'])
+            target_progress = f"\"{target['Item']}\" {ClientAPI.getTotalInvested(info['id'], snapshot)} / {target['Amount']}"
+        else:
+            target_progress = 'None'
         info_message = (
-            f"👤 *{info['Name']}*   (🏆 Level {info['Level']})\n"
+            f"👤 *{get_client_name(clientId)}*   (🏆 Level {info['Level']})\n"
             f"───────────────────────\n"
             f"⭐ EXP: [{get_exp_bar(info['Exp'], info['ExpToNextLevel'])}]  {info['Exp']} / {info['ExpToNextLevel']}\n"
             f"💰 Daily Saving Amount: ${info['Daily Saving Amount']}\n"
             f"───────────────────────\n"
             f"🔥 {info['streaks']['Saving']} Saving Day Streak)\n"
             f"───────────────────────\n"
-            f"🎯 Target: {f"\"{info['Saving Target']['Item']}\" {ClientAPI.getTotalInvested(info['id'])} / {info['Saving Target']['Amount']}" if "NOT SET YET" not in info['Saving Target']['Item'] else 'None'}"
+            f"🎯 Target: {target_progress}"
         )
-        print(info_message)
+        log.debug("info.sent", client_id=clientId)
         resp.message(info_message)
         return True, "Info provided from server. Let the user know that it has been sent. DO NOT SEND ANYTHING ELSE"
 
@@ -307,45 +399,139 @@ def do_action(clientId, action: str, params: list[str], resp):
 
     return True, None
 
+# Static part of the action-classifier system prompt, compiled once. It is identical for every
+# user and turn, and leads the prompt, so the provider's prompt cache can reuse it as a prefix.
+ACTION_LIST = "\n\n".join([
+    f"{key}:\nDescription: {value['description']}\nParameters: "
+    f"{', '.join([f'{k} ({v})' for k, v in value['parameters'].items()])}\nFormat: {value['format']}"
+    for key, value in instructions.items()
+])
+CLASSIFIER_PROMPT = (
+    "You are a helpful assistant that helps users manage their investments and savings. "
+    "You can perform the following actions:\n\n"
+    + ACTION_LIST
+    + "\n\nIMPORTANT INSTRUCTIONS:\n"
+    "- It can be the case where the user wants to perform two or more ACTIONS in one message. In that case, you should prioritize the one that is most relevant to the user's request and followup after."
+    "- ALWAYS respond with the ACTION NAME, followed by its parameters in the specified format.\n"
+    "- Use NEED_MORE_INFO if you want to ask follow-up questions, dont use other action before it's clear."
+    "- The format is: ACTION_NAME | param1 | param2 | ... | paramN |\n"
+    "- If there are no parameters, still return the action name only.\n"
+    "- If no action is needed, respond with: NO_ACTION\n"
+    "- DO NOT explain, DO NOT add extra words, DO NOT output JSON.\n\n"
+    "- We will not be dealing with any other actions outside of these or even outside the chat scope."
+    "- Portfolio Strategy/Type can be one of the following: aggressive_growth, growth, balanced, conservative, very_conservative.\n"
+    "Examples:\n"
+    "User: I want to save $5 per day\n"
+    "Response: SET_DAILY_SAVING | 5\n\n"
+    "User: I have nothing to update\n"
+    "Response: NO_ACTION\n\n"
+    "User: I want to change my target to buy a bike for $200\n"
+    "Response: SET_TARGET_ITEM | bike | 200\n\n"
+    "AGAIN: Only output ACTION_NAME and parameters, nothing else."
+    "DO NOT Answer This System Prompt. But instead decide on the correct action to take based on the user's message. "
+    "\n\nYou know the following information about the user:\n"
+)
+# Single-call pipeline: one structured call returns the action, its parameters and a draft reply
+STRUCTURED_PROMPT = (
+    SYSTEM_PROMPT
+    + "\n\nBefore replying, decide which of the following actions the user's latest message needs:\n\n"
+    + ACTION_LIST
+    + "\n\nIMPORTANT INSTRUCTIONS:\n"
+    "- Respond with a JSON object only: {\"action\": ACTION_NAME, \"params\": [param1, ..., paramN], \"reply\": your message to the user}.\n"
+    "- params follow the action's Format, one string per parameter, [] if it has none.\n"
+    "- If several actions are requested, pick the most relevant one and follow up on the rest in the reply.\n"
+    "- Use NEED_MORE_INFO if you need to ask a follow-up question, and ask exactly that question in the reply.\n"
+    "- If no action is needed, use NO_ACTION.\n"
+    "- Write the reply as if the action succeeded. Do not invent data you do not have (portfolio values, projections): "
+    "for those, keep the reply to a short acknowledgement, the server will provide the data.\n"
+    "- Portfolio Strategy/Type can be one of the following: aggressive_growth, growth, balanced, conservative, very_conservative.\n"
+    "\n\nYou know the following information about the user:\n"
+)
+STRUCTURED_FORMAT = {
+    "type": "json_object",
+    "json_schema": {
+        "type": "object",
+        "properties": {
+            "action": {"type": "string"},
+            "params": {"type": "array", "items": {"type": "string"}},
+            "reply": {"type": "string"},
+        },
+        "required": ["action", "params", "reply"],
+    },
+}
+TWO_CALL = "two_call"
+SINGLE_CALL = "single_call"
+# Per deployment: two_call classifies then replies; single_call asks once and uses the draft reply
+# unless the action failed or returned data the reply has to be written from
+PIPELINE = os.getenv("RBCAGENT_PIPELINE", TWO_CALL)
+PORTFOLIO_SECTION_TTL = 3600  # seconds; bounds staleness when another worker adds a portfolio
+
+# Per-client tail of the classifier prompt, dropped whenever the client's portfolios change
+_prompt_cache = TTLCache(max_entries=10_000)
+
+@on_portfolios_changed
+def _invalidate_portfolio_section(clientId):
+    _prompt_cache.delete("portfolio_section", clientId)
+
+def prompt_cache_stats() -> dict:
+    return _prompt_cache.stats()
+
+def portfolio_section(clientId) -> str:
+    section = _prompt_cache.get("portfolio_section", clientId)
+    if section is None:
+        portfolio_types = getPortfolioTypes(clientId)
+        section = f"Their portfolio consist of {', '.join(f'ID: {portfolioId}, Type: {portfolio_type}' for portfolioId, portfolio_type in portfolio_types)}"
+        if all(portfolio_type != "unknown" for _, portfolio_type in portfolio_types):  # retry typing next turn otherwise
+            _prompt_cache.set("portfolio_section", clientId, section, PORTFOLIO_SECTION_TTL)
+    return section
+
+def grade_quiz_answer(previous: str, text: str):
+    '''
+    Grade a reply to a bank quiz against its stored answer.
+    Returns (action, params) for do_action, or None if it is not a clear answer to a bank quiz.
+    '''
+    quiz = _quiz_bank.lookup(previous[len(QUIZ_PREFIX):])
+    correct = grade(quiz, text) if quiz is not None else None
+    if correct is None:
+        return None
+    count("quiz", "correct" if correct else "wrong")
+    if correct:
+        return "CORRECT_QUIZ", [quiz["explanation"]]
+    return "WRONG_QUIZ", [f"{quiz['answer']}) {quiz['options'][quiz['answer']]}", quiz["explanation"]]
+
+def route_locally(clientId, messages, resp):
+    '''
+    Perform the action of an unambiguous user message (or a quiz answer) without the LLM.
+    Returns do_action's result, or None if the message needs the LLM.
+    '''
+    if messages[-1]["role"] != "user":
+        return None
+    previous = messages[-2]["content"] if len(messages) > 2 and messages[-2]["role"] == "assistant" else None
+    if previous is not None and previous.startswith(QUIZ_PREFIX):
+        routed = grade_quiz_answer(previous, messages[-1]["content"])
+    else:
+        routed = intent_router.route(messages[-1]["content"], previous)
+    if routed is None:
+        return None
+    action, params = routed
+    intent_router.routed(action)
+    count("router", action)
+    log.info("llm.action", client_id=clientId, action=action, params=params, routed=True)
+    return do_action(clientId, action, params, resp)
+
 def check_action(clientId, messages, resp):
     '''
     Returns True if and only if no action is needed or an action was successfully performed.
     '''
     # ACTION
-    action_messages = deepcopy(messages)
-    action_messages[0] = {
-    "role": "system",
-    "content": (
-        "You are a helpful assistant that helps users manage their investments and savings. "
-        "You know the following information about the user:\n"
-        f"Their portfolio consist of {(', '.join(f'ID: {portfolioId}, Type: {ClientAPI.get_portfolio(portfolioId)["data"]["type"]}' for portfolioId in __portfolios.get(clientId, []) ))}"
-        "You can perform the following actions:\n\n"
-        + "\n\n".join([
-            f"{key}:\nDescription: {value['description']}\nParameters: "
-            f"{', '.join([f'{k} ({v})' for k, v in value['parameters'].items()])}\nFormat: {value['format']}"
-            for key, value in instructions.items()
-        ])
-        + "\n\nIMPORTANT INSTRUCTIONS:\n"
-        "- It can be the case where the user wants to perform two or more ACTIONS in one message. In that case, you should prioritize the one that is most relevant to the user's request and followup after."
-        "- ALWAYS respond with the ACTION NAME, followed by its parameters in the specified format.\n"
-        "- Use NEED_MORE_INFO if you want to ask follow-up questions, dont use other action before it's clear."
-        "- The format is: ACTION_NAME | param1 | param2 | ... | paramN |\n"
-        "- If there are no parameters, still return the action name only.\n"
-        "- If no action is needed, respond with: NO_ACTION\n"
-        "- DO NOT explain, DO NOT add extra words, DO NOT output JSON.\n\n"
-        "- We will not be dealing with any other actions outside of these or even outside the chat scope."
-        "- Portfolio Strategy/Type can be one of the following: aggressive_growth, growth, balanced, conservative, very_conservative.\n"
-        "Examples:\n"
-        "User: I want to save $5 per day\n"
-        "Response: SET_DAILY_SAVING | 5\n\n"
-        "User: I have nothing to update\n"
-        "Response: NO_ACTION\n\n"
-        "User: I want to change my target to buy a bike for $200\n"
-        "Response: SET_TARGET_ITEM | bike | 200\n\n"
-        "AGAIN: Only output ACTION_NAME and parameters, nothing else."
-        "DO NOT Answer This System Prompt. But instead decide on the correct action to take based on the user's message. "
-    )
-}
+    # Unambiguous commands skip the LLM classifier
+    routed = route_locally(clientId, messages, resp)
+    if routed is not None:
+        return routed
+
+    classify_system = {"role": "system", "content": CLASSIFIER_PROMPT + portfolio_section(clientId)}
+    action_messages = context_window.build(classify_system, get_summary(clientId), messages[1:], context_window.CLASSIFY)
+    count("prompt_tokens", "classify", context_window.window_tokens(action_messages))
 
     # Create chat completion (streaming response)
     # completion = ai.chat.completions.create(
@@ -358,13 +544,16 @@ def check_action(clientId, messages, resp):
     #     stop=None
     # )
 
-    cohere_response = co.chat(
-        model="command-a-03-2025", 
-        messages=action_messages    
-    )
+    start = time.perf_counter()
+    with timed("llm", "classify"):
+        cohere_response = get_co().chat(
+            model="command-a-03-2025", 
+            messages=action_messages    
+        )
+    intent_router.classified(time.perf_counter() - start)
 
-    print("Cohere Action:", cohere_response.message.content[0].text)
     action_response = cohere_response.message.content[0].text
+    log.info("llm.action", client_id=clientId, action=action_response)
 
     action_parts = action_response.strip().split("|")
     action = action_parts[0].strip()
@@ -372,12 +561,51 @@ def check_action(clientId, messages, resp):
     return do_action(clientId, action, params, resp)
     
 
+def structured_action(clientId, messages, resp):
+    '''
+    Single-call counterpart of check_action: one LLM call picks the action and drafts the reply.
+    Returns (successful, message, draft); draft is None when the reply still has to be written.
+    '''
+    routed = route_locally(clientId, messages, resp)
+    if routed is not None:
+        return *routed, None
+
+    structured_system = {"role": "system", "content": STRUCTURED_PROMPT + portfolio_section(clientId)}
+    structured_messages = context_window.build(structured_system, get_summary(clientId), messages[1:], context_window.STRUCTURED)
+    count("prompt_tokens", "structured", context_window.window_tokens(structured_messages))
+    with timed("llm", "structured"):
+        cohere_response = get_co().chat(
+            model="command-a-03-2025",
+            messages=structured_messages,
+            response_format=STRUCTURED_FORMAT
+        )
+
+    text = cohere_response.message.content[0].text
+    try:
+        result = json.loads(text)
+        action = str(result["action"]).strip()
+        params = [str(param).strip() for param in result.get("params") or []]
+        draft = str(result.get("reply") or "").strip() or None
+    except (ValueError, KeyError, TypeError, AttributeError):
+        log.warning("llm.structured_invalid", client_id=clientId, response=text[:200])
+        count("llm", "structured:invalid")
+        return *check_action(clientId, messages, resp), None
+    log.info("llm.action", client_id=clientId, action=action, params=params, structured=True)
+    if action_name(action) == "NEED_MORE_INFO" and draft is not None:
+        count("action", "NEED_MORE_INFO:ok")
+        return True, None, draft  # the draft already asks the follow-up question
+    return *do_action(clientId, action, params, resp), draft
+
 def handle_client(clientId, resp):
     messages = get_messages(clientId)
     if messages is None:
         return  # Client not registered
 
-    successfulAction, message = check_action(clientId, messages, resp)
+    draft = None
+    if PIPELINE == SINGLE_CALL:
+        successfulAction, message, draft = structured_action(clientId, messages, resp)
+    else:
+        successfulAction, message = check_action(clientId, messages, resp)
     if not successfulAction:
         if message:
             messages.append({
@@ -407,45 +635,135 @@ def handle_client(clientId, resp):
     # )
     
 
-    cohere_response = co.chat(
-        model="command-a-03-2025", 
-        messages=messages  
-    )
-
-    print("Cohere Response:", cohere_response.message.content[0].text)
-    res = cohere_response.message.content[0].text
+    if successfulAction and not message and draft is not None:
+        # Nothing happened that the draft did not already know about
+        count("llm", "reply:drafted")
+        res = draft
+    else:
+        reply_messages = context_window.build(messages[0], get_summary(clientId), messages[1:], context_window.REPLY)
+        count("prompt_tokens", "reply", context_window.window_tokens(reply_messages))
+        with timed("llm", "reply"):
+            cohere_response = get_co().chat(
+                model="command-a-03-2025", 
+                messages=reply_messages
+            )
+        res = cohere_response.message.content[0].text
+    log.debug("llm.reply", client_id=clientId, reply=res)
 
     messages.append({
         "role": "assistant",
         "content": res
     })
+    if context_window.foldable(messages[1:]):
+        schedule_compaction(clientId)  # this turn's windows already hold the summary and the trimmed history
 
     return res
 
 
-def daily_quiz(clientId):
+def compact_history(clientId):
+    # Fold turns that no window sends anymore into the rolling summary, a few turns at a time.
+    # The summary call runs without the client lock; the fold is dropped if the turns moved meanwhile.
+    with client_lock(clientId):
+        messages = get_messages(clientId)
+        folded = context_window.foldable(messages[1:]) if messages is not None else 0
+        if not folded:
+            return
+        prefix = messages[1:folded + 1]
+        summary = get_summary(clientId)
+    try:
+        with timed("llm", "summarize"):
+            cohere_response = get_co().chat(
+                model="command-a-03-2025",
+                messages=context_window.summary_prompt(summary, prefix)
+            )
+    except Exception:
+        log.exception("context.summarize_failed", client_id=clientId)
+        return  # keep the history, retried after the next reply
+    with client_lock(clientId):
+        messages = get_messages(clientId)
+        if (messages is None or get_summary(clientId) != summary or len(messages) <= folded
+                or any(old is not new for old, new in zip(prefix, messages[1:folded + 1]))):
+            count("context", "fold:stale")
+            return
+        fold_history(clientId, folded, context_window.clip_summary(cohere_response.message.content[0].text))
+    log.debug("context.folded", client_id=clientId, messages=folded)
+
+# Clients due for compaction, summarized one at a time by a background thread started on first use
+_compaction_queue = queue.Queue()
+_compaction_pending = set()
+_compaction_lock = threading.Lock()
+_compaction_thread = None
+
+def schedule_compaction(clientId):
+    global _compaction_thread
+    with _compaction_lock:
+        if clientId in _compaction_pending:
+            return
+        _compaction_pending.add(clientId)
+        if _compaction_thread is None:
+            _compaction_thread = threading.Thread(target=_compact_queued, name="history-compaction", daemon=True)
+            _compaction_thread.start()
+    _compaction_queue.put(clientId)
+
+def _compact_queued():
+    while True:
+        clientId = _compaction_queue.get()
+        with _compaction_lock:
+            _compaction_pending.discard(clientId)
+        try:
+            compact_history(clientId)
+        except Exception:
+            log.exception("context.compact_failed", client_id=clientId)
+        _compaction_queue.task_done()
+
+def wait_for_compaction():
+    """
+    Block until every scheduled compaction has run (benchmarks, shutdown).
+    """
+    _compaction_queue.join()
+
+
+QUIZ_PREFIX = "Daily Quiz: "
+
+# Shared, pre-generated quizzes: one bank lookup per client instead of one LLM call
+_quiz_bank = QuizBank()
+
+def quiz_bank_stats() -> dict:
+    return _quiz_bank.stats()
+
+def generate_quiz() -> str:
+    # Fallback when the bank is empty and cannot be filled: a one-off quiz, graded by the classifier
+    with timed("llm", "quiz"):
+        cohere_response = get_co().chat(
+            model="command-a-03-2025",
+            messages=[
+                {"role": "user", "content": "Send me a daily quiz question about investing or saving. Make it fun and educational. Ask one question only with two options."
+                "IMPORTANT: Format it like 'QUESTION | A) OPTION1 | B) OPTION2'. Do not add anything else. Example: What is a stock? | A) A share in a company | B) A type of bond"}
+            ]
+        )
+    return cohere_response.message.content[0].text
+
+def daily_quiz(clientId, cohort: str = quiz_bank.ALL):
     messages = get_messages(clientId)
     if messages is None:
         return  # Client not registered 
-    cohere_response = co.chat(
-        model="command-a-03-2025",
-        messages=[
-            {"role": "user", "content": "Send me a daily quiz question about investing or saving. Make it fun and educational. Ask one question only with two options."
-            "IMPORTANT: Format it like 'QUESTION | A) OPTION1 | B) OPTION2'. Do not add anything else. Example: What is a stock? | A) A share in a company | B) A type of bond"}
-        ]
-    )
-
-    message = cohere_response.message.content[0].text
+    quiz = _quiz_bank.today(cohort, co_factory=get_co)
+    message = format_quiz(quiz) if quiz is not None else generate_quiz()
 
     # Send message to user (placeholder)
-    print("Cohere Daily Quiz:", message)
+    log.info("quiz.sent", client_id=clientId, quiz=message, cohort=cohort, bank=quiz is not None)
 
-    messages.append({
-        "role": "assistant",
-        "content": "Daily Quiz: " + message
-    })
+    with client_lock(clientId):
+        messages.append({
+            "role": "assistant",
+            "content": QUIZ_PREFIX + message
+        })
+
+    return QUIZ_PREFIX + message
 
-    return "Daily Quiz: " + message
+def daily_quizzes(cohort: str = quiz_bank.ALL, clientIds=None) -> dict:
+    # Scheduled once a day: the same bank quiz to every client of the cohort (default: every client)
+    return {clientId: daily_quiz(clientId, cohort) for clientId in (__clients if clientIds is None else clientIds)}
 
 
 def daily_ask_if_done_saving(clientId):
@@ -454,11 +772,18 @@ def daily_ask_if_done_saving(clientId):
         return  # Client not registered 
     daily_saving_amount = __clients[clientId]["Daily Saving Amount"]
     question = f"Have you completed your daily saving of ${daily_saving_amount} today? Please answer with yes or no."
-    messages.append({
-        "role": "assistant",
-        "content": "Daily Ask If Done Saving: " + question
-    })
+    with client_lock(clientId):
+        messages.append({
+            "role": "assistant",
+            "content": "Daily Ask If Done Saving: " + question
+        })
 
     # Send message to user (placeholder)
-    print("Daily Ask If Done Saving:", question)
+    log.info("saving.reminder", client_id=clientId, question=question)
     return question
+
+
+def daily_saving_reminders(now: float = None) -> dict:
+    # Scheduled once a day: expire broken streaks, then ask everyone who has not saved today
+    sweep = sweep_streaks(now)
+    return {clientId: daily_ask_if_done_saving(clientId) for clientId in sweep["saving_due"]}
@@ -0,0 +1,217 @@
+"""
+Persistent clientId -> {strategy: portfolioId} index backed by portfolios.txt.
+
+Each line is `clientId|portfolioId|strategy` (older two-field lines have no strategy yet and
+are typed on first lookup). The file is compacted on load, new portfolios are appended with
+a single fsynced write, and rewrites go through a temp file + os.replace, so a crash never
+leaves a half-written index. Type lookups are O(1) dict reads with no network call.
+
+Environment:
+    RBCAGENT_PORTFOLIOS_FILE  index path (default portfolios.txt)
+
+    python portfolio_index.py reconcile            # rebuild every indexed client from list_portfolios
+    python portfolio_index.py reconcile CLIENT_ID  # ... or just these clients
+"""
+import argparse
+import os
+import threading
+from collections.abc import Mapping
+
+from api import ClientAPI
+from telemetry import get_logger
+
+PORTFOLIOS_FILE = os.getenv("RBCAGENT_PORTFOLIOS_FILE", "portfolios.txt")
+
+log = get_logger("portfolio_index")
+
+
+class _PortfolioIds(Mapping):
+    """
+    Read-only clientId -> [portfolioId] view that loads the index on first access.
+    """
+
+    def __init__(self, index: "PortfolioIndex"):
+        self._index = index
+
+    def __getitem__(self, client_id: str) -> list[str]:
+        return self._index._loaded()[client_id]
+
+    def __iter__(self):
+        return iter(list(self._index._loaded()))
+
+    def __len__(self) -> int:
+        return len(self._index._loaded())
+
+
+class PortfolioIndex:
+    def __init__(self, path: str = PORTFOLIOS_FILE):
+        self.path = path
+        self.ids = _PortfolioIds(self)
+        self._ids = {}  # clientId -> [portfolioId], in creation order (lists are replaced, never mutated)
+        self.by_type = {}  # clientId -> {strategy: portfolioId}, first portfolio of each strategy
+        self._types = {}  # portfolioId -> strategy, None while unknown
+        self._owner = {}  # portfolioId -> clientId
+        self._lock = threading.Lock()
+        self._is_loaded = False
+
+    def _loaded(self) -> dict:
+        if not self._is_loaded:
+            self.load()
+        return self._ids
+
+    def load(self):
+        """
+        Read the file, keeping the last line for each portfolio, and rewrite it if it held
+        duplicates or unparseable lines.
+        """
+        entries = {}  # portfolioId -> (clientId, strategy), insertion ordered
+        lines = 0
+        try:
+            with open(self.path, "r") as f:
+                for line in f:
+                    lines += 1
+                    fields = line.strip().split("|")
+                    if len(fields) < 2 or not fields[0] or not fields[1]:
+                        continue
+                    client_id, portfolio_id = fields[0], fields[1]
+                    strategy = fields[2] if len(fields) > 2 and fields[2] else None
+                    previous = entries.pop(portfolio_id, None)
+                    entries[portfolio_id] = (client_id, strategy or (previous[1] if previous else None))
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            for mapping in (self._ids, self.by_type, self._types, self._owner):
+                mapping.clear()
+            for portfolio_id, (client_id, strategy) in entries.items():
+                self._add(client_id, portfolio_id, strategy)
+            if lines != len(entries):
+                self._rewrite()
+                log.info("portfolio_index.compacted", lines=lines, portfolios=len(entries))
+            self._is_loaded = True
+
+    def _add(self, client_id: str, portfolio_id: str, strategy: str | None):
+        # Called under _lock
+        if portfolio_id not in self._owner:
+            self._ids[client_id] = self._ids.get(client_id, []) + [portfolio_id]
+        self._owner[portfolio_id] = client_id
+        self._types[portfolio_id] = strategy
+        if strategy is not None:
+            types = self.by_type.setdefault(client_id, {})
+            if strategy not in types:
+                types[strategy] = portfolio_id
+
+    def _line(self, portfolio_id: str) -> str:
+        return f"{self._owner[portfolio_id]}|{portfolio_id}|{self._types[portfolio_id] or ''}\n"
+
+    def _append(self, portfolio_id: str):
+        # A single O_APPEND write of one short line lands whole or not at all
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, self._line(portfolio_id).encode())
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _rewrite(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            for portfolio_ids in self._ids.values():
+                for portfolio_id in portfolio_ids:
+                    f.write(self._line(portfolio_id))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def add(self, client_id: str, portfolio_id: str, strategy: str = None):
+        """
+        Record a portfolio (or the strategy of an already indexed one) and persist it.
+        """
+        self._loaded()
+        with self._lock:
+            known = portfolio_id in self._owner
+            strategy = strategy or self._types.get(portfolio_id)
+            if known and self._owner[portfolio_id] == client_id and self._types[portfolio_id] == strategy:
+                return
+            if known and self._owner[portfolio_id] != client_id:
+                self._remove(portfolio_id)
+            self._add(client_id, portfolio_id, strategy)
+            if known:
+                self._rebuild_types(client_id)
+                self._rewrite()
+            else:
+                self._append(portfolio_id)
+
+    def _remove(self, portfolio_id: str):
+        # Called under _lock
+        client_id = self._owner.pop(portfolio_id)
+        self._types.pop(portfolio_id)
+        self._ids[client_id] = [pid for pid in self._ids[client_id] if pid != portfolio_id]
+        self._rebuild_types(client_id)
+
+    def _rebuild_types(self, client_id: str):
+        # Called under _lock
+        types = {}
+        for portfolio_id in self._ids.get(client_id, []):
+            if self._types[portfolio_id] is not None:
+                types.setdefault(self._types[portfolio_id], portfolio_id)
+        self.by_type[client_id] = types
+
+    def portfolio_id(self, client_id: str, strategy: str) -> str | None:
+        self._loaded()
+        types = self.by_type.get(client_id)
+        return types.get(strategy) if types else None
+
+    def strategy(self, portfolio_id: str) -> str | None:
+        self._loaded()
+        return self._types.get(portfolio_id)
+
+    def untyped(self, client_id: str) -> list[str]:
+        return [portfolio_id for portfolio_id in self._loaded().get(client_id, []) if self._types.get(portfolio_id) is None]
+
+    def replace_client(self, client_id: str, portfolios: list[dict]):
+        """
+        Make the index for a client match a list_portfolios response exactly.
+        """
+        self._loaded()
+        with self._lock:
+            for portfolio_id in self._ids.get(client_id, []):
+                self._remove(portfolio_id)
+            for portfolio in portfolios:
+                self._add(client_id, portfolio["id"], portfolio.get("type"))
+            self._rewrite()
+
+    def reconcile(self, client_ids: list[str] = None) -> dict:
+        """
+        Rebuild the index of the given clients (default: every indexed client) from list_portfolios.
+
+        Returns:
+            dict: clientId -> number of portfolios indexed, or None if the listing failed.
+        """
+        results = {}
+        for client_id in client_ids if client_ids is not None else list(self._loaded()):
+            res = ClientAPI.list_portfolios(client_id, fresh=True)
+            if not res["success"]:
+                log.warning("portfolio_index.reconcile_failed", client_id=client_id, status_code=res["status_code"])
+                results[client_id] = None
+                continue
+            self.replace_client(client_id, res["data"])
+            results[client_id] = len(res["data"])
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    reconcile = sub.add_parser("reconcile")
+    reconcile.add_argument("client_ids", nargs="*", help="clients to rebuild, default every indexed client")
+    parser.add_argument("--file", default=PORTFOLIOS_FILE)
+    args = parser.parse_args()
+
+    index = PortfolioIndex(args.file)
+    index.load()
+    for client_id, portfolios in index.reconcile(args.client_ids or None).items():
+        print(f"{client_id}: {'failed' if portfolios is None else f'{portfolios} portfolios'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Local Monte Carlo projection engine for "how much will I have in N years" questions.
+
+Each portfolio grows with monthly lognormal returns whose mean is calibrated from its
+get_portfolio_analysis trailing return (blended with a per-strategy prior) and whose
+volatility comes from the strategy. Every portfolio sees the same market shock on a given
+path and month, since every strategy is a mix of the same underlying assets.
+Simulation is vectorized over clients x portfolios x paths, so one call answers one or
+thousands of clients in milliseconds, for any horizon (unlike simulate_portfolios' 12 months).
+"""
+import math
+
+import numpy as np
+
+from api import ClientSnapshot
+from async_api import gather_portfolio_analyses
+
+# Prior (annual expected return, annual volatility) per strategy
+STRATEGY_ASSUMPTIONS = {
+    "aggressive_growth": (0.09, 0.18),
+    "growth": (0.075, 0.14),
+    "balanced": (0.06, 0.10),
+    "conservative": (0.045, 0.06),
+    "very_conservative": (0.03, 0.03),
+}
+DEFAULT_STRATEGY = "balanced"  # where contributions go when the client has no portfolio yet
+CALIBRATION_WEIGHT = 0.5  # weight of the observed trailing return vs. the strategy prior
+DEFAULT_PATHS = 2000
+DAYS_PER_MONTH = 365 / 12
+PERCENTILES = (10, 50, 90)
+
+# Keys the analysis payload may use for trailing returns, mapped to their horizon in years
+TRAILING_KEYS = {
+    "1Year": 1, "1year": 1, "1Y": 1, "1y": 1, "oneYear": 1, "12Month": 1, "12Months": 1,
+    "3Year": 3, "3year": 3, "3Y": 3, "3y": 3, "threeYear": 3,
+    "5Year": 5, "5year": 5, "5Y": 5, "5y": 5, "fiveYear": 5,
+    "6Month": 0.5, "6Months": 0.5, "6M": 0.5, "3Month": 0.25, "3Months": 0.25, "3M": 0.25,
+}
+
+
+def trailing_annual_return(analysis: dict) -> float | None:
+    """
+    Extract an annualized trailing return from a get_portfolio_analysis payload, preferring
+    the longest horizon available. Percent values (e.g. 7.5) are converted to fractions.
+    """
+    trailing = analysis.get("trailingReturns") or analysis.get("trailing_returns") or {}
+    if not isinstance(trailing, dict):
+        return None
+    best = None
+    for key, value in trailing.items():
+        horizon = TRAILING_KEYS.get(key)
+        if horizon is None or not isinstance(value, (int, float)):
+            continue
+        if best is None or horizon > best[0]:
+            best = (horizon, float(value))
+    if best is None:
+        return None
+    horizon, value = best
+    if abs(value) > 1.5:  # reported in percent
+        value /= 100
+    if value <= -1:
+        return None
+    return (1 + value) ** (1 / horizon) - 1
+
+
+def calibrate(strategy: str, analysis: dict | None = None) -> tuple[float, float]:
+    """
+    Returns:
+        tuple: (annual expected return, annual volatility) for a portfolio.
+    """
+    prior_mean, volatility = STRATEGY_ASSUMPTIONS.get(strategy, STRATEGY_ASSUMPTIONS[DEFAULT_STRATEGY])
+    observed = trailing_annual_return(analysis) if analysis else None
+    if observed is None:
+        return prior_mean, volatility
+    return CALIBRATION_WEIGHT * observed + (1 - CALIBRATION_WEIGHT) * prior_mean, volatility
+
+
+def simulate(values, contributions, means, volatilities, months: int,
+             paths: int = DEFAULT_PATHS, seed: int = None) -> np.ndarray:
+    """
+    Vectorized Monte Carlo over clients x portfolios x paths.
+
+    Parameters:
+        values (array): Current value per portfolio, shape (clients, portfolios). Pad with 0.
+        contributions (array): Amount added at the start of every month, same shape.
+        means (array): Annual expected return per portfolio, same shape.
+        volatilities (array): Annual volatility per portfolio, same shape.
+        months (int): Horizon in months.
+        paths (int): Simulated market paths, shared by all clients.
+        seed (int): Random seed, for reproducible answers.
+
+    Returns:
+        np.ndarray: Final total value per client and path, shape (clients, paths).
+    """
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    contributions = np.broadcast_to(np.asarray(contributions, dtype=float), values.shape)
+    monthly_sigma = np.broadcast_to(np.asarray(volatilities, dtype=float), values.shape) / math.sqrt(12)
+    monthly_drift = np.log1p(np.broadcast_to(np.asarray(means, dtype=float), values.shape)) / 12 - monthly_sigma ** 2 / 2
+    drift_factor = np.exp(monthly_drift).ravel()
+
+    # With contributions c at the start of each month and growth G_t = d * exp(sigma * z_t),
+    #   V_T = V_0 * prod(G_1..G_T) + c * sum_t prod(G_t..G_T)
+    # Every portfolio sees the same market shocks z_t, so prod(G_t..G_T) factors into a
+    # per-portfolio power of d times exp(sigma * (Z_T - Z_{t-1})), which depends only on
+    # sigma and the path. Only a handful of distinct volatilities exist (one per strategy),
+    # so each volatility group is a single matrix product instead of a month-by-month loop.
+    rng = np.random.default_rng(seed)
+    walk = np.vstack([np.zeros(paths), np.cumsum(rng.standard_normal((months, paths)), axis=0)])
+    remaining = walk[-1] - walk[:-1]  # Z_T - Z_{t-1} for t = 1..T, shape (months, paths)
+
+    powers = drift_factor[:, None] ** np.arange(months, 0, -1)  # d^(T-t+1)
+    coefficients = contributions.reshape(-1, 1) * powers
+    coefficients[:, 0] += values.ravel() * powers[:, 0]
+
+    final = np.empty((values.size, paths))
+    sigmas, sigma_index = np.unique(monthly_sigma.ravel(), return_inverse=True)
+    for group, sigma in enumerate(sigmas):
+        members = sigma_index == group
+        final[members] = coefficients[members] @ np.exp(sigma * remaining)
+    return final.reshape(values.shape + (paths,)).sum(axis=1)
+
+
+def summarize(totals: np.ndarray, contributed, target: float = None) -> list[dict]:
+    """
+    Percentiles, mean and (optionally) the chance of reaching a target, per client.
+    """
+    percentiles = np.percentile(totals, PERCENTILES, axis=-1)
+    means = totals.mean(axis=-1)
+    contributed = np.broadcast_to(np.asarray(contributed, dtype=float), means.shape)
+    summaries = []
+    for i in range(totals.shape[0]):
+        summary = {f"p{p}": round(float(percentiles[j, i]), 2) for j, p in enumerate(PERCENTILES)}
+        summary["mean"] = round(float(means[i]), 2)
+        summary["contributed"] = round(float(contributed[i]), 2)
+        if target:
+            summary["chance_of_target"] = round(float((totals[i] >= target).mean()), 3)
+        summaries.append(summary)
+    return summaries
+
+
+def _client_inputs(client_id: str, daily_contribution: float, snapshot: ClientSnapshot = None):
+    if snapshot is None:
+        snapshot = ClientSnapshot.fetch(client_id)
+    portfolios = snapshot.portfolios
+    analyses = gather_portfolio_analyses([portfolio["id"] for portfolio in portfolios])
+
+    if not portfolios:
+        strategies, values, analyses = [DEFAULT_STRATEGY], [0.0], [None]
+    else:
+        strategies = [portfolio.get("type", DEFAULT_STRATEGY) for portfolio in portfolios]
+        values = [float(portfolio.get("current_value", 0.0)) for portfolio in portfolios]
+        analyses = [res["data"] if res["success"] else None for res in analyses]
+
+    total = sum(values)
+    shares = [value / total for value in values] if total > 0 else [1 / len(values)] * len(values)
+    monthly = daily_contribution * DAYS_PER_MONTH
+    params = [calibrate(strategy, analysis) for strategy, analysis in zip(strategies, analyses)]
+    return values, [monthly * share for share in shares], [p[0] for p in params], [p[1] for p in params]
+
+
+def project_clients(client_ids: list[str], years: float, daily_contribution: float = 0.0,
+                    target: float = None, paths: int = DEFAULT_PATHS, seed: int = None,
+                    snapshots: dict = None) -> dict:
+    """
+    Project the total portfolio value of one or many clients `years` ahead, adding
+    `daily_contribution` every day (split across portfolios by current value).
+
+    Parameters:
+        client_ids (list[str]): Clients to project.
+        years (float): Horizon in years.
+        daily_contribution (float): Extra amount saved per day.
+        target (float): Optional goal; adds the chance of reaching it.
+        paths (int): Simulated paths per client.
+        seed (int): Random seed.
+        snapshots (dict): Optional client id -> ClientSnapshot already fetched.
+
+    Returns:
+        dict: client id -> {p10, p50, p90, mean, contributed, current, [chance_of_target]}.
+    """
+    snapshots = snapshots or {}
+    months = max(1, round(years * 12))
+    inputs = [_client_inputs(client_id, daily_contribution, snapshots.get(client_id)) for client_id in client_ids]
+    width = max(len(values) for values, _, _, _ in inputs)
+
+    def padded(column, fill):
+        return np.array([row[column] + [fill] * (width - len(row[column])) for row in inputs])
+
+    values, contributions = padded(0, 0.0), padded(1, 0.0)
+    means, volatilities = padded(2, 0.0), padded(3, 0.0)
+    totals = simulate(values, contributions, means, volatilities, months, paths, seed)
+    contributed = values.sum(axis=1) + contributions.sum(axis=1) * months
+    summaries = summarize(totals, contributed, target)
+    for summary, current in zip(summaries, values.sum(axis=1)):
+        summary["current"] = round(float(current), 2)
+    return dict(zip(client_ids, summaries))
+
+
+def project_client(client_id: str, years: float, daily_contribution: float = 0.0, target: float = None,
+                   paths: int = DEFAULT_PATHS, seed: int = None, snapshot: ClientSnapshot = None) -> dict:
+    """
+    Single-client convenience wrapper around project_clients.
+    """
+    snapshots = {client_id: snapshot} if snapshot is not None else None
+    return project_clients([client_id], years, daily_contribution, target, paths, seed, snapshots)[client_id]
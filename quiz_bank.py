@@ -0,0 +1,322 @@
+"""
+Pre-generated daily quiz bank: quizzes are generated in batches ahead of time, validated, and
+stored with their correct answer, so each day's quiz is one bank lookup shared by every client
+(or every client of a cohort) and answers are graded without the LLM.
+
+One generation call writes a batch of quizzes as `QUESTION | A) OPTION1 | B) OPTION2 | ANSWER |
+EXPLANATION` lines. A line is kept only if it parses, its answer is A or B, its options differ,
+and its question is not already in the bank; a second call then answers the kept questions
+blind and any quiz whose answer disagrees with its key is dropped.
+
+The bank is a JSONL file of two record types, appended with one O_APPEND write each:
+    {"type": "quiz", "id", "question", "options": {"A", "B"}, "answer", "explanation", "time"}
+    {"type": "served", "day": "YYYY-MM-DD", "cohort", "quiz": id, "time"}
+The first served record for a (day, cohort) wins, so every worker process serves the same quiz.
+Once every quiz has been served, the one served longest ago is repeated.
+
+Environment:
+    RBCAGENT_QUIZ_BANK  bank path (default quiz_bank.jsonl)
+
+    python quiz_bank.py generate --count 60   # top up the bank to 60 unserved quizzes
+    python quiz_bank.py today --cohort all    # the quiz served today
+    python quiz_bank.py stats
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from datetime import date
+
+from telemetry import count, get_logger, timed
+
+QUIZ_BANK_FILE = os.getenv("RBCAGENT_QUIZ_BANK", "quiz_bank.jsonl")
+ALL = "all"  # cohort served when clients are not split into cohorts
+BATCH = 20  # quizzes asked for per generation call
+MIN_UNSERVED = 7  # serving starts a background top-up below this, a week ahead
+MAX_QUESTION = 200
+MAX_OPTION = 80
+MAX_EXPLANATION = 300
+MAX_ATTEMPTS = 3  # batches adding nothing before a refill gives up
+
+GENERATE_PROMPT = (
+    "Write {n} different daily quiz questions about investing or saving for young people. Make them fun and educational, "
+    "each with exactly two options, one of them correct. Vary the topics: budgeting, compound interest, stocks, bonds, ETFs, "
+    "risk, diversification, inflation, emergency funds, credit.\n"
+    "IMPORTANT: One quiz per line, formatted exactly like 'QUESTION | A) OPTION1 | B) OPTION2 | ANSWER | EXPLANATION' "
+    "where ANSWER is A or B and EXPLANATION is one short sentence. Do not number the lines or add anything else.\n"
+    "Example: What is a stock? | A) A share in a company | B) A type of bond | A | A stock is a small piece of ownership in a company."
+)
+VERIFY_PROMPT = (
+    "Answer each of the following quiz questions with the letter of the correct option only. "
+    "One answer per line, formatted like '1. A', in the same order, nothing else.\n\n{quizzes}"
+)
+
+log = get_logger("quiz_bank")
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", " ", text.lower()).strip()
+
+
+def parse_quiz(line: str) -> dict | None:
+    """
+    Parse and validate one generated `QUESTION | A) OPTION1 | B) OPTION2 | ANSWER | EXPLANATION` line.
+
+    Returns:
+        dict: {question, options, answer, explanation}, or None if the line is not a valid quiz.
+    """
+    parts = [part.strip() for part in line.strip().strip("`").split("|")]
+    if len(parts) != 5:
+        return None
+    question, option_a, option_b, answer, explanation = parts
+    question = re.sub(r"^\d+[.)]\s*", "", question)  # stray numbering
+    match_a = re.fullmatch(r"A\)\s*(.+)", option_a)
+    match_b = re.fullmatch(r"B\)\s*(.+)", option_b)
+    answer = answer.upper().strip(" .)")
+    if match_a is None or match_b is None or answer not in ("A", "B"):
+        return None
+    options = {"A": match_a.group(1).strip(), "B": match_b.group(1).strip()}
+    if (not question.endswith("?") or len(question) > MAX_QUESTION or not explanation
+            or len(explanation) > MAX_EXPLANATION or any(len(option) > MAX_OPTION for option in options.values())
+            or _normalize(options["A"]) == _normalize(options["B"])):
+        return None
+    return {"question": question, "options": options, "answer": answer, "explanation": explanation}
+
+
+def format_quiz(quiz: dict) -> str:
+    """
+    The quiz as sent to users: `QUESTION | A) OPTION1 | B) OPTION2`.
+    """
+    return f"{quiz['question']} | A) {quiz['options']['A']} | B) {quiz['options']['B']}"
+
+
+def grade(quiz: dict, text: str) -> bool | None:
+    """
+    Returns:
+        bool: Whether the reply picks the correct option, or None if it does not clearly pick one.
+    """
+    match = re.match(r"\s*(?:(?:my )?answer(?: is)?:?\s*|option\s*|i think\s*|it'?s\s*)?\(?([ab])\)?\s*(?:[).:!-]|$)", text.lower())
+    if match is not None:  # "b", "B) A type of bond", "option a", "I think B." but not "a share in a company"
+        return match.group(1).upper() == quiz["answer"]
+    reply = _normalize(text)
+    picked = [letter for letter, option in quiz["options"].items() if _normalize(option) == reply]
+    if len(picked) == 1:
+        return picked[0] == quiz["answer"]
+    return None
+
+
+class QuizBank:
+    def __init__(self, path: str = QUIZ_BANK_FILE):
+        self.path = path
+        self._quizzes = {}  # id -> quiz, in generation order
+        self._by_text = {}  # format_quiz(quiz) -> id
+        self._questions = set()  # normalized questions, for de-duplication
+        self._served = {}  # (day, cohort) -> quiz id
+        self._served_ids = set()
+        self._last_served = {}  # quiz id -> file offset of its latest served record
+        self._refilling = False
+        self._offset = 0  # bytes of the file already loaded
+        self._lock = threading.RLock()
+
+    def _load(self):
+        # Called under _lock: fold records appended since the last load, by this or another process
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            f.seek(self._offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # torn last line from a crash mid-write
+                self._offset += len(line)
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if record["type"] == "quiz":
+                    self._add(record)
+                elif record["type"] == "served":
+                    self._served.setdefault((record["day"], record["cohort"]), record["quiz"])
+                    self._served_ids.add(record["quiz"])
+                    self._last_served[record["quiz"]] = self._offset
+
+    def _add(self, quiz: dict):
+        self._quizzes[quiz["id"]] = quiz
+        self._by_text[format_quiz(quiz)] = quiz["id"]
+        self._questions.add(_normalize(quiz["question"]))
+
+    def _append(self, records: list[dict]):
+        data = "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records).encode()
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+    def unserved(self) -> int:
+        with self._lock:
+            self._load()
+            return len(self._quizzes) - len(self._served_ids & self._quizzes.keys())
+
+    def add(self, quizzes: list[dict]) -> int:
+        """
+        Store validated quizzes, skipping questions already in the bank. Returns how many were added.
+        """
+        with self._lock:
+            self._load()
+            now = time.time()
+            records = []
+            for quiz in quizzes:
+                if _normalize(quiz["question"]) in self._questions:
+                    continue
+                quiz_id = hashlib.sha1(_normalize(quiz["question"]).encode()).hexdigest()[:12]
+                record = {"type": "quiz", "id": quiz_id, **quiz, "time": now}
+                self._questions.add(_normalize(quiz["question"]))
+                records.append(record)
+            if records:
+                self._append(records)
+                self._load()
+            return len(records)
+
+    def generate(self, co, n: int = BATCH, verify: bool = True) -> dict:
+        """
+        One batch: ask for n quizzes, validate them, optionally check their keys with a blind
+        answering call, and store the survivors.
+
+        Parameters:
+            co: Cohere client (llama.get_co()).
+        """
+        with timed("llm", "quiz_generate"):
+            response = co.chat(model="command-a-03-2025",
+                               messages=[{"role": "user", "content": GENERATE_PROMPT.format(n=n)}])
+        lines = [line for line in response.message.content[0].text.splitlines() if line.strip()]
+        quizzes = [quiz for quiz in map(parse_quiz, lines) if quiz is not None]
+        invalid = len(lines) - len(quizzes)
+        wrong_key = 0
+        if verify and quizzes:
+            listing = "\n".join(f"{i + 1}. {format_quiz(quiz)}" for i, quiz in enumerate(quizzes))
+            with timed("llm", "quiz_verify"):
+                response = co.chat(model="command-a-03-2025",
+                                   messages=[{"role": "user", "content": VERIFY_PROMPT.format(quizzes=listing)}])
+            answers = {}
+            for line in response.message.content[0].text.splitlines():
+                match = re.match(r"\s*(\d+)[.)]?\s*([AB])\b", line.strip().upper())
+                if match is not None:
+                    answers[int(match.group(1)) - 1] = match.group(2)
+            kept = [quiz for i, quiz in enumerate(quizzes) if answers.get(i) == quiz["answer"]]
+            wrong_key = len(quizzes) - len(kept)
+            quizzes = kept
+        added = self.add(quizzes)
+        result = {"lines": len(lines), "invalid": invalid, "wrong_key": wrong_key, "duplicates": len(quizzes) - added, "added": added}
+        count("quiz_bank", "added", added)
+        count("quiz_bank", "rejected", len(lines) - added)
+        log.info("quiz_bank.generated", **result)
+        return result
+
+    def refill(self, co, minimum: int = MIN_UNSERVED, verify: bool = True) -> int:
+        """
+        Generate batches until at least `minimum` quizzes are unserved. Returns the unserved count.
+        """
+        failures = 0
+        while self.unserved() < minimum and failures < MAX_ATTEMPTS:
+            if not self.generate(co, BATCH, verify)["added"]:
+                failures += 1
+        return self.unserved()
+
+    def refill_in_background(self, co_factory, minimum: int = MIN_UNSERVED) -> bool:
+        """
+        Run refill() in a background thread, unless one is already running.
+
+        Parameters:
+            co_factory (callable): fn() -> Cohere client (llama.get_co), called in the thread.
+
+        Returns:
+            bool: Whether a refill was started.
+        """
+        with self._lock:
+            if self._refilling:
+                return False
+            self._refilling = True
+
+        def run():
+            try:
+                self.refill(co_factory(), minimum)
+            except Exception:
+                log.exception("quiz_bank.refill_failed")
+            finally:
+                with self._lock:
+                    self._refilling = False
+
+        threading.Thread(target=run, name="quiz-bank-refill", daemon=True).start()
+        return True
+
+    def today(self, cohort: str = ALL, day: str = None, co_factory=None) -> dict | None:
+        """
+        The quiz served to `cohort` on `day` (default today): the same quiz on every call and in
+        every process. The first call of a day picks the oldest unserved quiz, or once all have
+        been served the one served longest ago. If the bank is running low, it also starts a
+        background refill with a client from `co_factory`; serving never waits for the LLM.
+
+        Returns:
+            dict: The quiz, or None if the bank is empty.
+        """
+        day = day or date.today().isoformat()
+        with self._lock:
+            self._load()
+            if (day, cohort) not in self._served:
+                if co_factory is not None and self.unserved() < MIN_UNSERVED:
+                    self.refill_in_background(co_factory)
+                if not self._quizzes:
+                    return None
+                # Unserved quizzes sort first, in generation order
+                quiz_id = min(self._quizzes, key=lambda quiz_id: self._last_served.get(quiz_id, -1))
+                self._append([{"type": "served", "day": day, "cohort": cohort, "quiz": quiz_id, "time": time.time()}])
+                self._load()  # another process may have appended first; its pick wins
+            return self._quizzes[self._served[(day, cohort)]]
+
+    def lookup(self, text: str) -> dict | None:
+        """
+        The quiz whose format_quiz() text is `text`, e.g. to grade a reply to a sent quiz.
+        """
+        with self._lock:
+            quiz_id = self._by_text.get(text.strip())
+            if quiz_id is None:
+                self._load()
+                quiz_id = self._by_text.get(text.strip())
+            return self._quizzes.get(quiz_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._load()
+            return {"quizzes": len(self._quizzes), "unserved": self.unserved(), "days_served": len(self._served)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    generate = sub.add_parser("generate")
+    generate.add_argument("--count", type=int, default=60, help="unserved quizzes to top the bank up to")
+    generate.add_argument("--no-verify", action="store_true", help="skip the blind answer check")
+    today = sub.add_parser("today")
+    today.add_argument("--cohort", default=ALL)
+    sub.add_parser("stats")
+    args = parser.parse_args()
+
+    bank = QuizBank()
+    if args.command == "generate":
+        import llama  # heavy, only needed for the Cohere client
+
+        print(f"{bank.refill(llama.get_co(), args.count, verify=not args.no_verify)} unserved quizzes in {bank.path}")
+    elif args.command == "today":
+        quiz = bank.today(args.cohort)
+        print(f"{format_quiz(quiz)}\nAnswer: {quiz['answer']}. {quiz['explanation']}" if quiz else "The quiz bank is empty")
+    else:
+        print(json.dumps(bank.stats()))
+
+
+if __name__ == "__main__":
+    main()
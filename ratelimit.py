@@ -0,0 +1,198 @@
+"""
+Client-side rate limiting for the InvestEase team key.
+
+A token bucket keeps the request rate under the quota (heavier endpoints cost more tokens),
+and an AIMD concurrency limit backs off multiplicatively on 429/5xx/timeouts and creeps back
+up on success. Retry-After pauses the whole bucket so every thread waits out the throttle
+together instead of hammering the gateway.
+"""
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """
+    Parse a Retry-After header (delta seconds or HTTP date) into seconds from now.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float, clock=time.monotonic):
+        """
+        Parameters:
+            rate (float): Tokens added per second.
+            burst (float): Bucket capacity.
+        """
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._tokens = burst
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, weight: float) -> float:
+        """
+        Take `weight` tokens, going into debt if needed.
+        Returns how many seconds the caller must wait before sending.
+        """
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            self._tokens -= weight
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(wait, self._paused_until - now)
+
+    def refund(self, weight: float):
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + weight)
+
+    def pause(self, seconds: float):
+        """
+        Hold every caller back for `seconds` (Retry-After) and drain the bucket.
+        """
+        with self._lock:
+            now = self._clock()
+            self._paused_until = max(self._paused_until, now + seconds)
+            self._tokens = min(self._tokens, 0.0)
+            self._updated = now
+
+
+class AIMDLimiter:
+    def __init__(self, initial: int = 8, minimum: int = 1, maximum: int = 32,
+                 decrease_factor: float = 0.5, cooldown: float = 1.0, clock=time.monotonic):
+        """
+        Parameters:
+            initial (int): Starting concurrency limit.
+            minimum (int): Floor for the limit.
+            maximum (int): Ceiling for the limit (the connection pool size).
+            decrease_factor (float): Multiplier applied to the limit on congestion.
+            cooldown (float): Seconds after a decrease during which further congestion
+                signals are ignored, so one burst of failures only cuts the limit once.
+        """
+        self.limit = float(min(initial, maximum))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self._clock = clock
+        self._in_flight = 0
+        self._last_decrease = float("-inf")
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout: float) -> bool:
+        deadline = self._clock() + timeout
+        with self._cond:
+            while self._in_flight >= int(self.limit):
+                remaining = deadline - self._clock()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            self._in_flight += 1
+            return True
+
+    def release(self, congested: bool):
+        with self._cond:
+            self._in_flight -= 1
+            now = self._clock()
+            if congested:
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.minimum, self.limit * self.decrease_factor)
+                    self._last_decrease = now
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+
+class RateLimiter:
+    def __init__(self, rate: float, burst: float, weights: dict = None, initial_concurrency: int = 8,
+                 max_concurrency: int = 32, max_wait: float = 10.0, default_pause: float = 1.0):
+        """
+        Parameters:
+            rate (float): Sustained requests per second allowed for weight-1 endpoints.
+            burst (float): Short burst allowance, in weight units.
+            weights (dict): Token cost per endpoint, "default" covers the rest.
+            initial_concurrency (int): Starting AIMD concurrency limit.
+            max_concurrency (int): AIMD ceiling.
+            max_wait (float): Longest a caller will wait for budget before giving up.
+            default_pause (float): Pause applied on a 429 without Retry-After.
+        """
+        self.weights = weights or {"default": 1}
+        self.max_wait = max_wait
+        self.default_pause = default_pause
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = AIMDLimiter(initial=initial_concurrency, maximum=max_concurrency)
+        self._lock = threading.Lock()
+        self._stats = {"sent": 0, "throttled": 0, "congested": 0, "rejected": 0, "waited_seconds": 0.0}
+
+    def weight(self, endpoint: str) -> float:
+        return self.weights.get(endpoint, self.weights.get("default", 1))
+
+    def acquire(self, endpoint: str) -> bool:
+        """
+        Block until the endpoint fits in the rate budget and the concurrency limit.
+        Returns False (without sending) if that would take longer than max_wait.
+        """
+        weight = self.weight(endpoint)
+        wait = self.bucket.reserve(weight)
+        if wait > self.max_wait:
+            self.bucket.refund(weight)
+            self._count("rejected")
+            return False
+        if wait > 0:
+            time.sleep(wait)
+        if not self.concurrency.acquire(self.max_wait - wait):
+            self.bucket.refund(weight)
+            self._count("rejected")
+            return False
+        with self._lock:
+            self._stats["sent"] += 1
+            self._stats["waited_seconds"] += wait
+        return True
+
+    def release(self, endpoint: str, status_code: int | None, retry_after: float | None = None):
+        """
+        Report the outcome of a request sent after acquire().
+        429, 5xx and missing responses (timeouts) count as congestion.
+        """
+        congested = status_code is None or status_code == 429 or status_code >= 500
+        self.concurrency.release(congested)
+        if status_code == 429:
+            self._count("throttled")
+            # Jitter so paused workers do not all resume in the same instant
+            pause = retry_after if retry_after is not None else self.default_pause
+            self.bucket.pause(pause + random.uniform(0, 0.1 * max(pause, 0.1)))
+        elif congested:
+            self._count("congested")
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["concurrency_limit"] = round(self.concurrency.limit, 2)
+        stats["max_concurrency"] = self.concurrency.maximum
+        stats["in_flight"] = self.concurrency.in_flight
+        return stats
@@ -0,0 +1,57 @@
+"""
+Turn handling and routes shared by both Flask apps (chat_reply.py and conversation.py):
+run_turn, the webhook worker queue that runs it out of band, /daily_sweep and /metrics.
+
+    app.register_blueprint(routes.shared)
+"""
+import json
+
+from flask import Blueprint, Response
+
+from api import cache_stats, rate_limit_stats
+from intent_router import stats as router_stats
+from level import __clients, client_lock, get_messages
+from llama import daily_saving_reminders, handle_client, prompt_cache_stats, quiz_bank_stats
+from telemetry import metrics_snapshot, timed
+import webhook_queue
+
+shared = Blueprint("shared", __name__)
+
+
+def run_turn(clientId, incoming_msg, resp):
+    """Run one chat turn and add the reply to resp (a MessagingResponse, or a worker's Outbox)"""
+    # Store user message and get AI response (calls your llama handler); one turn at a time per client
+    with timed("route", "reply_whatsapp"), client_lock(clientId):
+        messages = get_messages(clientId)
+        messages.append({"role": "user", "content": incoming_msg})
+        ai_response = handle_client(clientId, resp)
+
+    # Send back Twilio message
+    if ai_response:
+        resp.message(ai_response)
+    else:
+        resp.message("Hmm, I didn’t quite get that. Try again!")
+
+
+webhooks = webhook_queue.WebhookQueue(run_turn)
+
+
+@shared.route("/daily_sweep", methods=["GET", "POST"])
+def run_sweep():
+    """Expire broken streaks for every client and send the saving check to those who have not saved today"""
+    reminders = daily_saving_reminders()
+    return Response(json.dumps({"reminded": len(reminders)}), mimetype="application/json")
+
+
+@shared.route("/metrics", methods=["GET"])
+def metrics():
+    """Latency histograms, counters, cache, rate limiter, intent router, quiz bank, webhook queue and client store stats for this worker"""
+    snapshot = metrics_snapshot()
+    snapshot["cache"] = cache_stats()
+    snapshot["rate_limit"] = rate_limit_stats()
+    snapshot["prompt_cache"] = prompt_cache_stats()
+    snapshot["intent_router"] = router_stats()
+    snapshot["quiz_bank"] = quiz_bank_stats()
+    snapshot["webhook_queue"] = webhooks.stats()
+    snapshot["client_store"] = __clients.stats()
+    return Response(json.dumps(snapshot), mimetype="application/json")
@@ -0,0 +1,398 @@
+"""
+Durable client state store: a dict-like view over a SQLite (WAL) table of client records.
+
+    __clients = ClientStore("clients.db")
+    __clients[clientId]["Exp"] += 20   # loaded on first touch, written back in the next flush
+
+Records load lazily on first access and stay resident in an LRU bounded by max_resident,
+so memory scales with active clients rather than total clients. Callers keep mutating the
+returned records in place, as they did with the plain dict; a background flush re-serializes
+every record touched in the last `touch_window` seconds (outside the store lock, under the
+record's own lock) and writes back, in one transaction, only those whose serialized form
+changed. Several worker processes can share one database: a resident record last checked more
+than `revalidate_after` seconds ago is reloaded if another process wrote a newer version
+(last writer wins on concurrent edits of the same client).
+
+Environment:
+    RBCAGENT_CLIENTS_DB  database path (default clients.db)
+"""
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from datetime import datetime
+
+from telemetry import get_logger
+
+CLIENTS_DB = os.getenv("RBCAGENT_CLIENTS_DB", "clients.db")
+MAX_RESIDENT = 10_000  # client records kept in memory
+FLUSH_INTERVAL = 1.0  # seconds between background write-backs
+TOUCH_WINDOW = 60.0  # seconds a record stays on the flush watch list after its last access
+REVALIDATE_AFTER = 2.0  # seconds before a resident record is checked against other writers
+
+log = get_logger("store")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS clients (
+    id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    updated REAL NOT NULL
+)
+"""
+
+
+def _encode_default(value):
+    if isinstance(value, datetime):
+        return {"$datetime": value.isoformat()}
+    raise TypeError(f"{type(value).__name__} is not serializable")
+
+
+def _decode_hook(obj: dict):
+    if len(obj) == 1 and "$datetime" in obj:
+        return datetime.fromisoformat(obj["$datetime"])
+    return obj
+
+
+def encode(record: dict) -> str:
+    return json.dumps(record, default=_encode_default, ensure_ascii=False, separators=(",", ":"))
+
+
+def decode(text: str) -> dict:
+    return json.loads(text, object_hook=_decode_hook)
+
+
+class _Entry:
+    __slots__ = ("record", "saved", "version", "accessed", "checked")
+
+    def __init__(self, record: dict, saved: str | None, version: int, now: float):
+        self.record = record
+        self.saved = saved  # serialized form last read from or written to the database
+        self.version = version
+        self.accessed = now
+        self.checked = now
+
+
+class ClientStore(MutableMapping):
+    def __init__(self, path: str = CLIENTS_DB, max_resident: int = MAX_RESIDENT,
+                 flush_interval: float = FLUSH_INTERVAL, touch_window: float = TOUCH_WINDOW,
+                 revalidate_after: float = REVALIDATE_AFTER, clock=time.monotonic,
+                 dumps=encode, loads=decode, record_lock=None):
+        """
+        Parameters:
+            path (str): SQLite database file, ":memory:" for a throwaway store.
+            max_resident (int): Records kept in memory before idle ones are evicted.
+            flush_interval (float): Seconds between background write-backs, 0 disables the
+                background thread (call flush() yourself).
+            touch_window (float): Seconds after its last access during which a record is still
+                checked for in-place changes, and is never evicted.
+            revalidate_after (float): Seconds before a resident record is checked for a newer
+                version written by another process.
+            clock (callable): Monotonic time source.
+            dumps (callable): Record -> str serializer, also used to detect in-place changes.
+            loads (callable): str -> record deserializer; records must support update().
+            record_lock (callable): Optional fn(client_id) -> lock the callers hold while they
+                mutate that record; flush() serializes the record under it.
+        """
+        self.path = path
+        self.max_resident = max_resident
+        self.touch_window = touch_window
+        self.revalidate_after = revalidate_after
+        self._clock = clock
+        self._dumps = dumps
+        self._loads = loads
+        self._record_lock = record_lock
+        self._resident = OrderedDict()  # id -> _Entry, least recently used first
+        self._touched = {}  # id -> last access, records to check on the next flush
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._conn = None
+        self._conn_pid = None
+        self._stats = {"loads": 0, "misses": 0, "writes": 0, "flushes": 0, "evictions": 0, "reloads": 0}
+        self._stop = threading.Event()
+        self._thread = None
+        if flush_interval > 0:
+            self._thread = threading.Thread(target=self._flush_loop, args=(flush_interval,),
+                                            name="client-store-flush", daemon=True)
+            self._thread.start()
+        atexit.register(self.close)
+
+    def _db(self) -> sqlite3.Connection:
+        # Called under _db_lock. One connection per process, reopened after a fork.
+        pid = os.getpid()
+        if self._conn is None or self._conn_pid != pid:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(SCHEMA)
+            self._conn = conn
+            self._conn_pid = pid
+        return self._conn
+
+    def _fetch(self, client_id: str):
+        with self._db_lock:
+            return self._db().execute("SELECT data, version FROM clients WHERE id = ?", (client_id,)).fetchone()
+
+    def _write(self, rows: list[tuple[str, str, int]]):
+        with self._db_lock:
+            conn = self._db()
+            now = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "INSERT INTO clients (id, data, version, updated) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET data = excluded.data, version = excluded.version, updated = excluded.updated",
+                    [(client_id, text, version, now) for client_id, text, version in rows],
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def __getitem__(self, client_id: str):
+        with self._lock:
+            now = self._clock()
+            entry = self._resident.get(client_id)
+            if entry is not None and now - entry.checked >= self.revalidate_after:
+                entry = self._revalidate(client_id, entry, now)
+            if entry is None:
+                row = self._fetch(client_id)
+                if row is None:
+                    self._stats["misses"] += 1
+                    raise KeyError(client_id)
+                entry = self._resident[client_id] = _Entry(self._loads(row[0]), row[0], row[1], now)
+                self._stats["loads"] += 1
+            self._resident.move_to_end(client_id)
+            entry.accessed = now
+            self._touched[client_id] = now
+            return entry.record
+
+    def _revalidate(self, client_id: str, entry: _Entry, now: float) -> _Entry | None:
+        """
+        Reload a resident record another process has since rewritten, unless it has local
+        changes of its own (which then win on the next flush).
+        """
+        entry.checked = now
+        row = self._fetch(client_id)
+        if row is None or row[1] == entry.version:
+            return entry
+        if self._dumps(entry.record) != entry.saved:
+            log.warning("store.concurrent_update", client_id=client_id, local_version=entry.version, stored_version=row[1])
+            return entry
+        self._stats["reloads"] += 1
+        # In place, so callers holding the record see the new version
+        fresh = self._loads(row[0])
+        if isinstance(entry.record, dict):
+            entry.record.clear()
+        entry.record.update(fresh)
+        entry.saved, entry.version = row[0], row[1]
+        return entry
+
+    def __setitem__(self, client_id: str, record):
+        with self._lock:
+            now = self._clock()
+            entry = self._resident.get(client_id)
+            if entry is None:
+                row = self._fetch(client_id)
+                entry = self._resident[client_id] = _Entry(record, None, row[1] if row else 0, now)
+            else:
+                entry.record, entry.saved, entry.accessed = record, None, now
+            self._resident.move_to_end(client_id)
+            self._touched[client_id] = now
+
+    def __delitem__(self, client_id: str):
+        with self._lock:
+            self._resident.pop(client_id, None)
+            self._touched.pop(client_id, None)
+            with self._db_lock:
+                deleted = self._db().execute("DELETE FROM clients WHERE id = ?", (client_id,)).rowcount
+        if not deleted:
+            raise KeyError(client_id)
+
+    def __contains__(self, client_id) -> bool:
+        try:
+            self[client_id]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        self.flush()
+        with self._db_lock:
+            ids = [row[0] for row in self._db().execute("SELECT id FROM clients")]
+        return iter(ids)
+
+    def __len__(self) -> int:
+        self.flush()
+        with self._db_lock:
+            return self._db().execute("SELECT COUNT(*) FROM clients").fetchone()[0]
+
+    def scan(self, batch: int = 1000):
+        """
+        Yield (id, record) for every stored client without making them resident. Resident
+        records are yielded as-is, so in-place changes not yet flushed are seen too.
+        """
+        self.flush()
+        last = ""
+        while True:
+            with self._db_lock:
+                rows = self._db().execute("SELECT id, data FROM clients WHERE id > ? ORDER BY id LIMIT ?",
+                                          (last, batch)).fetchall()
+            with self._lock:
+                resident = [self._resident.get(client_id) for client_id, _ in rows]
+            for (client_id, text), entry in zip(rows, resident):
+                yield client_id, entry.record if entry is not None else self._loads(text)
+            if len(rows) < batch:
+                return
+            last = rows[-1][0]
+
+    def columns(self, paths: dict, batch: int = 50_000) -> tuple[list, dict]:
+        """
+        Read a few fields of every stored client as columns, extracted by SQLite without
+        deserializing records in Python.
+
+        Parameters:
+            paths (dict): Column name -> JSON path into the stored text (e.g. "$[5]").
+            batch (int): Rows read per database round trip.
+
+        Returns:
+            tuple: (client ids, {column name: list of values}); rows whose text is not a JSON
+                array (older formats) get None in every column and are listed in columns["$legacy"].
+        """
+        self.flush()
+        names = list(paths)
+        select = ", ".join(["id", "json_type(data)"] + ["json_extract(data, ?)"] * len(names))
+        ids, legacy = [], []
+        values = {name: [] for name in names}
+        last = ""
+        while True:
+            with self._db_lock:
+                rows = self._db().execute(f"SELECT {select} FROM clients WHERE id > ? ORDER BY id LIMIT ?",
+                                          [paths[name] for name in names] + [last, batch]).fetchall()
+            for row in rows:
+                ids.append(row[0])
+                if row[1] != "array":
+                    legacy.append(row[0])
+                    row = row[:2] + (None,) * len(names)
+                for name, value in zip(names, row[2:]):
+                    values[name].append(value)
+            if len(rows) < batch:
+                break
+            last = rows[-1][0]
+        values["$legacy"] = legacy
+        return ids, values
+
+    def field(self, client_ids, path: str, getter, batch: int = 500) -> dict:
+        """
+        Read one field of a few clients without making them resident: resident records through
+        getter (so in-place changes not yet flushed are seen), the rest extracted by SQLite.
+
+        Parameters:
+            client_ids (iterable): Clients to read; unknown ones are left out.
+            path (str): JSON path into the stored text (e.g. "$[1]").
+            getter (callable): Record -> field value, for resident records and rows whose text
+                is not a JSON array (older formats).
+            batch (int): Ids per database round trip.
+
+        Returns:
+            dict: client id -> value.
+        """
+        values, stored = {}, []
+        with self._lock:
+            for client_id in dict.fromkeys(client_ids):
+                entry = self._resident.get(client_id)
+                if entry is not None:
+                    values[client_id] = getter(entry.record)
+                else:
+                    stored.append(client_id)
+        for start in range(0, len(stored), batch):
+            chunk = stored[start:start + batch]
+            with self._db_lock:
+                rows = self._db().execute(
+                    "SELECT id, json_type(data), json_extract(data, ?), "
+                    "CASE json_type(data) WHEN 'array' THEN NULL ELSE data END FROM clients "
+                    f"WHERE id IN ({', '.join('?' * len(chunk))})", [path] + chunk).fetchall()
+            for client_id, kind, value, text in rows:
+                values[client_id] = value if kind == "array" else getter(self._loads(text))
+        return values
+
+    def flush(self) -> int:
+        """
+        Write back every recently touched record whose serialized form changed, in one
+        transaction, then evict idle records beyond max_resident. Returns the number written.
+
+        Records are serialized and written outside the store lock, each under its
+        record_lock, so lookups never wait on a flush and a record is not read halfway through
+        an update. A record whose lock another thread holds is left for the next flush rather
+        than waited on (that thread may itself be waiting on this flush).
+        """
+        with self._flush_lock:
+            with self._lock:
+                now = self._clock()
+                touched = [(client_id, self._resident.get(client_id), accessed)
+                           for client_id, accessed in self._touched.items()]
+            rows, busy = [], set()
+            for client_id, entry, _ in touched:
+                if entry is None:
+                    continue
+                lock = self._record_lock(client_id) if self._record_lock is not None else None
+                if lock is not None and not lock.acquire(blocking=False):
+                    busy.add(client_id)
+                    continue
+                try:
+                    text = self._dumps(entry.record)
+                finally:
+                    if lock is not None:
+                        lock.release()
+                if text != entry.saved:
+                    # Versions only need to differ between writers, not to be ordered
+                    rows.append((client_id, text, time.time_ns(), entry))
+            if rows:
+                self._write([(client_id, text, version) for client_id, text, version, _ in rows])
+            with self._lock:
+                for _, text, version, entry in rows:
+                    entry.saved, entry.version = text, version
+                self._stats["writes"] += len(rows)
+                self._stats["flushes"] += 1
+                for client_id, _, accessed in touched:
+                    # Checked one last time above, unless it was skipped or accessed again since
+                    if (now - accessed >= self.touch_window and client_id not in busy
+                            and self._touched.get(client_id) == accessed):
+                        del self._touched[client_id]
+                self._evict(now)
+        return len(rows)
+
+    def _evict(self, now: float):
+        # Called under _lock after a flush, so every evictable record is already written back
+        excess = len(self._resident) - self.max_resident
+        for client_id in list(self._resident)[:max(0, excess)]:
+            if client_id in self._touched:
+                continue  # still in use, keep it resident until it goes idle
+            del self._resident[client_id]
+            self._stats["evictions"] += 1
+
+    def _flush_loop(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                self.flush()
+            except Exception:
+                log.exception("store.flush_failed")
+
+    def close(self):
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self.flush()
+        with self._db_lock:
+            if self._conn is not None and self._conn_pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "resident": len(self._resident), "watched": len(self._touched)}
@@ -0,0 +1,94 @@
+"""
+Columnar streak expiry and reminder sweep.
+
+Works on whole columns of last-activity timestamps at once: a saving streak breaks when a
+full calendar day passes without saving, an investing streak when a full ISO week (Monday to
+Sunday) passes without investing. level.sweep_streaks reads the columns from the client store,
+applies the result and returns the reminder send list.
+
+    python streaks.py             # expire broken streaks, print counts
+    python streaks.py --dry-run   # only report
+    python streaks.py --due       # also print the clients due a saving reminder
+"""
+import argparse
+import time
+from datetime import datetime
+
+import numpy as np
+
+SECONDS_PER_DAY = 86400
+EPOCH_WEEKDAY = 3  # 1970-01-01 was a Thursday, 3 days after the Monday that starts its ISO week
+
+
+def local_offset(now: float) -> float:
+    return datetime.fromtimestamp(now).astimezone().utcoffset().total_seconds()
+
+
+def day_numbers(timestamps, utc_offset: float) -> np.ndarray:
+    """
+    Local calendar day of each epoch timestamp (None -> NaN), as days since 1970-01-01.
+    """
+    return np.floor((np.asarray(timestamps, dtype=float) + utc_offset) / SECONDS_PER_DAY)
+
+
+def week_numbers(days: np.ndarray) -> np.ndarray:
+    """
+    ISO week of each day number, as weeks since the Monday of 1970-01-01's week.
+    """
+    return np.floor((days + EPOCH_WEEKDAY) / 7)
+
+
+def sweep(last_saving, last_investment, saving_streak, investing_streak,
+          now: float = None, utc_offset: float = None) -> dict:
+    """
+    Parameters:
+        last_saving, last_investment: Epoch seconds per client, None if never.
+        saving_streak, investing_streak: Current streak per client.
+        now (float): Epoch seconds to sweep at (default: now).
+        utc_offset (float): Local UTC offset in seconds (default: the offset at `now`).
+
+    Returns:
+        dict: Boolean arrays saving_expired, investing_expired (streak > 0 but broken),
+            saving_due (not saved today) and investing_due (not invested this ISO week).
+    """
+    now = time.time() if now is None else now
+    utc_offset = local_offset(now) if utc_offset is None else utc_offset
+    today = np.floor((now + utc_offset) / SECONDS_PER_DAY)
+    this_week = np.floor((today + EPOCH_WEEKDAY) / 7)
+
+    saving_days = day_numbers(last_saving, utc_offset)
+    investing_weeks = week_numbers(day_numbers(last_investment, utc_offset))
+    never_saved, never_invested = np.isnan(saving_days), np.isnan(investing_weeks)
+    with np.errstate(invalid="ignore"):  # NaN comparisons are False, covered by never_*
+        saving_due = never_saved | (saving_days < today)
+        investing_due = never_invested | (investing_weeks < this_week)
+        saving_broken = never_saved | (saving_days < today - 1)
+        investing_broken = never_invested | (investing_weeks < this_week - 1)
+    return {
+        "saving_expired": saving_broken & (np.asarray(saving_streak, dtype=float) > 0),
+        "investing_expired": investing_broken & (np.asarray(investing_streak, dtype=float) > 0),
+        "saving_due": saving_due,
+        "investing_due": investing_due,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="report without resetting streaks")
+    parser.add_argument("--due", action="store_true", help="print the clients due a saving reminder")
+    args = parser.parse_args()
+
+    import level  # level imports this module for its sweep
+
+    start = time.perf_counter()
+    result = level.sweep_streaks(dry_run=args.dry_run)
+    print(f"{result['clients']} clients swept in {(time.perf_counter() - start) * 1000:.0f} ms: "
+          f"{result['saving_expired']} saving and {result['investing_expired']} investing streaks "
+          f"{'would expire' if args.dry_run else 'expired'}, {len(result['saving_due'])} due a saving reminder, "
+          f"{len(result['investing_due'])} not invested this week")
+    if args.due:
+        print("\n".join(result["saving_due"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Concurrency stress test for per-client state: hammers one client from many threads and
+checks that no update is lost or double counted, then runs the same load spread over many
+clients to show unrelated clients are not serialized behind each other.
+
+    python stress_clients.py --threads 32 --iterations 2000
+    python stress_clients.py --turns 64 --llm-latency-ms 5
+
+Exits non-zero if any invariant is violated.
+"""
+import argparse
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import tempenv
+
+tempenv.setup("rbcagent-stress-")
+
+import level
+from fake_cohere import FakeCohere
+
+
+def total_exp(client) -> int:
+    # Exp earned since level 1, recovered from (Level, Exp)
+    spent = level.EXP_BASE if client.level > 1 else 0  # level 1 costs EXP_BASE
+    spent += sum(level.exp_to_next_level(None, lvl) for lvl in range(2, client.level))
+    return spent + client.exp
+
+
+def hammer(threads: int, fn, args_list) -> float:
+    barrier = threading.Barrier(threads)
+
+    def run(args):
+        barrier.wait()
+        for call_args in args:
+            fn(*call_args)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(run, args_list))
+    return time.perf_counter() - start
+
+
+def check(name: str, ok: bool, detail: str, failures: list):
+    print(f"{'ok  ' if ok else 'FAIL'} {name}: {detail}")
+    if not ok:
+        failures.append(name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--iterations", type=int, default=1000, help="add_exp calls per thread")
+    parser.add_argument("--turns", type=int, default=32, help="concurrent webhook turns for one client")
+    parser.add_argument("--llm-latency-ms", type=float, default=2.0)
+    args = parser.parse_args()
+    sys.setswitchinterval(1e-5)  # switch threads often, to surface races quickly
+    failures = []
+
+    # 1. add_exp on one client: no lost updates
+    client_id = "stress-one"
+    level.register_client(client_id)
+    elapsed = hammer(args.threads, level.add_exp, [[(client_id, 7)] * args.iterations] * args.threads)
+    client = level.get_client_info(client_id)
+    expected = 7 * args.iterations * args.threads
+    check("add_exp same client", total_exp(client) == expected,
+          f"{total_exp(client)} / {expected} exp, level {client.level}, "
+          f"{args.iterations * args.threads / elapsed:,.0f} calls/s", failures)
+
+    # 2. add_exp on a client per thread: same load, no shared lock
+    ids = [f"stress-many-{i}" for i in range(args.threads)]
+    for i in ids:
+        level.register_client(i)
+    elapsed = hammer(args.threads, level.add_exp, [[(i, 7)] * args.iterations for i in ids])
+    totals = [total_exp(level.get_client_info(i)) for i in ids]
+    check("add_exp client per thread", all(t == 7 * args.iterations for t in totals),
+          f"{args.iterations * args.threads / elapsed:,.0f} calls/s", failures)
+
+    # 3. done_daily_saving raced from every thread: counted exactly once
+    client_id = "stress-saving"
+    level.register_client(client_id)
+    hammer(args.threads, level.done_daily_saving, [[(client_id,)] * 10] * args.threads)
+    client = level.get_client_info(client_id)
+    check("done_daily_saving once per day", client.saving_streak == 1 and total_exp(client) == level.EXP_STREAK_DAILY_SAVING,
+          f"streak {client.saving_streak}, exp {total_exp(client)}", failures)
+
+    # 4. bulk award racing single awards on the same clients
+    ids = [f"stress-bulk-{i}" for i in range(200)]
+    for i in ids:
+        level.register_client(i)
+    bulk = threading.Thread(target=lambda: [level.award_exp(ids, 5) for _ in range(20)])
+    bulk.start()
+    hammer(args.threads, level.add_exp, [[(i, 3) for i in ids]] * args.threads)
+    bulk.join()
+    expected = 5 * 20 + 3 * args.threads
+    check("award_exp vs add_exp", all(total_exp(level.get_client_info(i)) == expected for i in ids),
+          f"{expected} exp each", failures)
+
+    # 5. webhook turns for one client: every reply call sees exactly one unanswered user message
+    import conversation
+    import llama
+    overlapping = []
+
+    def responder(messages):
+        if "ACTION_NAME" in messages[0]["content"]:
+            return "NO_ACTION"
+        roles = [message["role"] for message in messages]
+        answered = max((i for i, role in enumerate(roles) if role == "assistant"), default=0)
+        if roles[answered:].count("user") != 1:
+            overlapping.append(roles)
+        return "reply"
+
+    llama.co = FakeCohere(latency=args.llm_latency_ms / 1000, responder=responder)
+    app = conversation.app.test_client()
+    post = lambda n: app.post("/reply_whatsapp", data={"Body": f"message {n}", "From": "stress"})
+    elapsed = hammer(args.threads, post, [[(t * args.turns + n,) for n in range(args.turns)] for t in range(args.threads)])
+    check("webhook turns serialized", not overlapping,
+          f"{args.threads * args.turns} turns in {elapsed:.1f}s, {len(overlapping)} replies saw another turn's message", failures)
+
+    print("FAILED: " + ", ".join(failures) if failures else "all invariants held")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Structured, leveled logging and in-process latency metrics.
+
+    log = get_logger("api")
+    log.info("portfolio.retrieved", portfolio_id=portfolio_id)
+
+    with timed("action", "GET_INFO"):
+        ...
+    metrics_snapshot()["histograms"]["action:GET_INFO"]["p95_ms"]
+
+Log records are handed to a background thread through a queue, so the request path never
+blocks on stdout. INFO and DEBUG records can be sampled; warnings and errors always go out.
+
+Environment:
+    RBCAGENT_LOG_LEVEL   DEBUG, INFO (default), WARNING, ...
+    RBCAGENT_LOG_SAMPLE  fraction of INFO/DEBUG records kept (default 1.0)
+    RBCAGENT_LOG_FORMAT  logfmt (default) or json
+"""
+import atexit
+import bisect
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+LOG_LEVEL = os.getenv("RBCAGENT_LOG_LEVEL", "INFO").upper()
+LOG_SAMPLE_RATE = float(os.getenv("RBCAGENT_LOG_SAMPLE", "1.0"))
+LOG_FORMAT = os.getenv("RBCAGENT_LOG_FORMAT", "logfmt")
+
+# Histogram bucket upper bounds in seconds, roughly log-spaced from 1 ms to 30 s
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_configure_lock = threading.Lock()
+_listener = None
+
+
+class StructuredFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        fields = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        fields.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            fields["exc"] = self.formatException(record.exc_info)
+        if LOG_FORMAT == "json":
+            return json.dumps(fields, default=str)
+        return " ".join(f"{key}={_logfmt_value(value)}" for key, value in fields.items())
+
+
+def _logfmt_value(value) -> str:
+    text = str(value)
+    if not text or any(c in text for c in ' "=\n'):
+        return json.dumps(text, ensure_ascii=False)
+    return text
+
+
+def _configure():
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            return
+        root = logging.getLogger("rbcagent")
+        root.setLevel(LOG_LEVEL)
+        root.propagate = False
+        stream = logging.StreamHandler(sys.stdout)
+        stream.setFormatter(StructuredFormatter())
+        records = queue.SimpleQueue()
+        root.addHandler(logging.handlers.QueueHandler(records))
+        _listener = logging.handlers.QueueListener(records, stream)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+
+class StructLogger:
+    """
+    Thin wrapper taking an event name plus keyword fields. Disabled and sampled-out
+    records return before any formatting work is done.
+    """
+
+    def __init__(self, logger: logging.Logger, sample_rate: float = LOG_SAMPLE_RATE):
+        self._logger = logger
+        self.sample_rate = sample_rate
+
+    def _log(self, level: int, event: str, fields: dict, exc_info=None):
+        if not self._logger.isEnabledFor(level):
+            return
+        if level < logging.WARNING and self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        self._logger.log(level, event, extra={"fields": fields}, exc_info=exc_info)
+
+    def debug(self, event: str, **fields):
+        self._log(logging.DEBUG, event, fields)
+
+    def info(self, event: str, **fields):
+        self._log(logging.INFO, event, fields)
+
+    def warning(self, event: str, **fields):
+        self._log(logging.WARNING, event, fields)
+
+    def error(self, event: str, **fields):
+        self._log(logging.ERROR, event, fields)
+
+    def exception(self, event: str, **fields):
+        self._log(logging.ERROR, event, fields, exc_info=True)
+
+    def is_enabled(self, level: int) -> bool:
+        return self._logger.isEnabledFor(level)
+
+
+def get_logger(name: str) -> StructLogger:
+    _configure()
+    return StructLogger(logging.getLogger(f"rbcagent.{name}"))
+
+
+class Histogram:
+    def __init__(self, bounds: tuple = BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last bucket is +inf
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate a quantile by linear interpolation inside the bucket that contains it.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.max
+                estimate = lower + (upper - lower) * (rank - cumulative) / bucket_count
+                return min(max(estimate, self.min), self.max)
+            cumulative += bucket_count
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "min_ms": self.min * 1000 if self.count else 0.0,
+            "max_ms": self.max * 1000,
+            "p50_ms": self.quantile(0.50) * 1000,
+            "p95_ms": self.quantile(0.95) * 1000,
+            "p99_ms": self.quantile(0.99) * 1000,
+        }
+
+
+_metrics_lock = threading.Lock()
+_histograms = {}  # "kind:name" -> Histogram
+_counters = {}  # "kind:name" -> int
+
+
+def observe(kind: str, name: str, seconds: float):
+    key = f"{kind}:{name}"
+    with _metrics_lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+
+def count(kind: str, name: str, n: int = 1):
+    key = f"{kind}:{name}"
+    with _metrics_lock:
+        _counters[key] = _counters.get(key, 0) + n
+
+
+@contextmanager
+def timed(kind: str, name: str):
+    """
+    Record the wall time of the block in the kind:name histogram, and count failures
+    (exceptions) under kind:name:error.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        count(kind, f"{name}:error")
+        raise
+    finally:
+        observe(kind, name, time.perf_counter() - start)
+
+
+def metrics_snapshot() -> dict:
+    """
+    Returns:
+        dict: Histogram summaries (count, mean, min, max, p50/p95/p99 in ms) and counters.
+    """
+    with _metrics_lock:
+        return {
+            "histograms": {key: histogram.summary() for key, histogram in sorted(_histograms.items())},
+            "counters": dict(sorted(_counters.items())),
+        }
+
+
+def reset_metrics():
+    with _metrics_lock:
+        _histograms.clear()
+        _counters.clear()
@@ -0,0 +1,31 @@
+"""
+Throwaway state for benchmarks, stress runs and tests: points every file the app persists
+(client database, money journal, exp ledger, portfolio index, quiz bank) into a fresh temporary
+directory, unless the environment already names one. Call it before importing level, llama or
+the Flask apps, which open their files at import.
+
+    import tempenv
+    tempenv.setup("rbcagent-stress-")
+"""
+import os
+import tempfile
+
+STATE_FILES = {
+    "RBCAGENT_CLIENTS_DB": "clients.db",
+    "RBCAGENT_JOURNAL": "journal.jsonl",
+    "RBCAGENT_PORTFOLIOS_FILE": "portfolios.txt",
+    "RBCAGENT_LEDGER": "ledger.jsonl",
+    "RBCAGENT_QUIZ_BANK": "quiz_bank.jsonl",
+}
+
+
+def setup(prefix: str = "rbcagent-", log_level: str = "WARNING") -> str:
+    """
+    Returns:
+        str: The temporary directory the unset state files now point into.
+    """
+    os.environ.setdefault("RBCAGENT_LOG_LEVEL", log_level)
+    workdir = tempfile.mkdtemp(prefix=prefix)
+    for name, filename in STATE_FILES.items():
+        os.environ.setdefault(name, os.path.join(workdir, filename))
+    return workdir
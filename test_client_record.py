@@ -0,0 +1,43 @@
+"""
+ClientRecord field mapping and the UPDATE_NAME / UPDATE_EMAIL actions, against the local
+InvestEase stand-in.
+
+    python -m pytest -q test_client_record.py
+"""
+import json
+
+import pytest
+from twilio.twiml.messaging_response import MessagingResponse
+
+import level
+import llama
+from level import ClientRecord
+
+
+def test_email_round_trips():
+    record = ClientRecord("c1", "Alice")
+    record["Email"] = "alice@example.com"
+    assert record.email == "alice@example.com"
+    assert ClientRecord.loads(record.dumps())["Email"] == "alice@example.com"
+    assert record.as_dict()["Email"] == "alice@example.com"
+
+
+def test_rows_without_email_load():
+    fields = json.loads(ClientRecord("c1").dumps())
+    for trailing in (fields[:15], fields[:18]):  # before summary/week, before email
+        record = ClientRecord.loads(json.dumps(trailing))
+        assert record["Email"] is None
+        assert record.week_exp == 0
+
+
+@pytest.mark.parametrize("action, param, key, field", [
+    ("UPDATE_EMAIL", "alice@example.com", "Email", "email"),
+    ("UPDATE_NAME", "Alice", "Name", "name"),
+])
+def test_update_action(server, action, param, key, field):
+    clientId = server.add_client("Before", "before@example.com")
+    level.register_client(clientId)
+    ok, message = llama.do_action(clientId, action, [param], MessagingResponse())
+    assert ok, message
+    assert level.get_client_info(clientId)[key] == param
+    assert server.clients[clientId][field] == param
@@ -0,0 +1,119 @@
+"""
+RankedIndex and Leaderboard against plain sorted lists, the rebuild that replays updates made
+while the loader runs, and the weekly board rolling over.
+
+    python -m pytest -q test_leaderboard.py
+"""
+import random
+import threading
+
+import level
+from leaderboard import Leaderboard, RankedIndex
+from level import ClientRecord
+from store import ClientStore
+
+
+def test_ranked_index_matches_sorted_list():
+    rng = random.Random(3)
+    index, keys = RankedIndex(seed=1), set()
+    for _ in range(3000):
+        key = rng.randrange(500)
+        if key in keys and rng.random() < 0.5:
+            assert index.remove(key)
+            keys.remove(key)
+        elif key not in keys:
+            index.insert(key)
+            keys.add(key)
+    ordered = sorted(keys)
+    assert len(index) == len(ordered)
+    assert all(index.rank(key) == rank for rank, key in enumerate(ordered, 1))
+    assert index.rank(-1) is None and not index.remove(-1)
+    for start in (1, 2, len(ordered) // 2, len(ordered), len(ordered) + 1):
+        assert index.slice(start, 7) == ordered[start - 1:start + 6]
+
+
+def test_leaderboard_top_rank_around():
+    rng = random.Random(5)
+    scores = {f"m{i}": (rng.randrange(5), rng.randrange(100)) for i in range(200)}
+    board = Leaderboard(seed=2)
+    for member, score in scores.items():
+        board.update(member, (0, 0))
+        board.update(member, score)
+    ordered = sorted(scores, key=lambda member: (tuple(-value for value in scores[member]), member))
+    entries = [{"rank": rank, "member": member, "score": scores[member]} for rank, member in enumerate(ordered, 1)]
+
+    assert board.top(10) == entries[:10]
+    for member in ("m0", ordered[0], ordered[1], ordered[-1]):
+        rank = board.rank(member)
+        assert ordered[rank - 1] == member
+        assert board.around(member, 2) == entries[max(0, rank - 3):rank + 2]
+    assert board.around("nobody") == [] and board.rank("nobody") is None
+    assert board.cohort(["m3", "m1", "nobody"]) == [
+        {**entry, "rank": rank} for rank, entry in enumerate((e for e in entries if e["member"] in ("m1", "m3")), 1)]
+
+
+def test_rebuild_replays_updates_made_while_loading():
+    board = None
+
+    def loader():
+        yield "a", (10,)
+        yield "b", (5,)
+        board.update("c", (7,))  # landed in the store after the loader read past it
+        board.remove("b")
+        yield "d", (1,)
+
+    board = Leaderboard(loader)
+    assert [(entry["member"], entry["score"]) for entry in board.top(10)] == [("a", (10,)), ("c", (7,)), ("d", (1,))]
+
+
+def test_invalidate_during_build_drops_it():
+    started, release = threading.Event(), threading.Event()
+    rounds = []
+
+    def loader():
+        rounds.append(len(rounds))
+        if len(rounds) == 1:
+            started.set()
+            release.wait(5)
+            yield "stale", (1,)
+        else:
+            yield "fresh", (1,)
+
+    board = Leaderboard(loader)
+    first = threading.Thread(target=board.top)
+    first.start()
+    started.wait(5)
+    board.invalidate()
+    release.set()
+    first.join(5)
+    assert [entry["member"] for entry in board.top()] == ["fresh"]
+
+
+def test_weekly_board_rolls_over(monkeypatch):
+    clientId = "weekly-roll"
+    level.register_client(clientId)
+    level.set_client_name(clientId, "Wendy")
+    level.add_exp(clientId, 40)
+    [entry] = level.get_leaderboard_around(clientId, 0, weekly=True)
+    assert (entry["score"], entry["name"]) == ((40,), "Wendy")
+
+    week = level._current_week()
+    monkeypatch.setattr(level, "_current_week", lambda: week + 1)
+    assert level.get_rank(clientId, weekly=True) is None  # rebuilt from the store: nothing earned this week yet
+    level.add_exp(clientId, 15)
+    [entry] = level.get_leaderboard_around(clientId, 0, weekly=True)
+    assert entry["score"] == (15,)
+    assert level.get_client_info(clientId).week_exp == 15
+
+
+def test_names_read_for_resident_and_stored_records(tmp_path):
+    path = str(tmp_path / "clients.db")
+    store = ClientStore(path, flush_interval=0, dumps=ClientRecord.dumps, loads=ClientRecord.loads)
+    store["a"], store["b"] = ClientRecord("a", "Ann"), ClientRecord("b", "Bob")
+    store.flush()
+    store["a"].name = "Anna"  # resident, not yet flushed
+    assert store.field(["a", "b", "nobody"], "$[1]", lambda client: client.name) == {"a": "Anna", "b": "Bob"}
+
+    cold = ClientStore(path, flush_interval=0, dumps=ClientRecord.dumps, loads=ClientRecord.loads)
+    assert cold.field(["b", "a"], "$[1]", lambda client: client.name) == {"a": "Ann", "b": "Bob"}
+    assert cold.stats()["resident"] == 0
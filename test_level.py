@@ -0,0 +1,85 @@
+"""
+Exp awards: the vectorized award_exp against the per-call level-up loop it replaced.
+
+    python -m pytest -q test_level.py
+"""
+import random
+import uuid
+
+import ledger
+import level
+
+
+def loop_add_exp(state: dict, exp: int):
+    # The original add_exp: spend exp level by level
+    state["Exp"] += exp
+    while state["Exp"] >= state["ExpToNextLevel"]:
+        state["Exp"] -= state["ExpToNextLevel"]
+        state["Level"] += 1
+        state["ExpToNextLevel"] = level.exp_to_next_level(None, state["Level"])
+
+
+def register(n: int) -> list[str]:
+    ids = [f"award-{uuid.uuid4().hex[:8]}" for _ in range(n)]
+    for clientId in ids:
+        level.register_client(clientId)
+    return ids
+
+
+def state_of(clientId) -> tuple:
+    client = level.get_client_info(clientId)
+    return client["Level"], client["Exp"], client["ExpToNextLevel"], client.week_exp
+
+
+def slots_of(clientId) -> dict:
+    client = level.get_client_info(clientId)
+    return {slot: getattr(client, slot) for slot in level.ClientRecord.__slots__ if slot != "messages"}
+
+
+def test_award_exp_matches_loop_with_duplicates():
+    rng = random.Random(7)
+    ids = register(40)
+    expected = {clientId: {"Level": 1, "Exp": 0, "ExpToNextLevel": 100, "week_exp": 0} for clientId in ids}
+    for _ in range(5):
+        batch = [rng.choice(ids) for _ in range(60)]  # plenty of repeats
+        awards = [rng.randrange(0, 900) for _ in batch]
+        level.award_exp(batch, awards)
+        for clientId, exp in zip(batch, awards):
+            loop_add_exp(expected[clientId], exp)
+            expected[clientId]["week_exp"] += exp
+    for clientId in ids:
+        want = expected[clientId]
+        assert state_of(clientId) == (want["Level"], want["Exp"], want["ExpToNextLevel"], want["week_exp"])
+
+
+def test_award_exp_duplicate_id():
+    [clientId] = register(1)
+    events = level.award_exp([clientId, clientId], 100)
+    assert state_of(clientId) == (2, 100, 120, 200)
+    assert events == [{"client_id": clientId, "from_level": 1, "to_level": 2}]
+
+
+def test_award_exp_skips_unregistered():
+    [clientId] = register(1)
+    level.award_exp([clientId, "award-unregistered"], [30, 50])
+    assert state_of(clientId)[:2] == (1, 30)
+    assert level.get_client_info("award-unregistered") is None
+
+
+def test_restore_keeps_state_from_before_the_ledger(tmp_path, monkeypatch):
+    [clientId] = register(1)
+    level.award_exp([clientId], 500)
+    level.done_daily_saving(clientId)
+    level.set_target(clientId, "bike", 300.0)
+    before = slots_of(clientId)
+
+    # The ledger starts here: only the daily amount is ever logged for this client
+    monkeypatch.setattr(level, "__ledger", ledger.Ledger(str(tmp_path / "ledger.jsonl")))
+    level.set_daily_saving(clientId, 5.0)
+    level.get_client_info(clientId).daily_saving_amount = 1.0  # a write the store lost
+
+    state = level.__ledger.replay()[1][clientId]
+    assert state["daily_amount"] == 5.0
+    assert all(value is None for key, value in state.items() if key != "daily_amount")
+    assert level.restore_from_ledger()["mismatched"] == 1
+    assert slots_of(clientId) == before | {"daily_saving_amount": 5.0}
@@ -0,0 +1,127 @@
+"""
+Journaled money movements against an InvestEase stand-in that loses responses: every movement
+lands exactly once, whether it ends up applied, not applied, unknown, or is replayed at startup.
+
+    python -m pytest -q test_money.py
+"""
+import threading
+
+import pytest
+
+import api
+from api import ClientAPI
+from journal import APPLIED, NOT_APPLIED, UNKNOWN
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(api, "_backoff", lambda attempt: None)
+
+
+def cash(server, clientId) -> float:
+    return server.clients[clientId]["cash"]
+
+
+def outcome(key) -> dict:
+    return api.money_journal().get(key)
+
+
+def test_lost_response_reconciled_as_applied(server):
+    server.lost_response_rate = 1.0
+    clientId = server.add_client("Lost", "lost@example.com", 100.0)
+    key = api.new_idempotency_key()
+    res = ClientAPI.deposit(clientId, 25.0, idempotency_key=key)
+    assert res["success"]
+    assert cash(server, clientId) == 125.0
+    assert outcome(key)["state"] == APPLIED and outcome(key)["reconciled"]
+    assert outcome(key)["attempts"] == 1
+
+    assert ClientAPI.deposit(clientId, 25.0, idempotency_key=key)["success"]  # replayed, not resent
+    assert cash(server, clientId) == 125.0
+
+
+def test_failed_sends_retried_until_not_applied(server):
+    server.route_error_rate = {"deposit": 1.0}  # 503 before the deposit is applied
+    clientId = server.add_client("Down", "down@example.com", 100.0)
+    key = api.new_idempotency_key()
+    assert not ClientAPI.deposit(clientId, 25.0, idempotency_key=key)["success"]
+    assert cash(server, clientId) == 100.0
+    assert outcome(key)["state"] == NOT_APPLIED
+    assert outcome(key)["attempts"] == api.MONEY_RETRIES + 1
+
+
+def test_mixed_failures_apply_each_deposit_once(server):
+    server.lost_response_rate = 0.3
+    server.route_error_rate = {"deposit": 0.3}
+    server._random.seed(11)
+    clientId = server.add_client("Mixed", "mixed@example.com", 0.0)
+    keys = [api.new_idempotency_key() for _ in range(40)]
+    for i, key in enumerate(keys, 1):
+        ClientAPI.deposit(clientId, float(i), idempotency_key=key)
+    states = {key: outcome(key)["state"] for key in keys}
+    assert set(states.values()) <= {APPLIED, NOT_APPLIED}
+    assert cash(server, clientId) == sum(i for i, key in enumerate(keys, 1) if states[key] == APPLIED)
+    assert server.lost_responses > 0
+
+
+def test_unknown_without_baseline_is_never_resent(server, monkeypatch):
+    monkeypatch.setattr(api, "MONEY_BASELINE", False)
+    server.lost_response_rate = 1.0
+    clientId = server.add_client("Blind", "blind@example.com", 100.0)
+    key = api.new_idempotency_key()
+    assert not ClientAPI.deposit(clientId, 25.0, idempotency_key=key)["success"]
+    assert outcome(key)["state"] == UNKNOWN
+
+    api.recover_journal(retry=True)
+    ClientAPI.deposit(clientId, 25.0, idempotency_key=key)
+    assert outcome(key)["state"] == UNKNOWN
+    assert cash(server, clientId) == 125.0
+
+
+@pytest.mark.parametrize("landed", [True, False])
+def test_recover_pending_after_crash(server, landed):
+    clientId = server.add_client("Crash", "crash@example.com", 100.0)
+    key = api.new_idempotency_key()
+    # Journaled with its baseline, then the process died before (or right after) the POST
+    api.money_journal().begin(key, "deposit", clientId, 25.0, {"amount": 25.0}, 100.0)
+    if landed:
+        server.clients[clientId]["cash"] += 25.0
+
+    [record] = [record for record in api.recover_journal(retry=True) if record["key"] == key]
+    assert record["state"] == APPLIED
+    assert record.get("reconciled", False) == landed
+    assert cash(server, clientId) == 125.0
+    assert key not in [record["key"] for record in api.recover_journal(retry=True)]
+
+
+def test_concurrent_calls_with_one_key_move_once(server):
+    server.latency = 0.05
+    clientId = server.add_client("Twice", "twice@example.com", 100.0)
+    key = api.new_idempotency_key()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(ClientAPI.deposit(clientId, 25.0, idempotency_key=key)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(res["success"] for res in results)
+    assert cash(server, clientId) == 125.0
+
+
+def test_overlapping_movements_on_one_target_are_not_resent(server):
+    # A transfer in and a withdrawal out of the same amount, both answered with a lost response:
+    # the balance ends where it started, which must not read as "neither landed"
+    server.lost_response_rate = 1.0
+    server.latency = 0.05
+    clientId = server.add_client("Busy", "busy@example.com", 100.0)
+    portfolioId = server.add_portfolio(clientId, "balanced", 100.0)
+    keys = [api.new_idempotency_key() for _ in range(2)]
+    threads = [threading.Thread(target=ClientAPI.transfer_to_portfolio, args=(portfolioId, 10.0), kwargs={"idempotency_key": keys[0]}),
+               threading.Thread(target=ClientAPI.withdraw_from_portfolio, args=(portfolioId, 10.0), kwargs={"idempotency_key": keys[1]})]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert server.requests_by_route["transfer_to_portfolio"] == server.requests_by_route["withdraw_from_portfolio"] == 1
+    assert {outcome(key)["state"] for key in keys} <= {APPLIED, UNKNOWN}
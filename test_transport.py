@@ -0,0 +1,34 @@
+"""
+Transport settings: a new pool size reaches every layer that caps concurrency on it.
+
+    python -m pytest -q test_transport.py
+"""
+import pytest
+
+import api
+import async_api
+
+
+@pytest.fixture
+def pool_size():
+    size = api.POOL_MAXSIZE
+    yield
+    api.configure_transport(pool_maxsize=size)
+
+
+def test_pool_size_sets_effective_concurrency(pool_size):
+    api.configure_transport(pool_maxsize=3)
+    stats = api.rate_limit_stats()
+    assert stats["max_concurrency"] == 3
+    assert stats["concurrency_limit"] <= 3
+    assert async_api._executor._max_workers == 3
+    assert api.get_session().get_adapter(api.BASE_URL)._pool_maxsize == 3
+
+
+def test_fan_out_after_resize(server, pool_size):
+    api.configure_transport(pool_maxsize=2)
+    clientId = server.add_client("Fan", "fan@example.com", 100.0)
+    portfolio_ids = [server.add_portfolio(clientId, "balanced", 10.0 * i) for i in range(1, 6)]
+    results = async_api.gather_portfolios(portfolio_ids, concurrency=4)
+    assert [res["data"]["current_value"] for res in results] == [10.0 * i for i in range(1, 6)]
+    assert api.rate_limit_stats()["in_flight"] == 0
@@ -0,0 +1,168 @@
+"""
+Asynchronous webhook processing: the /reply_whatsapp route enqueues the message and answers
+Twilio with an empty TwiML at once; a worker pool runs the turn and delivers the reply
+out of band through the Twilio REST API, so slow LLM and InvestEase calls never run into
+Twilio's webhook timeout or hold a server worker.
+
+Each client is pinned to one worker (by hash), so a client's messages are processed in the
+order they arrived while different clients run in parallel. When the queue is full, submit()
+returns False and the route answers in the request as before.
+
+Environment:
+    RBCAGENT_ASYNC_WEBHOOK    set to 1 to enable (default 0: reply inside the webhook request)
+    RBCAGENT_WEBHOOK_WORKERS  worker threads (default 8)
+    RBCAGENT_WEBHOOK_QUEUE    messages waiting across all workers before falling back (default 1000)
+    RBCAGENT_WHATSAPP_FROM    sender number (default the Twilio WhatsApp sandbox)
+    TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN
+"""
+import os
+import queue
+import threading
+import time
+import zlib
+
+from telemetry import count, get_logger, observe
+
+ASYNC_WEBHOOK = os.getenv("RBCAGENT_ASYNC_WEBHOOK", "0") != "0"
+WEBHOOK_WORKERS = int(os.getenv("RBCAGENT_WEBHOOK_WORKERS", "8"))
+WEBHOOK_QUEUE = int(os.getenv("RBCAGENT_WEBHOOK_QUEUE", "1000"))
+WHATSAPP_FROM = os.getenv("RBCAGENT_WHATSAPP_FROM", "whatsapp:+14155238886")
+MAX_BODY = 1600  # Twilio's limit per message; longer replies are split
+FAILED_REPLY = "Sorry, something went wrong on our side. Please try again!"
+
+log = get_logger("webhook")
+
+# Twilio REST client, built on first send. Benchmarks and tests may assign a stand-in (see fake_twilio.py).
+twilio_client = None
+_twilio_lock = threading.Lock()
+
+
+def get_twilio():
+    global twilio_client
+    if twilio_client is None:
+        with _twilio_lock:
+            if twilio_client is None:
+                from twilio.rest import Client
+                twilio_client = Client(os.environ["TWILIO_ACCOUNT_SID"], os.environ["TWILIO_AUTH_TOKEN"])
+    return twilio_client
+
+
+def split_body(body: str, limit: int = MAX_BODY) -> list[str]:
+    chunks = []
+    while len(body) > limit:
+        cut = body.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = body.rfind(" ", 0, limit)
+        if cut <= 0:
+            cut = limit
+        chunks.append(body[:cut])
+        body = body[cut:].lstrip()
+    return chunks + [body] if body else chunks
+
+
+class Outbox:
+    """
+    Stands in for MessagingResponse in the worker: each message of the turn is sent as soon as
+    the turn adds it, split to Twilio's limit, and counted once delivered.
+    """
+
+    def __init__(self, send):
+        """
+        Parameters:
+            send (callable): fn(body) -> bool, whether that part was delivered.
+        """
+        self._send = send
+        self.delivered = 0
+
+    def message(self, body: str):
+        for chunk in split_body(body):
+            if self._send(chunk):
+                self.delivered += 1
+
+
+class WebhookQueue:
+    def __init__(self, handler, workers: int = WEBHOOK_WORKERS, max_depth: int = WEBHOOK_QUEUE):
+        """
+        Parameters:
+            handler (callable): fn(clientId, text, outbox) running one turn; what it passes to
+                outbox.message() is sent to the user.
+            workers (int): Worker threads, started on the first submit.
+            max_depth (int): Queued messages across all workers before submit() refuses.
+        """
+        self.handler = handler
+        self.max_depth = max_depth
+        self._queues = [queue.Queue() for _ in range(workers)]
+        self._threads = []
+        self._lock = threading.Lock()
+        self._depth = 0
+        self._peak = 0
+        self._stats = {"enqueued": 0, "rejected": 0, "completed": 0, "failed": 0, "sent": 0, "send_failed": 0}
+
+    def _start(self):
+        # Called under _lock
+        for i, jobs in enumerate(self._queues):
+            thread = threading.Thread(target=self._work, args=(jobs,), name=f"webhook-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, clientId: str, to: str, text: str) -> bool:
+        """
+        Queue one incoming message. Returns False (nothing queued) if the queue is full.
+        """
+        with self._lock:
+            if self._depth >= self.max_depth:
+                self._stats["rejected"] += 1
+                count("webhook", "rejected")
+                return False
+            if not self._threads:
+                self._start()
+            self._depth += 1
+            self._peak = max(self._peak, self._depth)
+            self._stats["enqueued"] += 1
+        self._queues[zlib.crc32(clientId.encode()) % len(self._queues)].put((clientId, to, text, time.perf_counter()))
+        return True
+
+    def _work(self, jobs: queue.Queue):
+        while True:
+            clientId, to, text, enqueued = jobs.get()
+            observe("webhook", "queue_wait", time.perf_counter() - enqueued)
+            outbox = Outbox(lambda body: self._send(clientId, to, body))
+            try:
+                self.handler(clientId, text, outbox)
+                outcome = "completed"
+            except Exception:
+                log.exception("webhook.turn_failed", client_id=clientId, delivered=outbox.delivered)
+                if not outbox.delivered:  # in the request, Twilio would have seen an error
+                    self._send(clientId, to, FAILED_REPLY)
+                outcome = "failed"
+            observe("webhook", "end_to_end", time.perf_counter() - enqueued)
+            with self._lock:
+                self._depth -= 1
+                self._stats[outcome] += 1
+            jobs.task_done()
+
+    def _send(self, clientId: str, to: str, body: str) -> bool:
+        try:
+            start = time.perf_counter()
+            get_twilio().messages.create(from_=WHATSAPP_FROM, to=to, body=body)
+            observe("webhook", "send", time.perf_counter() - start)
+            outcome = "sent"
+        except Exception:
+            log.exception("webhook.send_failed", client_id=clientId, to=to)
+            count("webhook", "send:error")
+            outcome = "send_failed"
+        with self._lock:
+            self._stats[outcome] += 1
+        return outcome == "sent"
+
+    def join(self):
+        """
+        Block until every queued message has been processed.
+        """
+        for jobs in self._queues:
+            jobs.join()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"enabled": ASYNC_WEBHOOK, "workers": len(self._queues), "depth": self._depth,
+                    "peak_depth": self._peak, "max_depth": self.max_depth, **self._stats}